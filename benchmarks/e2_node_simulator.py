@@ -0,0 +1,377 @@
+
+"""
+Local E2 node simulator for load-testing the reactive xApp (solution-xapps/xapp-4-rmr-sub-react).
+
+Plays many E2 nodes from a single RMR endpoint: every node sends RIC_INDICATION (12050) messages,
+with its inventory name as MEID, at its own rate and payload size. The RIC Control requests (12040)
+that the xApp returns to the sender are matched to their indication by transaction ID, which gives
+the indication -> control latency and the indications that were never answered (loss). RMR
+subscription requests (12010) and deletions (12020) are answered with a response (12011 and 12021).
+
+With --ramp, the per-node rate is raised stage by stage until the loss or the p99 latency goes over
+its limit, and the last stage within the limits is reported as the saturation point of the xApp.
+
+With --workers N, the xApp runs in its multi-process mode (controls.workers.count = N): each node
+sends to the RMR port of the worker owning its MEID (--target port + 2 * shard), routed by a
+subscription ID of its own as the Subscription Manager would route it, which shows how the
+saturation point scales with the workers.
+
+Run the xApp locally first (RMR_SEED_RT pointing to a route table, RMR port 4560), then, from the
+repository root:
+
+    python benchmarks/e2_node_simulator.py --nodes 20 --rate 50 --seconds 30
+    python benchmarks/e2_node_simulator.py --nodes 20 --ramp 50:1000:50 --seconds 10 --json ramp.json
+    python benchmarks/e2_node_simulator.py --scenario nodes.json --seconds 60
+    python benchmarks/e2_node_simulator.py --nodes 40 --ramp 50:2000:50 --seconds 10 --workers 4
+
+A scenario file is a JSON list of nodes: [{"name": "gnb_734_733_b5c67788", "rate": 100, "payload_size": 256}, ...].
+"""
+
+# Imports from OSC libraries
+from ricxappframe.rmr import rmr
+
+# Imports from other libraries
+from threading import Thread, Event
+from time import monotonic, sleep
+from typing import Dict, List
+import argparse
+import heapq
+import json
+import os
+import random
+import tempfile
+import zlib
+
+RIC_SUB_REQ = 12010
+RIC_SUB_RESP = 12011
+RIC_SUB_DEL_REQ = 12020
+RIC_SUB_DEL_RESP = 12021
+RIC_CONTROL_REQ = 12040
+RIC_INDICATION = 12050
+
+def shard_of(meid:str, count:int) -> int:
+    """
+    Returns the xApp worker owning an E2 node, as supervisor.shard_of() of xApp 4 does.
+    """
+    return zlib.crc32(meid.encode()) % count
+
+class E2Node:
+    """
+    Simulated E2 node.
+
+    Parameters
+    ----------
+    name: str
+        Inventory name, sent as the MEID of its messages.
+    rate: float
+        Indications per second.
+    payload_size: int
+        Indication payload size in bytes.
+    """
+    def __init__(self, name:str, rate:float, payload_size:int):
+        """
+        Initializes the node.
+        """
+        self.name = name
+        self.meid = name.encode()
+        self.rate = rate
+        self.payload = os.urandom(payload_size)
+        self.subscribed = False # Set by an RMR subscription request for this MEID
+        self.sub_id = -1 # Subscription ID routing its indications to its xApp worker, with several workers
+
+class StageStats:
+    """
+    Counters and latencies of one load stage.
+
+    Parameters
+    ----------
+    offered: float
+        Indications per second offered by all nodes together.
+    seconds: float
+        Stage duration.
+    """
+    def __init__(self, offered:float, seconds:float):
+        """
+        Initializes empty counters.
+        """
+        self.offered = offered
+        self.seconds = seconds
+        self.sent = 0
+        self.send_failures = 0
+        self.controls = 0
+        self.lost = 0
+        self.max_lag = 0.0 # Largest delay of a send behind its schedule, in seconds
+        self.latencies:List[float] = []
+
+    def to_dict(self) -> dict:
+        """
+        Returns the stage results, with latencies in milliseconds.
+        """
+        latencies = sorted(self.latencies)
+        def percentile(p:float):
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000 if latencies else None
+        return {
+            "offered_per_s": self.offered,
+            "sent_per_s": self.sent / self.seconds,
+            "controls_per_s": self.controls / self.seconds,
+            "sent": self.sent,
+            "send_failures": self.send_failures,
+            "controls": self.controls,
+            "lost": self.lost,
+            "loss": (self.lost + self.send_failures) / (self.sent + self.send_failures) if self.sent + self.send_failures else 0.0,
+            "p50_ms": percentile(0.50),
+            "p90_ms": percentile(0.90),
+            "p99_ms": percentile(0.99),
+            "max_ms": latencies[-1] * 1000 if latencies else None,
+            "max_lag_ms": self.max_lag * 1000
+        }
+
+class E2NodeSimulator:
+    """
+    Many E2 nodes sending indications through one RMR endpoint and timing the control replies.
+
+    Parameters
+    ----------
+    nodes: List[E2Node]
+        Simulated nodes.
+    target: str
+        host:port of the xApp RMR data port, receiving the indications.
+    port: int = 38000
+        RMR port of the simulator, where the replies arrive.
+    timeout: float = 1.0
+        Seconds after which an unanswered indication is lost.
+    poisson: bool = False
+        Exponential gaps between indications instead of fixed ones.
+    require_subscription: bool = False
+        Only nodes subscribed through an RMR subscription request send indications.
+    retries: int = 10
+        Send attempts of an indication while RMR asks to retry.
+    workers: int = 1
+        Worker processes of the xApp; worker i listens on the target port + 2 * i.
+    """
+    def __init__(self, nodes:List[E2Node], target:str, port:int = 38000, timeout:float = 1.0, poisson:bool = False,
+                 require_subscription:bool = False, retries:int = 10, workers:int = 1):
+        """
+        Initializes the simulator. RMR is only set up by start().
+        """
+        self.nodes = nodes
+        self.target = target
+        self.port = port
+        self.timeout = timeout
+        self.poisson = poisson
+        self.require_subscription = require_subscription
+        self.retries = retries
+        self.workers = workers
+        self._by_meid:Dict[bytes, E2Node] = {node.meid: node for node in nodes}
+        self._pending:Dict[bytes, float] = {} # Transaction ID -> send time of the unanswered indications
+        self._seq = 0
+        self._stage:StageStats = None
+        self._stop = Event()
+        self._receiver = None
+        self._mrc = None
+        self._routes = None # Static route table file
+        self.late = 0 # Controls received after their indication was counted as lost
+        self.unknown = 0 # Other messages received
+
+    # ------------------ RMR
+
+    def start(self):
+        """
+        Initializes RMR with a static route sending indications to the target and starts the receiver thread.
+        """
+        routes = tempfile.NamedTemporaryFile("w", prefix="e2sim-", suffix=".rt", delete=False)
+        if self.workers > 1: # One route per node, by subscription ID, to the port of its worker
+            host, port = self.target.rsplit(":", 1)
+            entries = []
+            for sub_id, node in enumerate(self.nodes, start=1):
+                node.sub_id = sub_id
+                entries.append("mse|{}|{}|{}:{}".format(RIC_INDICATION, sub_id, host, int(port) + 2 * shard_of(node.name, self.workers)))
+            routes.write("newrt|start|e2sim\n{}\nnewrt|end|{}\n".format("\n".join(entries), len(entries)))
+        else:
+            routes.write("newrt|start|e2sim\nmse|{}|-1|{}\nnewrt|end|1\n".format(RIC_INDICATION, self.target))
+        routes.close()
+        self._routes = routes.name
+        os.environ["RMR_SEED_RT"] = routes.name
+        os.environ.setdefault("RMR_RTG_SVC", "-1") # Static route table only, no Routing Manager
+        self._mrc = rmr.rmr_init(str(self.port).encode(), rmr.RMR_MAX_RCV_BYTES, rmr.RMRFL_MTCALL)
+        while rmr.rmr_ready(self._mrc) == 0:
+            sleep(0.1)
+        self._receiver = Thread(target=self._receive, name="e2sim-receiver", daemon=True)
+        self._receiver.start()
+
+    def stop(self):
+        """
+        Stops the receiver thread and closes RMR.
+        """
+        self._stop.set()
+        if self._receiver is not None:
+            self._receiver.join()
+        rmr.rmr_close(self._mrc)
+        os.remove(self._routes)
+
+    def _receive(self):
+        """
+        Matches the control replies to their indications and answers the subscription messages.
+        """
+        rbuf = rmr.rmr_alloc_msg(self._mrc, 4096)
+        while not self._stop.is_set():
+            rbuf = rmr.rmr_torcv_msg(self._mrc, rbuf, 100)
+            if rbuf.contents.state != rmr.RMR_OK:
+                continue
+            now = monotonic()
+            mtype = rbuf.contents.mtype
+            if mtype == RIC_CONTROL_REQ:
+                sent = self._pending.pop(rmr.get_xaction(rbuf), None)
+                if sent is None:
+                    self.late += 1
+                else:
+                    stage = self._stage
+                    stage.controls += 1
+                    stage.latencies.append(now - sent)
+            elif mtype in (RIC_SUB_REQ, RIC_SUB_DEL_REQ):
+                node = self._by_meid.get(rmr.rmr_get_meid(rbuf), None)
+                if node is not None:
+                    node.subscribed = mtype == RIC_SUB_REQ
+                rbuf = rmr.rmr_rts_msg(self._mrc, rbuf, mtype=RIC_SUB_RESP if mtype == RIC_SUB_REQ else RIC_SUB_DEL_RESP)
+            else:
+                self.unknown += 1
+
+    def _send(self, sbuf, node:E2Node, stage:StageStats):
+        """
+        Sends one indication of a node, reusing the send buffer, and returns the buffer to use next.
+        """
+        self._seq += 1
+        xaction = "{:020d}".format(self._seq).encode()
+        rmr.set_payload_and_length(node.payload, sbuf)
+        rmr.rmr_set_meid(sbuf, node.meid)
+        rmr.set_transaction_id(sbuf, xaction)
+        sbuf.contents.mtype = RIC_INDICATION
+        sbuf.contents.sub_id = node.sub_id
+        self._pending[xaction] = monotonic()
+        for _ in range(self.retries):
+            sbuf = rmr.rmr_send_msg(self._mrc, sbuf)
+            if sbuf.contents.state != rmr.RMR_ERR_RETRY:
+                break
+        if sbuf.contents.state == rmr.RMR_OK:
+            stage.sent += 1
+        else:
+            self._pending.pop(xaction, None)
+            stage.send_failures += 1
+        return sbuf
+
+    # ------------------ LOAD
+
+    def run_stage(self, seconds:float, rate:float = None) -> StageStats:
+        """
+        Sends indications for the given duration, at rate per node if given (otherwise at each node's
+        own rate), waits for the last replies and returns the stage statistics.
+        """
+        rates = {node.name: rate if rate is not None else node.rate for node in self.nodes}
+        stage = StageStats(offered=sum(rates.values()), seconds=seconds)
+        self._stage = stage
+        sbuf = rmr.rmr_alloc_msg(self._mrc, max(len(node.payload) for node in self.nodes))
+        start = monotonic()
+        end = start + seconds
+        schedule = [(start + random.uniform(0, 1 / rates[node.name]), i) for i, node in enumerate(self.nodes) if rates[node.name] > 0]
+        heapq.heapify(schedule) # (next send time, node index), nodes start at random offsets to avoid bursts
+        while schedule and schedule[0][0] < end:
+            due, i = schedule[0]
+            node = self.nodes[i]
+            now = monotonic()
+            if due > now:
+                sleep(due - now)
+            else:
+                stage.max_lag = max(stage.max_lag, now - due)
+            if node.subscribed or not self.require_subscription:
+                sbuf = self._send(sbuf, node, stage)
+            gap = random.expovariate(rates[node.name]) if self.poisson else 1 / rates[node.name]
+            heapq.heapreplace(schedule, (due + gap, i))
+        rmr.rmr_free_msg(sbuf)
+
+        sleep(max(0.0, end + self.timeout - monotonic())) # Replies in flight
+        expired = [xaction for xaction, sent in list(self._pending.items()) if monotonic() - sent >= self.timeout]
+        for xaction in expired:
+            if self._pending.pop(xaction, None) is not None:
+                stage.lost += 1
+        return stage
+
+def load_nodes(args) -> List[E2Node]:
+    """
+    Returns the nodes of the scenario file, or --nodes identical nodes.
+    """
+    if args.scenario:
+        with open(args.scenario) as scenario:
+            return [E2Node(node["name"], node.get("rate", args.rate), node.get("payload_size", args.payload_size)) for node in json.load(scenario)]
+    return [E2Node("gnb_734_733_{:08x}".format(i), args.rate, args.payload_size) for i in range(args.nodes)]
+
+def print_stage(stage:dict):
+    """
+    Prints one row of results.
+    """
+    def ms(value):
+        return "{:.2f}".format(value) if value is not None else "-"
+    print("{:>10.0f}{:>10.0f}{:>10.0f}{:>9.2%}{:>9}{:>9}{:>9}{:>9}{:>10.1f}".format(
+        stage["offered_per_s"], stage["sent_per_s"], stage["controls_per_s"], stage["loss"],
+        ms(stage["p50_ms"]), ms(stage["p90_ms"]), ms(stage["p99_ms"]), ms(stage["max_ms"]), stage["max_lag_ms"]))
+
+def main():
+    """
+    Runs one stage, or a ramp of stages, and prints the results.
+    """
+    parser = argparse.ArgumentParser(description="Local E2 node simulator for load-testing the reactive xApp.")
+    parser.add_argument("--target", default="localhost:4560", help="xApp RMR data port (default: %(default)s).")
+    parser.add_argument("--port", type=int, default=38000, help="Simulator RMR port (default: %(default)s).")
+    parser.add_argument("--nodes", type=int, default=2, help="Number of simulated E2 nodes (default: %(default)s).")
+    parser.add_argument("--rate", type=float, default=10.0, help="Indications per second per node (default: %(default)s).")
+    parser.add_argument("--payload-size", type=int, default=64, help="Indication payload bytes (default: %(default)s).")
+    parser.add_argument("--scenario", help="JSON file with the nodes, their rates and payload sizes.")
+    parser.add_argument("--seconds", type=float, default=10.0, help="Duration of each stage (default: %(default)s).")
+    parser.add_argument("--ramp", help="START:STOP:STEP per-node rates, one stage each, until saturation.")
+    parser.add_argument("--max-loss", type=float, default=0.01, help="Loss ratio ending the ramp (default: %(default)s).")
+    parser.add_argument("--max-p99", type=float, default=100.0, help="p99 latency in ms ending the ramp (default: %(default)s).")
+    parser.add_argument("--timeout", type=float, default=1.0, help="Seconds before an indication is lost (default: %(default)s).")
+    parser.add_argument("--poisson", action="store_true", help="Exponential gaps between indications.")
+    parser.add_argument("--require-subscription", action="store_true", help="Nodes wait for an RMR subscription request.")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes of the xApp, sharding the nodes (default: %(default)s).")
+    parser.add_argument("--json", help="Also write the results to this file.")
+    args = parser.parse_args()
+
+    simulator = E2NodeSimulator(load_nodes(args), args.target, port=args.port, timeout=args.timeout,
+                                poisson=args.poisson, require_subscription=args.require_subscription, workers=args.workers)
+    simulator.start()
+    print("{:>10}{:>10}{:>10}{:>9}{:>9}{:>9}{:>9}{:>9}{:>10}".format(
+        "offered/s", "sent/s", "ctrl/s", "loss", "p50 ms", "p90 ms", "p99 ms", "max ms", "lag ms"))
+    results = []
+    saturation = None
+    try:
+        if args.ramp:
+            start, stop, step = (float(value) for value in args.ramp.split(":"))
+            rate = start
+            while rate <= stop:
+                stage = simulator.run_stage(args.seconds, rate).to_dict()
+                results.append(stage)
+                print_stage(stage)
+                if stage["loss"] > args.max_loss or (stage["p99_ms"] or 0.0) > args.max_p99:
+                    break
+                saturation = stage
+                rate += step
+        else:
+            results.append(simulator.run_stage(args.seconds).to_dict())
+            print_stage(results[-1])
+    finally:
+        simulator.stop()
+
+    if args.ramp:
+        if saturation is None:
+            print("\nThe first stage already exceeds the limits.")
+        else:
+            print("\nSaturation point: {:.0f} indications/s ({:.0f} controls/s, p99 {:.2f} ms).".format(
+                saturation["offered_per_s"], saturation["controls_per_s"], saturation["p99_ms"] or 0.0))
+    if simulator.late or simulator.unknown:
+        print("{} late controls, {} other messages received.".format(simulator.late, simulator.unknown))
+    if args.json:
+        with open(args.json, "w") as output:
+            json.dump({"stages": results, "saturation": saturation, "late": simulator.late, "unknown": simulator.unknown}, output, indent=4)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+
+"""
+Micro-benchmark of the RMR message handlers, REST handlers and loop bodies of the workshop xApps
+(solution-xapps/xapp-*), driven in-process with the fake RMR transport and fake SDL of xapp_fakes.py.
+
+Every handler runs with the instrumentation it has in production (metrics, tracing with sampling
+off, watchdog) and with its log lines formatted but discarded. For each case it reports the time per
+call, the throughput, the peak memory allocated during one call and the memory still held after it
+(CPython has no allocation counter; a retained size above zero flags per-message growth).
+
+Results can be stored as a baseline and compared on later runs; the comparison scales the stored
+times by a CPU calibration loop so a baseline taken on another machine stays usable. Run from the
+repository root with:
+
+    python benchmarks/handler_benchmark.py --save      # Stores benchmarks/handler_baseline.json
+    python benchmarks/handler_benchmark.py             # Compares with it, exits with 1 on a regression
+    python benchmarks/handler_benchmark.py -k xapp4    # Only the cases whose name contains xapp4
+"""
+
+# Imports from other libraries
+from contextlib import redirect_stdout
+from statistics import median
+from timeit import Timer
+import argparse
+import importlib
+import json
+import os
+import platform
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Imports from local files
+from xapp_fakes import load_xapp, message, rest_callback
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "handler_baseline.json")
+CONTROLS = {"tracing": {"sample_rate": 0.0}} # Unsampled tracing, as for almost every message in production
+
+class _Discard:
+    """
+    Output stream discarding the log lines of the xApps.
+    """
+    def write(self, text:str):
+        return len(text)
+
+    def flush(self):
+        pass
+
+# ------------------ CASES
+
+def _virtual_clock(module):
+    """
+    Returns a new virtual clock of the package of an xApp.
+    """
+    return importlib.import_module(module.__package__ + ".clock").VirtualClock()
+
+def _loop_body(xapp):
+    """
+    Returns a call running one iteration of the xApp loop, built with a virtual clock: the second
+    until the scheduler runs the next one passes without taking real time.
+    """
+    clock = xapp._clock
+    def op():
+        xapp._loop_iteration()
+        clock.advance(1)
+    return op
+
+def _rest(xapp, method:str, name:str, path:str, body:dict = None):
+    """
+    Returns a call of a registered REST callback.
+    """
+    callback = rest_callback(xapp, method, name)
+    data = json.dumps(body).encode() if body is not None else None
+    return lambda: callback(name, path, data, "application/json")
+
+def xapp1_cases() -> dict:
+    module = load_xapp("xapp1", controls=CONTROLS)
+    xapp = module.XappDeployTest(clock=_virtual_clock(module))
+    return {"xapp1 _loop_iteration": _loop_body(xapp)}
+
+def xapp2_cases() -> dict:
+    module = load_xapp("xapp2", controls=CONTROLS)
+    xapp = module.XappLogSdlRest(clock=_virtual_clock(module)) # Also drives the counter windows, closed every 30 iterations
+    xapp._sdl_index.seed() # SDL set-up of the entrypoint, the fake SDL blocks publishers until the listener runs
+    xapp._sdl_index.subscribe()
+    xapp._xapp.sdl.start_event_listener()
+    batch = {"operations": [{"op": "set", "key": "bench:{}".format(i), "value": i} for i in range(10)]}
+    return {
+        "xapp2 _loop_iteration": _loop_body(xapp),
+        "xapp2 GET /ric/v1/health/alive": _rest(xapp, "get", "liveness", "/ric/v1/health/alive"),
+        "xapp2 GET /ric/v1/health/ready": _rest(xapp, "get", "readiness", "/ric/v1/health/ready"),
+        "xapp2 GET /ric/v1/config": _rest(xapp, "get", "config", "/ric/v1/config"),
+        "xapp2 GET /ric/v1/sdl/cache_stats": _rest(xapp, "get", "sdl_cache_stats", "/ric/v1/sdl/cache_stats"),
+        "xapp2 GET /ric/v1/metrics": _rest(xapp, "get", "metrics", "/ric/v1/metrics"),
+        "xapp2 POST /ric/v1/reset_count": _rest(xapp, "post", "sdl_delete", "/ric/v1/reset_count", {"xapp-deletes": 0}),
+        "xapp2 POST /ric/v1/sdl/batch (10 sets)": _rest(xapp, "post", "sdl_batch", "/ric/v1/sdl/batch", batch)
+    }
+
+def xapp3_cases() -> dict:
+    module = load_xapp("xapp3", controls=CONTROLS)
+    xapp = module.XappRmrSubAct(clock=_virtual_clock(module))
+    framework = xapp._xapp
+    reply = message(30001, payload=b"Received message correctly")
+    unknown = message(40000, payload=b"unknown")
+    def receive(msg):
+        def op():
+            framework.inject(*msg)
+            xapp._receive_RMR_messages()
+        return op
+    return {
+        "xapp3 _loop_iteration": _loop_body(xapp),
+        "xapp3 _receive_RMR_messages (30001)": receive(reply),
+        "xapp3 _receive_RMR_messages (unknown type)": receive(unknown),
+        "xapp3 GET /ric/v1/health/ready": _rest(xapp, "get", "readiness", "/ric/v1/health/ready"),
+        "xapp3 GET /ric/v1/metrics": _rest(xapp, "get", "metrics", "/ric/v1/metrics")
+    }
+
+def xapp4_cases() -> dict:
+    module = load_xapp("xapp4", controls=CONTROLS)
+    xapp = module.XappRmrSubReact()
+    framework = xapp._rmrxapp
+    active = message(30000, payload=b"Message of type 30000 from the active xApp")
+    indication = message(12050, payload=bytes(64), meid=b"gnb_734_733_b5c67788")
+    unknown = message(40000, payload=b"unknown")
+    xapp.sub_id_to_node["bench-sub"] = "gnb_734_733_b5c67788"
+    xapp.subscription_responses["gnb_734_733_b5c67788"] = {"SubscriptionId": "bench-sub", "SubscriptionInstances": None}
+    sub_resp = {"SubscriptionId": "bench-sub", "SubscriptionInstances": [{"XappEventInstanceId": 54321, "E2EventInstanceId": 1}]}
+    return {
+        "xapp4 active_xapp_handler": lambda: framework.dispatch(*active),
+        "xapp4 ric_indication_handler": lambda: framework.dispatch(*indication),
+        "xapp4 default_rmr_handler": lambda: framework.dispatch(*unknown),
+        "xapp4 GET /ric/v1/health/ready": _rest(xapp, "get", "readiness", "/ric/v1/health/ready"),
+        "xapp4 POST /ric/v1/subscriptions/response": _rest(xapp, "post", "sub_resp", "/ric/v1/subscriptions/response", sub_resp),
+        "xapp4 GET /ric/v1/sdl/cache_stats": _rest(xapp, "get", "sdl_cache_stats", "/ric/v1/sdl/cache_stats"),
+        "xapp4 GET /ric/v1/metrics": _rest(xapp, "get", "metrics", "/ric/v1/metrics")
+    }
+
+SUITES = [xapp1_cases, xapp2_cases, xapp3_cases, xapp4_cases]
+
+# ------------------ MEASUREMENT
+
+def ns_per_op(op) -> float:
+    """
+    Returns the best time per call of op() in nanoseconds.
+    """
+    timer = Timer(op)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=5, number=number)) / number * 1e9
+
+def bytes_per_op(op, calls:int = 200) -> tuple:
+    """
+    Returns the median peak of the memory allocated during one call of op() and the mean memory still held after it, in bytes.
+    """
+    peaks, retained = [], []
+    tracemalloc.start()
+    try:
+        for _ in range(calls):
+            tracemalloc.clear_traces() # Also resets the peak
+            op()
+            current, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak)
+            retained.append(current)
+    finally:
+        tracemalloc.stop()
+    return median(peaks), sum(retained) / calls
+
+def calibration_ns() -> float:
+    """
+    Returns the time of a fixed pure Python workload, used to compare runs on different CPUs.
+    """
+    def workload():
+        table = {}
+        for i in range(200):
+            table["key:{}".format(i)] = [i, str(i)]
+        return sum(len(value[1]) for value in table.values())
+    return ns_per_op(workload)
+
+def run(pattern:str = None) -> dict:
+    """
+    Runs the cases whose name contains pattern and returns their results by name.
+    """
+    results = {}
+    for suite in SUITES:
+        with redirect_stdout(_Discard()):
+            cases = suite()
+        for name, op in cases.items():
+            if pattern and pattern not in name:
+                continue
+            with redirect_stdout(_Discard()):
+                op() # Warm-up (lazy imports, first SDL keys, metric label sets)
+                ns = ns_per_op(op)
+                peak, retained = bytes_per_op(op)
+            results[name] = {"ns_per_op": ns, "peak_bytes": peak, "retained_bytes": retained}
+            print("{:<48}{:>12.0f}{:>12.0f}{:>12.0f}{:>12.1f}".format(name, ns, 1e9 / ns, peak, retained))
+    return results
+
+def compare(results:dict, calibration:float, baseline:dict, tolerance:float) -> list:
+    """
+    Returns the regressions of results against a baseline: cases slower than tolerance, after scaling
+    by the calibration ratio, or retaining more memory per call.
+    """
+    scale = calibration / baseline["calibration_ns"]
+    regressions = []
+    print("\nCompared with the baseline of {} (CPU scale {:.2f}):".format(baseline.get("created_on", "?"), scale))
+    for name, result in results.items():
+        base = baseline["results"].get(name, None)
+        if base is None:
+            print("{:<48}{:>12}".format(name, "new"))
+            continue
+        ratio = result["ns_per_op"] / (base["ns_per_op"] * scale)
+        growth = result["retained_bytes"] - base["retained_bytes"]
+        slower = ratio > 1 + tolerance
+        leaking = growth > max(64.0, base["retained_bytes"] * tolerance)
+        print("{:<48}{:>11.2f}x{:>+12.1f}{}".format(name, ratio, growth, "  REGRESSION" if slower or leaking else ""))
+        if slower or leaking:
+            regressions.append(name)
+    return regressions
+
+def main():
+    """
+    Prints the results and stores or compares them with the baseline.
+    """
+    parser = argparse.ArgumentParser(description="Micro-benchmark of the workshop xApp handlers.")
+    parser.add_argument("-k", dest="pattern", help="Only run the cases whose name contains this text.")
+    parser.add_argument("--baseline", default=BASELINE, help="Baseline file (default: %(default)s).")
+    parser.add_argument("--save", action="store_true", help="Store the results as the baseline instead of comparing.")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Accepted slowdown ratio (default: %(default)s).")
+    args = parser.parse_args()
+
+    calibration = calibration_ns()
+    print("{:<48}{:>12}{:>12}{:>12}{:>12}".format("case", "ns/op", "ops/s", "peak B/op", "held B/op"))
+    results = run(args.pattern)
+
+    if args.save:
+        with open(args.baseline, "w") as baseline_file:
+            json.dump({
+                "created_on": platform.node(),
+                "python": platform.python_version(),
+                "calibration_ns": calibration,
+                "results": results
+            }, baseline_file, indent=4, sort_keys=True)
+        print("\nBaseline stored in {}.".format(args.baseline))
+    elif os.path.isfile(args.baseline):
+        with open(args.baseline) as baseline_file:
+            regressions = compare(results, calibration, json.load(baseline_file), args.tolerance)
+        if regressions:
+            print("\n{} regression(s): {}".format(len(regressions), ", ".join(regressions)))
+            sys.exit(1)
+    else:
+        print("\nNo baseline at {}, run with --save to store one.".format(args.baseline))
+
+if __name__ == "__main__":
+    main()
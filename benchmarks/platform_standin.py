@@ -0,0 +1,448 @@
+
+"""
+Local stand-in for the RIC platform services used by the REST paths of the workshop xApps.
+
+Serves, on a single port:
+
+- Subscription Manager: POST /ric/v1/subscriptions, DELETE /ric/v1/subscriptions/{id} and
+  GET /ric/v1/subscriptions. Every accepted subscription is notified asynchronously to the
+  ClientEndpoint of the request (POST /ric/v1/subscriptions/response) after a configurable latency,
+  with injected rejections (503), E2 failures (ErrorCause set) and dropped notifications.
+- AppMgr: GET /ric/v1/xapps, POST /ric/v1/register and POST /ric/v1/deregister.
+- E2 Manager: GET /v1/nodeb/states and GET /v1/nodeb/{inventory name}, over an inventory of
+  any number of fake E2 nodes.
+- GET /standin/stats: request and notification counters.
+
+Point the xApps at it through controls.platform in their config file, e.g. for xApp 4:
+{"submgr_url": "http://localhost:8088/ric/v1", "e2mgr_url": "http://localhost:8088/v1", "client_host": "localhost"}
+and for xApp 2: {"appmgr_url": "http://localhost:8088/ric/v1"}. The framework registration URL is
+fixed (service-ricplt-appmgr-http.ricplt:8080), so serving it needs --port 8080 and a hosts entry.
+Run from the repository root with:
+
+    python benchmarks/platform_standin.py --nodes 10000 --latency 0.05 --jitter 0.05 --fail-rate 0.01
+"""
+
+# Imports from other libraries
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from http.client import HTTPConnection
+from threading import Thread, Condition, Lock, local
+from queue import Queue
+from time import monotonic, time
+from typing import Dict, List
+import argparse
+import heapq
+import json
+import random
+
+class E2NodeInventory:
+    """
+    Fake E2 node inventory, as listed by E2 Manager.
+
+    Parameters
+    ----------
+    count: int
+        Number of E2 nodes.
+    prefix: str = "gnb_734_733_"
+        Inventory name prefix, followed by the node number in hexadecimal.
+    """
+    def __init__(self, count:int, prefix:str = "gnb_734_733_"):
+        """
+        Generates the nodes.
+        """
+        self.nodes:Dict[str, dict] = {}
+        for i in range(count):
+            name = "{}{:08x}".format(prefix, i)
+            self.nodes[name] = {
+                "inventoryName": name,
+                "globalNbId": {"plmnId": "373437", "nbId": "{:036b}".format(i)},
+                "connectionStatus": "CONNECTED"
+            }
+        self._states = json.dumps(list(self.nodes.values())).encode() # The full list is served often and never changes
+
+    def states(self) -> bytes:
+        """
+        Returns the JSON list of all nodes.
+        """
+        return self._states
+
+class Notifier:
+    """
+    Sends the subscription notifications when they are due, from a pool of workers keeping one
+    HTTP connection per xApp endpoint.
+
+    Parameters
+    ----------
+    workers: int = 8
+        Threads sending notifications.
+    """
+    def __init__(self, workers:int = 8):
+        """
+        Starts the scheduler and the workers.
+        """
+        self._schedule = [] # (due time, sequence, host, port, body) heap
+        self._seq = 0
+        self._condition = Condition()
+        self._due:Queue = Queue()
+        self._local = local() # Per-worker connections
+        self.sent = 0
+        self.failures = 0
+        self.max_lag = 0.0 # Largest delay of a notification behind its due time, in seconds
+        self._lock = Lock() # Protects the counters
+        Thread(target=self._run_schedule, name="standin-scheduler", daemon=True).start()
+        for i in range(workers):
+            Thread(target=self._run_worker, name="standin-notifier-{}".format(i), daemon=True).start()
+
+    def schedule(self, delay:float, host:str, port:int, body:dict):
+        """
+        Schedules a notification to POST body to http://host:port/ric/v1/subscriptions/response after delay seconds.
+        """
+        with self._condition:
+            self._seq += 1
+            heapq.heappush(self._schedule, (monotonic() + delay, self._seq, host, port, json.dumps(body).encode()))
+            self._condition.notify()
+
+    def _run_schedule(self):
+        """
+        Hands the due notifications to the workers.
+        """
+        with self._condition:
+            while True:
+                if not self._schedule:
+                    self._condition.wait()
+                    continue
+                delay = self._schedule[0][0] - monotonic()
+                if delay > 0:
+                    self._condition.wait(delay)
+                    continue
+                self._due.put(heapq.heappop(self._schedule))
+
+    def _run_worker(self):
+        """
+        Sends the due notifications.
+        """
+        self._local.connections = {}
+        while True:
+            due, _, host, port, body = self._due.get()
+            lag = monotonic() - due
+            ok = False
+            for _ in range(2): # A kept-alive connection may have been closed by the xApp, retried once on a new one
+                connection = self._local.connections.get((host, port), None)
+                if connection is None:
+                    connection = self._local.connections[(host, port)] = HTTPConnection(host, port, timeout=10)
+                try:
+                    connection.request("POST", "/ric/v1/subscriptions/response", body, {"Content-Type": "application/json"})
+                    response = connection.getresponse()
+                    response.read()
+                    ok = response.status < 300
+                    break
+                except Exception: # Connection errors and malformed responses alike
+                    connection.close()
+                    del self._local.connections[(host, port)]
+            with self._lock:
+                self.max_lag = max(self.max_lag, lag)
+                if ok:
+                    self.sent += 1
+                else:
+                    self.failures += 1
+
+    def pending(self) -> int:
+        """
+        Returns the notifications not sent yet.
+        """
+        return len(self._schedule) + self._due.qsize()
+
+class SubscriptionManager:
+    """
+    Subscription Manager REST API with asynchronous notifications and failure injection.
+
+    Parameters
+    ----------
+    inventory: E2NodeInventory
+        E2 nodes that can be subscribed.
+    notifier: Notifier
+        Sends the notifications.
+    latency: float = 0.01
+        Seconds between a subscription and its notification.
+    jitter: float = 0.0
+        Random extra seconds added to the latency (uniform).
+    reject_rate: float = 0.0
+        Probability of rejecting a subscription request with 503.
+    fail_rate: float = 0.0
+        Probability of notifying an E2 failure (ErrorCause set) instead of a success.
+    drop_rate: float = 0.0
+        Probability of never notifying an accepted subscription.
+    """
+    def __init__(self, inventory:E2NodeInventory, notifier:Notifier, latency:float = 0.01, jitter:float = 0.0,
+                 reject_rate:float = 0.0, fail_rate:float = 0.0, drop_rate:float = 0.0):
+        """
+        Initializes the manager without subscriptions.
+        """
+        self.inventory = inventory
+        self.notifier = notifier
+        self.latency = latency
+        self.jitter = jitter
+        self.reject_rate = reject_rate
+        self.fail_rate = fail_rate
+        self.drop_rate = drop_rate
+        self._lock = Lock()
+        self._next_id = 1
+        self._next_e2_instance = 1
+        self.subscriptions:Dict[str, dict] = {} # Subscription ID -> {"Meid", "ClientEndpoint", "SubscriptionDetails"}
+        self.counters = {"subscribed": 0, "deleted": 0, "rejected": 0, "invalid": 0, "failed": 0, "dropped": 0}
+
+    def subscribe(self, body:dict) -> tuple:
+        """
+        Handles a subscription request and returns the HTTP status and response body.
+        """
+        try:
+            endpoint = body["ClientEndpoint"]
+            host, port, meid = endpoint["Host"], int(endpoint["HTTPPort"]), body["Meid"]
+            details:List[dict] = body["SubscriptionDetails"]
+            event_ids = [detail["XappEventInstanceId"] for detail in details]
+        except (KeyError, TypeError, ValueError) as e:
+            with self._lock:
+                self.counters["invalid"] += 1
+            return 400, {"error": "invalid subscription request: {!r}".format(e)}
+        if meid not in self.inventory.nodes:
+            with self._lock:
+                self.counters["invalid"] += 1
+            return 400, {"error": "unknown E2 node {}".format(meid)}
+        if random.random() < self.reject_rate:
+            with self._lock:
+                self.counters["rejected"] += 1
+            return 503, {"error": "subscription rejected (injected)"}
+
+        with self._lock:
+            sub_id = str(self._next_id)
+            self._next_id += 1
+            first_instance = self._next_e2_instance
+            self._next_e2_instance += len(event_ids)
+            self.subscriptions[sub_id] = {"Meid": meid, "ClientEndpoint": ["{}:{}".format(host, port)], "SubscriptionDetails": details}
+            self.counters["subscribed"] += 1
+
+        if random.random() < self.drop_rate:
+            with self._lock:
+                self.counters["dropped"] += 1
+        else:
+            failed = random.random() < self.fail_rate
+            if failed:
+                with self._lock:
+                    self.counters["failed"] += 1
+            self.notifier.schedule(self.latency + random.uniform(0, self.jitter), host, port, {
+                "SubscriptionId": sub_id,
+                "SubscriptionInstances": [
+                    {
+                        "XappEventInstanceId": event_id,
+                        "E2EventInstanceId": 0 if failed else first_instance + i,
+                        "ErrorCause": "E2 subscription failed (injected)" if failed else "",
+                        "ErrorSource": "E2Node" if failed else "",
+                        "TimeoutType": ""
+                    } for i, event_id in enumerate(event_ids)
+                ]
+            })
+        return 201, {"SubscriptionId": sub_id, "SubscriptionInstances": None}
+
+    def delete(self, sub_id:str) -> int:
+        """
+        Deletes a subscription and returns the HTTP status.
+        """
+        with self._lock:
+            if self.subscriptions.pop(sub_id, None) is None:
+                return 404
+            self.counters["deleted"] += 1
+        return 204
+
+    def list(self) -> list:
+        """
+        Returns the active subscriptions.
+        """
+        with self._lock:
+            return [dict(subscription, SubscriptionId=sub_id) for sub_id, subscription in self.subscriptions.items()]
+
+class AppManager:
+    """
+    AppMgr xApp registry.
+
+    Parameters
+    ----------
+    xapps: List[str] = None
+        Names of xApps listed as deployed from the start.
+    """
+    def __init__(self, xapps:List[str] = None):
+        """
+        Initializes the registry.
+        """
+        self._lock = Lock()
+        self.xapps:Dict[str, dict] = {name: self._entry(name, {}) for name in (xapps if xapps is not None else [])}
+
+    def _entry(self, name:str, registration:dict) -> dict:
+        """
+        Returns the AppMgr description of an xApp.
+        """
+        http_endpoint = registration.get("httpEndpoint", "")
+        return {
+            "name": name,
+            "status": "deployed",
+            "version": registration.get("appVersion", "1.0.0"),
+            "instances": [{
+                "name": registration.get("appName", name),
+                "status": "running",
+                "ip": http_endpoint.rsplit(":", 1)[0],
+                "port": int(http_endpoint.rsplit(":", 1)[1]) if ":" in http_endpoint else 8080,
+                "txMessages": [],
+                "rxMessages": [],
+                "policies": []
+            }]
+        }
+
+    def register(self, registration:dict) -> int:
+        """
+        Registers an xApp (framework registration request) and returns the HTTP status.
+        """
+        name = registration.get("appInstanceName", None)
+        if not name:
+            return 400
+        with self._lock:
+            self.xapps[name] = self._entry(name, registration)
+        return 201
+
+    def deregister(self, registration:dict) -> int:
+        """
+        Removes an xApp and returns the HTTP status.
+        """
+        with self._lock:
+            return 204 if self.xapps.pop(registration.get("appInstanceName", None), None) is not None else 404
+
+    def list(self) -> list:
+        """
+        Returns the registered xApps.
+        """
+        with self._lock:
+            return list(self.xapps.values())
+
+class StandinHandler(BaseHTTPRequestHandler):
+    """
+    Routes the platform API requests. The services are set on the class by serve().
+    """
+    protocol_version = "HTTP/1.1" # Keep-alive, as the xApps reuse their connections
+    submgr:SubscriptionManager = None
+    appmgr:AppManager = None
+    inventory:E2NodeInventory = None
+    started = time()
+    requests = 0
+
+    def log_message(self, format, *args):
+        pass # One line per request would cost more than serving it
+
+    def _reply(self, status:int, body=None):
+        """
+        Sends a JSON response (body may already be encoded).
+        """
+        data = body if isinstance(body, bytes) else (json.dumps(body).encode() if body is not None else b"")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self) -> dict:
+        """
+        Returns the JSON request body, or None if it is not valid JSON.
+        """
+        data = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        try:
+            return json.loads(data) if data else {}
+        except ValueError:
+            return None
+
+    def do_GET(self):
+        StandinHandler.requests += 1
+        path = self.path.split("?", 1)[0]
+        if path == "/ric/v1/subscriptions":
+            self._reply(200, self.submgr.list())
+        elif path == "/ric/v1/xapps":
+            self._reply(200, self.appmgr.list())
+        elif path == "/v1/nodeb/states":
+            self._reply(200, self.inventory.states())
+        elif path.startswith("/v1/nodeb/"):
+            node = self.inventory.nodes.get(path[len("/v1/nodeb/"):], None)
+            self._reply(200 if node is not None else 404, node if node is not None else {"errorMessage": "not found"})
+        elif path == "/standin/stats":
+            notifier = self.submgr.notifier
+            self._reply(200, {
+                "uptime": time() - self.started,
+                "requests": StandinHandler.requests,
+                "subscriptions": len(self.submgr.subscriptions),
+                "submgr": self.submgr.counters,
+                "notifications": {"sent": notifier.sent, "failures": notifier.failures, "pending": notifier.pending(), "max_lag": notifier.max_lag},
+                "xapps": len(self.appmgr.xapps),
+                "e2_nodes": len(self.inventory.nodes)
+            })
+        elif path in ("/ric/v1/health/alive", "/ric/v1/health/ready"):
+            self._reply(200, {"status": "Healthy"})
+        else:
+            self._reply(404, {"error": "unknown path {}".format(path)})
+
+    def do_POST(self):
+        StandinHandler.requests += 1
+        body = self._body()
+        if body is None:
+            self._reply(400, {"error": "body is not valid JSON"})
+        elif self.path == "/ric/v1/subscriptions":
+            self._reply(*self.submgr.subscribe(body))
+        elif self.path == "/ric/v1/register":
+            self._reply(self.appmgr.register(body))
+        elif self.path == "/ric/v1/deregister":
+            self._reply(self.appmgr.deregister(body))
+        else:
+            self._reply(404, {"error": "unknown path {}".format(self.path)})
+
+    def do_DELETE(self):
+        StandinHandler.requests += 1
+        if self.path.startswith("/ric/v1/subscriptions/"):
+            self._reply(self.submgr.delete(self.path[len("/ric/v1/subscriptions/"):]))
+        else:
+            self._reply(404, {"error": "unknown path {}".format(self.path)})
+
+def serve(host:str, port:int, submgr:SubscriptionManager, appmgr:AppManager, inventory:E2NodeInventory) -> ThreadingHTTPServer:
+    """
+    Returns a threaded HTTP server for the stand-in services, ready for serve_forever().
+    """
+    StandinHandler.submgr, StandinHandler.appmgr, StandinHandler.inventory = submgr, appmgr, inventory
+    StandinHandler.started = time()
+    server = ThreadingHTTPServer((host, port), StandinHandler)
+    server.daemon_threads = True
+    return server
+
+def main():
+    """
+    Runs the stand-in until interrupted.
+    """
+    parser = argparse.ArgumentParser(description="Local stand-in for the RIC Subscription Manager, AppMgr and E2 Manager.")
+    parser.add_argument("--host", default="0.0.0.0", help="Listen address (default: %(default)s).")
+    parser.add_argument("--port", type=int, default=8088, help="Listen port (default: %(default)s).")
+    parser.add_argument("--nodes", type=int, default=2, help="Fake E2 nodes in the inventory (default: %(default)s).")
+    parser.add_argument("--node-prefix", default="gnb_734_733_", help="Inventory name prefix (default: %(default)s).")
+    parser.add_argument("--latency", type=float, default=0.01, help="Seconds before a subscription is notified (default: %(default)s).")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random extra notification seconds (default: %(default)s).")
+    parser.add_argument("--reject-rate", type=float, default=0.0, help="Probability of a 503 subscription response (default: %(default)s).")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Probability of an E2 failure notification (default: %(default)s).")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="Probability of no notification (default: %(default)s).")
+    parser.add_argument("--workers", type=int, default=8, help="Notification sender threads (default: %(default)s).")
+    parser.add_argument("--xapps", default="", help="Comma-separated xApp names listed as deployed.")
+    args = parser.parse_args()
+
+    inventory = E2NodeInventory(args.nodes, args.node_prefix)
+    submgr = SubscriptionManager(inventory, Notifier(args.workers), latency=args.latency, jitter=args.jitter,
+                                 reject_rate=args.reject_rate, fail_rate=args.fail_rate, drop_rate=args.drop_rate)
+    appmgr = AppManager([name for name in args.xapps.split(",") if name])
+    server = serve(args.host, args.port, submgr, appmgr, inventory)
+    print("Platform stand-in listening on {}:{} with {} E2 nodes.".format(args.host, args.port, args.nodes))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+
+if __name__ == "__main__":
+    main()
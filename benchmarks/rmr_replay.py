@@ -0,0 +1,136 @@
+
+"""
+Replays an RMR recording of the reactive xApp (solution-xapps/xapp-4-rmr-sub-react) into its
+registered handlers, in-process with the fake RMR transport and fake SDL of xapp_fakes.py.
+
+Recordings are made by the xApp itself: set controls.recording.enabled in its config file, or
+POST {"action": "start"} and then {"action": "stop"} to /ric/v1/debug/recording, and copy the log
+(controls.recording.path, /tmp/xapp-rmr.rec by default) out of the pod.
+
+Messages are dispatched at the recorded pace (--speed 1), at a scaled pace (--speed 4 plays four
+times faster) or as fast as possible (--speed 0). The report gives the throughput and the handler
+latency per message type; at a recorded or scaled pace it also gives how late messages were
+dispatched, which grows when the handlers cannot keep up with the traffic. Run from the repository
+root with:
+
+    python benchmarks/rmr_replay.py xapp-rmr.rec                  # Recorded pace
+    python benchmarks/rmr_replay.py xapp-rmr.rec --speed 0 --loops 5 --json replay.json
+"""
+
+# Imports from other libraries
+from contextlib import redirect_stdout
+from time import perf_counter_ns, sleep
+import argparse
+import importlib
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Imports from local files
+from xapp_fakes import load_xapp, message
+
+CONTROLS = {"tracing": {"sample_rate": 0.0}, "recording": {"enabled": False}} # Unsampled tracing, and no recording of the replay
+
+class _Discard:
+    """
+    Output stream discarding the log lines of the xApp.
+    """
+    def write(self, text:str):
+        return len(text)
+
+    def flush(self):
+        pass
+
+def _percentiles(values:list) -> dict:
+    """
+    Returns the percentiles of a list of nanosecond durations, in microseconds.
+    """
+    values = sorted(values)
+    def percentile(p:float):
+        return values[min(len(values) - 1, int(p * len(values)))] / 1000 if values else None
+    return {
+        "p50_us": percentile(0.50),
+        "p90_us": percentile(0.90),
+        "p99_us": percentile(0.99),
+        "max_us": values[-1] / 1000 if values else None
+    }
+
+def replay(records:list, speed:float = 1.0, loops:int = 1) -> dict:
+    """
+    Dispatches the records into the handlers of a new xApp instance and returns the report.
+    """
+    module = load_xapp("xapp4", controls=CONTROLS)
+    with redirect_stdout(_Discard()):
+        xapp = module.XappRmrSubReact()
+    framework = xapp._rmrxapp
+    first = records[0].timestamp_ns
+    span_ns = records[-1].timestamp_ns - first
+    latencies = {} # Message type -> handler durations in ns
+    lateness = []
+    started = perf_counter_ns()
+    with redirect_stdout(_Discard()):
+        for _ in range(loops):
+            messages = [(record.timestamp_ns - first, record.mtype, message(record.mtype, payload=record.payload, meid=record.meid, sub_id=record.sub_id)) for record in records]
+            loop_start = perf_counter_ns()
+            for offset_ns, mtype, (summary, sbuf) in messages:
+                if speed > 0:
+                    due = loop_start + offset_ns / speed
+                    wait = due - perf_counter_ns()
+                    if wait > 0:
+                        sleep(wait / 1e9)
+                    lateness.append(max(0, perf_counter_ns() - due))
+                start = perf_counter_ns()
+                framework.dispatch(summary, sbuf)
+                latencies.setdefault(mtype, []).append(perf_counter_ns() - start)
+    seconds = (perf_counter_ns() - started) / 1e9
+    count = len(records) * loops
+    report = {
+        "messages": count,
+        "speed": speed if speed > 0 else "max",
+        "recorded_seconds": span_ns / 1e9,
+        "replay_seconds": seconds,
+        "messages_per_s": count / seconds,
+        "handler_seconds": sum(sum(values) for values in latencies.values()) / 1e9,
+        "mtypes": {mtype: dict(count=len(values), **_percentiles(values)) for mtype, values in sorted(latencies.items())},
+        "sends": framework.transport.sends,
+        "replies": framework.transport.replies,
+        "frees": framework.transport.frees
+    }
+    if lateness:
+        report["lateness"] = _percentiles(lateness)
+    return report
+
+def main():
+    """
+    Replays a recording and prints the report.
+    """
+    parser = argparse.ArgumentParser(description="Replays an RMR recording into the handlers of the reactive xApp.")
+    parser.add_argument("recording", help="Recording file made by the xApp.")
+    parser.add_argument("--speed", type=float, default=1.0, help="Pace relative to the recording, 0 for as fast as possible (default: %(default)s).")
+    parser.add_argument("--loops", type=int, default=1, help="Times the recording is replayed (default: %(default)s).")
+    parser.add_argument("--limit", type=int, help="Only replay the first messages of the recording.")
+    parser.add_argument("--json", help="Also write the report to this file.")
+    args = parser.parse_args()
+
+    load_xapp("xapp4") # Imports the xApp package, which holds the recording reader
+    records = list(importlib.import_module("xapp4.recorder").read_records(args.recording))[:args.limit]
+    if not records:
+        sys.exit("{} has no messages.".format(args.recording))
+    report = replay(records, speed=args.speed, loops=args.loops)
+
+    print("{} messages recorded over {:.3f} s, replayed in {:.3f} s at speed {}: {:.0f} messages/s, {:.3f} s in handlers.".format(
+        report["messages"], report["recorded_seconds"] * args.loops, report["replay_seconds"], report["speed"], report["messages_per_s"], report["handler_seconds"]))
+    print("{:<12}{:>10}{:>12}{:>12}{:>12}{:>12}".format("mtype", "count", "p50 us", "p90 us", "p99 us", "max us"))
+    for mtype, stats in report["mtypes"].items():
+        print("{:<12}{:>10}{:>12.1f}{:>12.1f}{:>12.1f}{:>12.1f}".format(mtype, stats["count"], stats["p50_us"], stats["p90_us"], stats["p99_us"], stats["max_us"]))
+    if "lateness" in report:
+        lateness = report["lateness"]
+        print("Dispatch lateness: p50 {:.1f} us, p99 {:.1f} us, max {:.1f} us.".format(lateness["p50_us"], lateness["p99_us"], lateness["max_us"]))
+    if args.json:
+        with open(args.json, "w") as output:
+            json.dump(report, output, indent=4)
+
+if __name__ == "__main__":
+    main()
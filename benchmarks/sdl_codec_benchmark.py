@@ -0,0 +1,97 @@
+
+"""
+Benchmark of the SDL value codecs of the reactive xApp (solution-xapps/xapp-4-rmr-sub-react/src/sdl_codec.py).
+
+Measures the encode and decode cost and the stored size of the value shapes the workshop xApps
+write to SDL. Run from the repository root with:
+
+    python benchmarks/sdl_codec_benchmark.py
+"""
+
+# Imports from other libraries
+from timeit import Timer
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "solution-xapps", "xapp-4-rmr-sub-react"))
+
+# Imports from local files
+from src.sdl_codec import MsgpackCodec, CompactCodec
+
+def subscription_response(node:int, instances:int = 1) -> dict:
+    """
+    Returns a subscription response as stored by the reactive xApp after the submgr notification.
+    """
+    return {
+        "SubscriptionId": "{:032x}".format(node * 7919),
+        "SubscriptionInstances": [
+            {
+                "XappEventInstanceId": 54321 + i,
+                "E2EventInstanceId": node * 100 + i,
+                "ErrorCause": "",
+                "ErrorSource": "",
+                "TimeoutType": ""
+            } for i in range(instances)
+        ]
+    }
+
+def subscription_request(node:int) -> dict:
+    """
+    Returns the subscription request body the reactive xApp sends to submgr.
+    """
+    return {
+        "SubscriptionId": "",
+        "ClientEndpoint": {"Host": "service-ricxapp-xapp4rmrsubreact-http.ricxapp", "HTTPPort": 8080, "RMRPort": 4560},
+        "Meid": "gnb_734_733_{:08x}".format(node),
+        "RANFunctionID": 1,
+        "E2SubscriptionDirectives": {"E2TimeoutTimerValue": 2, "E2RetryCount": 2, "RMRRoutingNeeded": True},
+        "SubscriptionDetails": [
+            {
+                "XappEventInstanceId": 54321,
+                "EventTriggers": [2],
+                "ActionToBeSetupList": [
+                    {
+                        "ActionID": 1,
+                        "ActionType": "insert",
+                        "ActionDefinition": [3],
+                        "SubsequentAction": {"SubsequentActionType": "continue", "TimeToWait": "w10ms"}
+                    }
+                ]
+            }
+        ]
+    }
+
+SHAPES = {
+    "loop counter": 29,
+    "transaction id": 54321,
+    "float metric": 0.25,
+    "subscription response": subscription_response(1),
+    "subscription response x16": subscription_response(1, instances=16),
+    "subscription request": subscription_request(1),
+    "responses of 100 nodes": {"gnb_{}".format(n): subscription_response(n) for n in range(100)}
+}
+
+def ns_per_op(func, arg) -> float:
+    """
+    Returns the best time per call of func(arg) in nanoseconds.
+    """
+    timer = Timer(lambda: func(arg))
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=5, number=number)) / number * 1e9
+
+def main():
+    """
+    Prints bytes stored, encode and decode cost per value shape and codec.
+    """
+    codecs = [MsgpackCodec(), CompactCodec()]
+    print("{:<28}{:<10}{:>10}{:>14}{:>14}".format("shape", "codec", "bytes", "encode ns/op", "decode ns/op"))
+    for shape, value in SHAPES.items():
+        for codec in codecs:
+            data = codec.encode(value)
+            assert codec.decode(data) == value
+            print("{:<28}{:<10}{:>10}{:>14.0f}{:>14.0f}".format(
+                shape, codec.name, len(data), ns_per_op(codec.encode, value), ns_per_op(codec.decode, data)
+            ))
+
+if __name__ == "__main__":
+    main()
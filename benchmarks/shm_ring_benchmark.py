@@ -0,0 +1,148 @@
+
+"""
+Benchmark of the hand-off of RIC indications from the RMR handler of the reactive xApp to analytics
+processes: the shared memory ring (solution-xapps/xapp-4-rmr-sub-react/src/shm_ring.py) against one
+multiprocessing.Queue per consumer, which pickles and copies every message through a pipe.
+
+The producer publishes --messages payloads of --payload-size bytes as fast as it can, and each of the
+--consumers processes reads every one of them and touches its bytes. For each transport the script
+reports the producer cost per message, the throughput of the slowest consumer and the percentiles of
+the latency from publication to read. Run from the repository root with:
+
+    python benchmarks/shm_ring_benchmark.py
+    python benchmarks/shm_ring_benchmark.py --consumers 4 --payload-size 4096 --policy overwrite
+"""
+
+# Imports from other libraries
+from multiprocessing import get_context
+from time import perf_counter, time_ns
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "solution-xapps", "xapp-4-rmr-sub-react"))
+
+# Imports from local files
+from src.shm_ring import ShmRing
+
+MTYPE = 12050
+MEID = b"gnb_734_733_b5c67788"
+END = -1 # Sub ID of the message ending a run
+
+def percentile(values:list, p:float) -> float:
+    return values[min(len(values) - 1, int(len(values) * p))] if values else 0.0
+
+def _report(results, index:int, count:int, lost:int, latencies:list, started:float):
+    """
+    Sends the throughput and latency percentiles (in microseconds) of a consumer to the parent.
+    """
+    latencies.sort()
+    results.put({
+        "consumer": index,
+        "read": count,
+        "lost": lost,
+        "rate": count / (perf_counter() - started) if count else 0.0,
+        "p50": percentile(latencies, 0.5) / 1e3,
+        "p99": percentile(latencies, 0.99) / 1e3
+    })
+
+# ------------------ CONSUMERS (run in their own process)
+
+def ring_consumer(name:str, index:int, ready, results):
+    ring = ShmRing.attach(name)
+    consumer = ring.consumer(index)
+    ready.put(index)
+    latencies, count, checksum, started = [], 0, 0, None
+    while True:
+        slot = consumer.read()
+        if slot.sub_id == END:
+            break
+        started = started if started is not None else perf_counter()
+        checksum += slot.payload[0] + slot.payload[-1] # Read in place
+        latencies.append(time_ns() - int(slot.timestamp * 1e9))
+        count += 1
+    _report(results, index, count, consumer.lost, latencies, started or perf_counter())
+    consumer.close()
+    ring.close()
+
+def queue_consumer(queue, index:int, ready, results):
+    ready.put(index)
+    latencies, count, checksum, started = [], 0, 0, None
+    while True:
+        mtype, meid, sub_id, timestamp, payload = queue.get()
+        if sub_id == END:
+            break
+        started = started if started is not None else perf_counter()
+        checksum += payload[0] + payload[-1]
+        latencies.append(time_ns() - timestamp)
+        count += 1
+    _report(results, index, count, 0, latencies, started or perf_counter())
+
+# ------------------ RUNS
+
+def run(transport:str, args) -> dict:
+    """
+    Publishes the messages through transport ("ring" or "queue") and returns the producer cost and the consumer results.
+    """
+    context = get_context("spawn")
+    ready, results = context.Queue(), context.Queue()
+    payload = os.urandom(args.payload_size)
+    ring, queues = None, []
+    if transport == "ring":
+        ring = ShmRing("xapp-bench-ring-{}".format(os.getpid()), slots=args.slots, slot_size=args.payload_size,
+                       consumers=args.consumers, policy=args.policy, block_timeout=1.0)
+        processes = [context.Process(target=ring_consumer, args=(ring.name, i, ready, results)) for i in range(args.consumers)]
+    else:
+        queues = [context.Queue() for _ in range(args.consumers)]
+        processes = [context.Process(target=queue_consumer, args=(queues[i], i, ready, results)) for i in range(args.consumers)]
+    for process in processes:
+        process.start()
+    for _ in processes:
+        ready.get()
+
+    started = perf_counter()
+    for _ in range(args.messages):
+        if ring is not None:
+            ring.publish(payload, MTYPE, MEID, 1)
+        else:
+            message = (MTYPE, MEID, 1, time_ns(), payload)
+            for queue in queues: # Every consumer receives every message, as from the ring
+                queue.put(message)
+    producer = perf_counter() - started
+    if ring is not None:
+        while not ring.publish(b"", MTYPE, MEID, END): # With the block policy, waits for the consumers to catch up
+            pass
+    else:
+        for queue in queues:
+            queue.put((MTYPE, MEID, END, time_ns(), b""))
+
+    consumers = sorted((results.get() for _ in processes), key=lambda result: result["consumer"])
+    for process in processes:
+        process.join()
+    stats = ring.stats() if ring is not None else {}
+    if ring is not None:
+        ring.close()
+    return {"transport": transport, "producer_us": producer / args.messages * 1e6, "consumers": consumers,
+            "dropped": stats.get("dropped", 0)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of the shared memory ring against multiprocessing queues.")
+    parser.add_argument("--messages", type=int, default=200000, help="Messages published per run (default: %(default)s).")
+    parser.add_argument("--payload-size", type=int, default=512, help="Payload size in bytes (default: %(default)s).")
+    parser.add_argument("--consumers", type=int, default=2, help="Consumer processes, each reading every message (default: %(default)s).")
+    parser.add_argument("--slots", type=int, default=4096, help="Slots of the ring (default: %(default)s).")
+    parser.add_argument("--policy", default="block", choices=["block", "overwrite"], help="Ring policy when full (default: %(default)s).")
+    args = parser.parse_args()
+
+    print("{:<8}{:>14}{:>16}{:>10}{:>12}{:>12}".format("", "producer us", "slowest msg/s", "lost", "p50 us", "p99 us"))
+    for transport in ("ring", "queue"):
+        result = run(transport, args)
+        consumers = result["consumers"]
+        print("{:<8}{:>14.2f}{:>16.0f}{:>10}{:>12.0f}{:>12.0f}".format(
+            transport, result["producer_us"], min(c["rate"] for c in consumers),
+            sum(c["lost"] for c in consumers) + result["dropped"],
+            max(c["p50"] for c in consumers), max(c["p99"] for c in consumers)
+        ))
+
+if __name__ == "__main__":
+    main()
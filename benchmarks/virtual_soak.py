@@ -0,0 +1,132 @@
+
+"""
+Soak run of the loop of a polling workshop xApp (solution-xapps/xapp-1, -2 or -3) on a virtual
+clock, in-process with the fake RMR transport and fake SDL of xapp_fakes.py.
+
+The scheduler of the xApp runs its 1 second loop (and, in xApp 2, the SDL cache flushes) and waits
+on a VirtualClock that advances instantly, so hours of iterations take seconds, and every run of the
+same scenario sees the same times (e.g. the same counter windows).
+The report gives the virtual and real time, the iterations per real second and the state of the
+xApp at the end; with --memory it also samples the memory held by the process every --sample
+virtual seconds, which shows growth over a long run. Run from the repository root with:
+
+    python benchmarks/virtual_soak.py --xapp xapp2 --hours 24
+    python benchmarks/virtual_soak.py --xapp xapp3 --hours 1 --memory --sample 300 --json soak.json
+"""
+
+# Imports from other libraries
+from contextlib import redirect_stdout
+from time import perf_counter
+import argparse
+import importlib
+import json
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Imports from local files
+from xapp_fakes import load_xapp, message
+
+CONTROLS = {"tracing": {"sample_rate": 0.0}} # Unsampled tracing, as for almost every message in production
+CLASSES = {"xapp1": "XappDeployTest", "xapp2": "XappLogSdlRest", "xapp3": "XappRmrSubAct"}
+
+class _Discard:
+    """
+    Output stream discarding the log lines of the xApp.
+    """
+    def write(self, text:str):
+        return len(text)
+
+    def flush(self):
+        pass
+
+def soak(name:str, seconds:float, memory:bool = False, sample:float = 600.0) -> dict:
+    """
+    Runs the loop of an xApp for the given virtual seconds and returns the report.
+    """
+    module = load_xapp(name, controls=CONTROLS)
+    clock = importlib.import_module(name + ".clock").VirtualClock()
+    with redirect_stdout(_Discard()):
+        xapp = getattr(module, CLASSES[name])(clock=clock)
+        if name == "xapp2": # SDL set-up of the entrypoint, the fake SDL blocks publishers until the listener runs
+            xapp._sdl_index.seed()
+            xapp._sdl_index.subscribe()
+            xapp._xapp.sdl.start_event_listener()
+    framework = xapp._xapp
+    scheduler = xapp._scheduler
+
+    iterations = 0
+    def counted_iteration():
+        nonlocal iterations
+        iterations += 1
+        if name == "xapp3": # The reactive xApp answered the message of the previous iteration
+            framework.inject(*message(30001, payload=b"Received message correctly"))
+        xapp._loop_iteration()
+    scheduler.fixed_rate("xapp-loop", 1, counted_iteration, initial_delay=0) # As scheduled by the entrypoint
+    if name == "xapp2":
+        xapp._sdl_cache.start(scheduler)
+
+    samples = []
+    def take_sample():
+        samples.append({"virtual_seconds": clock.monotonic(), "traced_bytes": tracemalloc.get_traced_memory()[0]})
+        clock.call_later(sample, take_sample)
+    clock.call_at(seconds, scheduler.stop)
+    if memory:
+        tracemalloc.start()
+        clock.call_at(0.0, take_sample)
+
+    started = perf_counter()
+    with redirect_stdout(_Discard()):
+        scheduler.run()
+    real = perf_counter() - started
+    if memory:
+        tracemalloc.stop()
+
+    report = {
+        "xapp": name,
+        "virtual_seconds": clock.monotonic(),
+        "real_seconds": real,
+        "speedup": clock.monotonic() / real,
+        "iterations": iterations,
+        "iterations_per_s": iterations / real
+    }
+    loop = scheduler.stats()["tasks"]["xapp-loop"]
+    report["skipped_iterations"] = loop["skipped"] # Due runs the scheduler could not start in time
+    report["max_lateness"] = loop["max_lateness"] # Virtual seconds, 0 unless an iteration advanced the clock
+    if name == "xapp2":
+        report["sdl_cache_flushes"] = xapp._sdl_cache.stats()["flushes"]
+        report["xapp-loops"] = xapp._loop_counter.value() # Restarts every counter window
+        report["xapp-deletes"] = xapp._reset_counter.value() # Windows closed by this replica
+        report["expected_deletes"] = int(clock.time() // xapp._loop_counter.window) - int(clock.epoch // xapp._loop_counter.window)
+    if name in ("xapp2", "xapp3"):
+        report["rmr_sends"] = framework.transport.sends
+        report["rmr_frees"] = framework.transport.frees
+    if samples:
+        report["memory"] = samples
+        report["memory_growth_bytes"] = samples[-1]["traced_bytes"] - samples[0]["traced_bytes"]
+    return report
+
+def main():
+    """
+    Runs the soak and prints the report.
+    """
+    parser = argparse.ArgumentParser(description="Soak run of a workshop xApp loop on a virtual clock.")
+    parser.add_argument("--xapp", choices=sorted(CLASSES), default="xapp2", help="xApp whose loop runs (default: %(default)s).")
+    parser.add_argument("--hours", type=float, default=1.0, help="Virtual hours to run (default: %(default)s).")
+    parser.add_argument("--memory", action="store_true", help="Sample the traced memory (slows the run down).")
+    parser.add_argument("--sample", type=float, default=600.0, help="Virtual seconds between memory samples (default: %(default)s).")
+    parser.add_argument("--json", help="Also write the report to this file.")
+    args = parser.parse_args()
+
+    report = soak(args.xapp, args.hours * 3600, memory=args.memory, sample=args.sample)
+    for key, value in report.items():
+        if key != "memory":
+            print("{:<24}{}".format(key, round(value, 3) if isinstance(value, float) else value))
+    if args.json:
+        with open(args.json, "w") as output:
+            json.dump(report, output, indent=4)
+
+if __name__ == "__main__":
+    main()
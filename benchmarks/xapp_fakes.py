@@ -0,0 +1,275 @@
+
+"""
+Fake RIC platform for driving the workshop xApps in-process, without RMR, Redis or Kubernetes.
+
+The framework classes imported by each custom_xapp.py (Xapp and RMRXapp) are replaced by fakes with
+the same interface: RMR sends and replies are recorded by a FakeRmrTransport instead of being sent,
+received messages are injected with inject(), SDL is the framework SDLWrapper with use_fake_sdl=True,
+and the framework HTTP server serves nothing (its handlers are called directly). Used by the
+benchmarks in this directory.
+"""
+
+# Imports from OSC libraries
+from ricxappframe.xapp_frame import rmr
+from ricxappframe.xapp_sdl import SDLWrapper
+from ricxappframe import xapp_rest
+from mdclogpy import Logger
+
+# Imports from other libraries
+from collections import deque
+from threading import Thread
+import importlib
+import importlib.util
+import json
+import os
+import sys
+
+SOLUTIONS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "solution-xapps")
+
+XAPPS = {
+    "xapp1": "xapp-1-deploy-test",
+    "xapp2": "xapp-2-log-sdl-rest",
+    "xapp3": "xapp-3-rmr-sub-act",
+    "xapp4": "xapp-4-rmr-sub-react"
+}
+
+class FakeRmrTransport:
+    """
+    Records the RMR sends, replies and frees of an xApp instead of handing them to RMR.
+
+    Parameters
+    ----------
+    keep: int = 1000
+        Most recent sends and replies kept (older ones are only counted).
+    """
+    def __init__(self, keep:int = 1000):
+        """
+        Initializes an empty transport.
+        """
+        self.sent = deque(maxlen=keep) # (payload, mtype) of the messages sent
+        self.replied = deque(maxlen=keep) # (payload, mtype) of the replies (None when unchanged)
+        self.sends = 0
+        self.replies = 0
+        self.frees = 0
+        self.fail = False # True to make every send and reply fail
+
+    def send(self, payload:bytes, mtype:int) -> bool:
+        """
+        Records a send.
+        """
+        self.sends += 1
+        self.sent.append((payload, mtype))
+        return not self.fail
+
+    def reply(self, sbuf, payload:bytes, mtype:int) -> bool:
+        """
+        Records a return to sender.
+        """
+        self.replies += 1
+        self.replied.append((payload, mtype))
+        return not self.fail
+
+class FakeSbuf:
+    """
+    Stand-in for an RMR message buffer, only carrying its summary.
+
+    Parameters
+    ----------
+    summary: dict
+        Message summary, as returned by rmr.message_summary().
+    """
+    def __init__(self, summary:dict):
+        """
+        Initializes the buffer.
+        """
+        self.summary = summary
+        self.freed = False
+
+def message(mtype:int, payload:bytes = b"", meid:bytes = b"", xaction:bytes = b"00000000000000000000000000000001", sub_id:int = -1) -> tuple:
+    """
+    Returns a (summary, sbuf) pair of a received RMR message, as yielded by rmr_get_messages().
+    """
+    summary = {
+        rmr.RMR_MS_PAYLOAD: payload,
+        rmr.RMR_MS_PAYLOAD_LEN: len(payload),
+        rmr.RMR_MS_MSG_TYPE: mtype,
+        rmr.RMR_MS_SUB_ID: sub_id,
+        rmr.RMR_MS_TRN_ID: xaction,
+        rmr.RMR_MS_MSG_STATE: 0,
+        rmr.RMR_MS_MSG_STATUS: "RMR_OK",
+        rmr.RMR_MS_PAYLOAD_MAX: 4096,
+        rmr.RMR_MS_MEID: meid,
+        rmr.RMR_MS_MSG_SOURCE: b"fake-sender:4560",
+        rmr.RMR_MS_ERRNO: 0
+    }
+    return summary, FakeSbuf(summary)
+
+class _FakeBaseXapp:
+    """
+    Fake of the framework _BaseXapp: fake SDL, recorded RMR traffic and the config file of the xApp.
+
+    Parameters
+    ----------
+    config_data: dict
+        Content of the xApp config file (config-file.json).
+    nodes: list = None
+        Inventory names returned by GetListNodebIds().
+    """
+    def __init__(self, config_data:dict, nodes:list = None):
+        """
+        Initializes the fake framework object.
+        """
+        self.logger = Logger(name="FakeXapp")
+        self._mrc = None # No RMR context, every RMR call goes through the methods below
+        self.sdl = SDLWrapper(use_fake_sdl=True)
+        self._config_data = config_data
+        self.transport = FakeRmrTransport()
+        self._queue = deque() # (summary, sbuf) pairs waiting to be read
+        self._nodes = nodes if nodes is not None else []
+        self._rmr_loop = _FakeRmrLoop()
+
+    def inject(self, summary:dict, sbuf):
+        """
+        Queues a received message for rmr_get_messages().
+        """
+        self._queue.append((summary, sbuf))
+
+    def rmr_get_messages(self):
+        """
+        Yields the queued messages.
+        """
+        while self._queue:
+            yield self._queue.popleft()
+
+    def rmr_send(self, payload:bytes, mtype:int, retries:int = 100) -> bool:
+        """
+        Records a send.
+        """
+        return self.transport.send(payload, mtype)
+
+    def rmr_rts(self, sbuf, new_payload:bytes = None, new_mtype:int = None, retries:int = 100) -> bool:
+        """
+        Records a return to sender.
+        """
+        return self.transport.reply(sbuf, new_payload, new_mtype)
+
+    def rmr_free(self, sbuf):
+        """
+        Marks the buffer as freed.
+        """
+        self.transport.frees += 1
+        sbuf.freed = True
+
+    def GetListNodebIds(self) -> list:
+        """
+        Returns the fake E2 nodes.
+        """
+        return [_NodebId(name) for name in self._nodes]
+
+    def healthcheck(self) -> bool:
+        return True
+
+    def run(self, *args, **kwargs):
+        pass
+
+    def stop(self):
+        pass
+
+class _FakeRmrLoop:
+    """
+    Stand-in for the framework RmrLoop, whose receive thread is never started.
+    """
+    def __init__(self):
+        self._thread = Thread(target=lambda: None, name="fake-rmr-loop")
+
+class _NodebId:
+    """
+    Stand-in for the R-NIB NbIdentity of an E2 node.
+    """
+    def __init__(self, inventory_name:str):
+        self.inventory_name = inventory_name
+
+def fake_framework(config_data:dict, nodes:list = None):
+    """
+    Returns fake Xapp and RMRXapp classes bound to a config file and a list of E2 nodes.
+    """
+    class FakeXapp(_FakeBaseXapp):
+        """
+        Fake of the framework Xapp (polling model).
+        """
+        def __init__(self, entrypoint, rmr_port=4562, rmr_wait_for_ready=True, use_fake_sdl=False):
+            super().__init__(config_data, nodes)
+            self._entrypoint = entrypoint
+
+    class FakeRMRXapp(_FakeBaseXapp):
+        """
+        Fake of the framework RMRXapp (reactive model). dispatch() runs a message like the RMRXapp loop does.
+        """
+        def __init__(self, default_handler, config_handler=None, rmr_port=4562, rmr_wait_for_ready=True, use_fake_sdl=False, post_init=None):
+            super().__init__(config_data, nodes)
+            self._default_handler = default_handler
+            self._config_handler = config_handler
+            self._dispatch = {}
+            if post_init:
+                post_init(self)
+
+        def register_callback(self, handler, message_type):
+            self._dispatch[message_type] = handler
+
+        def dispatch(self, summary:dict, sbuf):
+            """
+            Calls the handler of a received message, as RMRXapp.run() does.
+            """
+            self._dispatch.get(summary[rmr.RMR_MS_MSG_TYPE], self._default_handler)(self, summary, sbuf)
+
+    return FakeXapp, FakeRMRXapp
+
+class _UnboundHTTPServer:
+    """
+    Replacement for the http.server.HTTPServer of the framework REST server: binds no port and serves nothing.
+    """
+    def __init__(self, address, handler):
+        self.server_address = address
+        self.socket = self
+
+    def serve_forever(self):
+        pass
+
+    def close(self):
+        pass
+
+    def server_close(self):
+        pass
+
+    def shutdown(self):
+        pass
+
+def load_xapp(name:str, nodes:list = None, controls:dict = None):
+    """
+    Imports the src package of a workshop xApp (e.g. "xapp4") under its own name, with the fake
+    framework, and returns its custom_xapp module. controls overrides sections of the "controls" of
+    its config file.
+    """
+    folder = os.path.join(SOLUTIONS, XAPPS[name])
+    with open(os.path.join(folder, "init", "config-file.json")) as config_file:
+        config_data = json.load(config_file)
+    config_data.setdefault("controls", {}).update(controls if controls is not None else {})
+
+    if name not in sys.modules: # Every xApp package is called src, so each one is imported under the xApp name
+        spec = importlib.util.spec_from_file_location(name, os.path.join(folder, "src", "__init__.py"),
+                                                      submodule_search_locations=[os.path.join(folder, "src")])
+        package = importlib.util.module_from_spec(spec)
+        sys.modules[name] = package
+        spec.loader.exec_module(package)
+    module = importlib.import_module(name + ".custom_xapp")
+
+    xapp_rest.ThreadedHTTPServer.server_class = _UnboundHTTPServer
+    module.Xapp, module.RMRXapp = fake_framework(config_data, nodes)
+    return module
+
+def rest_callback(xapp, method:str, name:str):
+    """
+    Returns the callback registered by an xApp for a REST handler name, as wrapped by its instrumentation.
+    Handlers are registered on the framework handler class, so look them up right after creating the xApp.
+    """
+    return xapp.http_server.handler.handlers[method][name]['cb']
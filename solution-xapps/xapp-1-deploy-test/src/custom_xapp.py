@@ -4,10 +4,12 @@ from ricxappframe.xapp_frame import Xapp, rmr
 from mdclogpy import Logger, Level
 
 # Imports from other libraries
-from time import sleep
-from threading import Thread
 import signal
 
+# Imports from local files
+from .clock import Clock
+from .scheduler import Scheduler
+
 class XappDeployTest:
     """
     Custom xApp class.
@@ -16,8 +18,10 @@ class XappDeployTest:
     ----------
     thread: bool = True
         Flag for executing the xApp loop as a thread. Default is True.
+    clock: Clock = None
+        Source of time of the scheduled loop (the system clock by default, a VirtualClock in tests and benchmarks).
     """
-    def __init__(self, thread:bool = True):
+    def __init__(self, thread:bool = True, clock:Clock = None):
         """
         Initializes the custom xApp instance and instatiates the xApp framework object.
         """
@@ -39,8 +43,10 @@ class XappDeployTest:
         signal.signal(signal.SIGINT, self._handle_signal)
 
         # Initializing custom control variables
-        self._shutdown = False # Stops the xApp loop if True
         self._thread = thread # True for executing the xApp loop as a thread
+        self._clock = clock if clock is not None else Clock() # Every wait of the scheduler goes through it
+        self._scheduler = Scheduler(clock=self._clock, logger=self.logger) # Runs the xApp loop each second
+        self._loops = 0 # How many times we looped
     
     def _entrypoint(self, xapp:Xapp):
         """
@@ -51,22 +57,20 @@ class XappDeployTest:
         xapp: Xapp
             This is the xApp framework object (passed by the framework).
         """ 
+        self._scheduler.fixed_rate("xapp-loop", 1, self._loop_iteration, initial_delay=0) # Every second, without drifting
         if self._thread:
             self.logger.info("Starting xApp loop in threaded mode.")
-            Thread(target=self._loop).start()
+            self._scheduler.start()
         else:
             self.logger.info("Starting xApp loop in non-threaded mode.")
-            self._loop()
+            self._scheduler.run()
         
-    def _loop(self):
+    def _loop_iteration(self):
         """
-        Loops logging an increasing counter each second.
+        Logs an increasing counter. Run by the scheduler each second.
         """
-        i = 1 # How many times we looped
-        while not self._shutdown: # True since custom xApp initialization until stop() is called
-            self.logger.info("Looped {} times.".format(i))
-            i+=1
-            sleep(1) # Sleeps for 1 second
+        self._loops += 1
+        self.logger.info("Looped {} times.".format(self._loops))
 
     def _handle_signal(self, signum: int, frame):
         """
@@ -85,6 +89,6 @@ class XappDeployTest:
         """
         Terminates the xApp. Can only be called if the xApp is running in threaded mode.
         """
-        self._shutdown = True
+        self._scheduler.stop()
         self.logger.info("Calling framework termination to unregister the xApp from AppMgr.")
         self._xapp.stop()
\ No newline at end of file
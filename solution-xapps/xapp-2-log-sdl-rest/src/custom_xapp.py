@@ -4,10 +4,21 @@ from ricxappframe.xapp_frame import Xapp, rmr
 from mdclogpy import Logger, Level
 from ricxappframe import xapp_rest
 
+# Imports from local files
+from .sdl_cache import SdlWriteBehindCache
+from .sdl_index import SdlPrefixIndex
+from .sdl_counter import SdlShardedCounter
+from .sdl_batch import SdlBatch
+from .sdl_snapshot import SdlSnapshot
+from .rest_stream import StreamingHTTPServer
+from .metrics import MetricsRegistry
+from .profiler import SamplingProfiler
+from .clock import Clock
+from .scheduler import Scheduler
+
 # Imports from other libraries
-from time import sleep
-from threading import Thread
 import signal
+from urllib.parse import urlparse, parse_qs
 import json
 import requests
 
@@ -19,8 +30,10 @@ class XappLogSdlRest:
     ----------
     thread: bool = True
         Flag for executing the xApp loop as a thread. Default is True.
+    clock: Clock = None
+        Source of time of the scheduled tasks (the system clock by default, a VirtualClock in tests and benchmarks).
     """
-    def __init__(self, thread:bool = True):
+    def __init__(self, thread:bool = True, clock:Clock = None):
         """
         Initializes the custom xApp instance and instatiates the xApp framework object.
         """
@@ -30,28 +43,105 @@ class XappLogSdlRest:
         #self.logger.get_env_params_values() # Getting the MDC key-value pairs from the environment
         self.logger.info("Initializing the xApp.")
 
+        # Source of time of the scheduled tasks and of the counter windows (the system clock unless one is given)
+        self._clock = clock if clock is not None else Clock()
+
         # Instatiating the xApp framework object 
         self._xapp = Xapp(entrypoint=self._entrypoint, # Custom entrypoint for starting the framework xApp object
                                  rmr_port=4560, # Port for RMR data
                                  rmr_wait_for_ready=True, # Block xApp initiation until RMR is ready
                                  use_fake_sdl=False) # Use a fake in-memory SDL
 
+        # Scheduler running every periodic task of the xApp (the loop, the SDL cache flushes) on one thread
+        scheduler_config = self._xapp._config_data.get("controls", {}).get("scheduler", {})
+        self._scheduler = Scheduler(
+            clock=self._clock,
+            tick=scheduler_config.get("tick", 0.01), # Resolution of the timers, in seconds
+            workers=scheduler_config.get("workers", 0), # 0 runs the tasks on the scheduler thread
+            max_queued=scheduler_config.get("max_queued", 16), # Runs waiting for a worker before runs are skipped
+            logger=self.logger
+        )
+
+        # Metrics registry, instrumenting the RMR sends and the SDL calls of the framework
+        self._metrics = MetricsRegistry()
+        self._metrics.instrument_rmr(self._xapp)
+        self._metrics.instrument_sdl(self._xapp.sdl) # Also times the multi-key calls of the SDL helpers below
+
+        # Sampling profiler of every thread, started by POST and read by GET /ric/v1/debug/profile
+        self._profiler = SamplingProfiler()
+
+        # Prefix index of the xApp's SDL namespace (prefix queries are answered from memory instead of scanning SDL)
+        self._sdl_index = SdlPrefixIndex(sdl=self._xapp.sdl, namespace="xapp2logsdlrest", logger=self.logger)
+
+        # Write-behind cache for the xApp's SDL namespace (reads are local after the first fetch, writes are batched)
+        cache_config = self._xapp._config_data.get("controls", {}).get("sdl_cache", {})
+        self._sdl_cache = SdlWriteBehindCache(
+            sdl=self._xapp.sdl,
+            namespace="xapp2logsdlrest",
+            flush_interval=cache_config.get("flush_interval", 5.0), # Seconds between batched writes
+            max_dirty=cache_config.get("max_dirty", 100), # Pending keys that force an early flush
+            logger=self.logger,
+            index=self._sdl_index # Keeps the index current and publishes change events on flush
+        )
+
+        # Executes bulk SDL mutations received over REST with as few round trips as possible
+        self._sdl_batch = SdlBatch(sdl=self._xapp.sdl, index=self._sdl_index)
+
+        # Streams the xApp's SDL namespace to and from newline-delimited JSON snapshots
+        snapshot_config = self._xapp._config_data.get("controls", {}).get("sdl_snapshot", {})
+        self._sdl_snapshot = SdlSnapshot(
+            sdl=self._xapp.sdl,
+            index=self._sdl_index,
+            batch=self._sdl_batch,
+            page_size=snapshot_config.get("page_size", 500), # Keys read per SDL round trip on export
+            batch_size=snapshot_config.get("batch_size", 500), # Records written per SDL round trip on import
+            logger=self.logger
+        )
+
+        # Sharded SDL counters, safe to increment from many replicas (xapp-loops restarts every window)
+        counter_config = self._xapp._config_data.get("controls", {}).get("counters", {})
+        self._loop_counter = SdlShardedCounter(
+            sdl=self._xapp.sdl,
+            cache=self._sdl_cache, # Batches the increments and publishes them to the other replicas as deltas
+            name="xapp-loops",
+            shards=counter_config.get("shards", 8), # Shard keys per window
+            window=counter_config.get("window", 30), # Seconds before the count restarts
+            logger=self.logger,
+            clock=self._clock
+        )
+        self._reset_counter = SdlShardedCounter(
+            sdl=self._xapp.sdl,
+            cache=self._sdl_cache,
+            name="xapp-deletes",
+            shards=counter_config.get("shards", 8),
+            logger=self.logger,
+            clock=self._clock
+        )
+
         # Registering a handler for terminating the xApp after TERMINATE, QUIT, or INTERRUPT signals
         signal.signal(signal.SIGTERM, self._handle_signal)
         signal.signal(signal.SIGQUIT, self._handle_signal)
         signal.signal(signal.SIGINT, self._handle_signal)
 
         # Initializing custom control variables
-        self._shutdown = False # Stops the xApp loop if True
         self._thread = thread # True for executing the xApp loop as a thread
         self._ready = False # True when the xApp is ready to start
 
-        # Starting a threaded HTTP server listening to any host at port 8080 
-        self.http_server = xapp_rest.ThreadedHTTPServer("0.0.0.0", 8080)
+        # Starting a threaded HTTP server listening to any host at port 8080 (the framework server, plus streamed bodies)
+        self.http_server = StreamingHTTPServer("0.0.0.0", 8080)
         self.http_server.handler.add_handler(self.http_server.handler, method="GET", name="config", uri="/ric/v1/config", callback=self.config_handler)
         self.http_server.handler.add_handler(self.http_server.handler, method="GET", name="liveness", uri="/ric/v1/health/alive", callback=self.liveness_handler)
         self.http_server.handler.add_handler(self.http_server.handler, method="GET", name="readiness", uri="/ric/v1/health/ready", callback=self.readiness_handler)
         self.http_server.handler.add_handler(self.http_server.handler, method="POST", name="sdl_delete", uri="/ric/v1/reset_count", callback=self.sdl_delete_handler)
+        self.http_server.handler.add_handler(self.http_server.handler, method="GET", name="sdl_cache_stats", uri="/ric/v1/sdl/cache_stats", callback=self.sdl_cache_stats_handler)
+        self.http_server.handler.add_handler(self.http_server.handler, method="POST", name="sdl_batch", uri="/ric/v1/sdl/batch", callback=self.sdl_batch_handler)
+        self.http_server.handler.add_handler(self.http_server.handler, method="GET", name="sdl_export", uri="/ric/v1/sdl/export", callback=self.sdl_export_handler)
+        self.http_server.handler.add_streaming_handler(self.http_server.handler, method="POST", name="sdl_import", uri="/ric/v1/sdl/import", callback=self.sdl_import_handler)
+        self.http_server.handler.add_handler(self.http_server.handler, method="GET", name="metrics", uri="/ric/v1/metrics", callback=self.metrics_handler)
+        self.http_server.handler.add_handler(self.http_server.handler, method="GET", name="profile", uri="/ric/v1/debug/profile", callback=self.profile_handler)
+        self.http_server.handler.add_handler(self.http_server.handler, method="POST", name="profile_control", uri="/ric/v1/debug/profile", callback=self.profile_control_handler)
+        self.http_server.handler.add_handler(self.http_server.handler, method="GET", name="scheduler", uri="/ric/v1/debug/scheduler", callback=self.scheduler_handler)
+        self._metrics.instrument_rest(self.http_server.handler) # Counts and times every handler above
         self.logger.info("Starting HTTP server.")
         self.http_server.start()  
 
@@ -72,32 +162,33 @@ class XappLogSdlRest:
         # Logging the config file
         self.logger.info("Config file:" + str(self._xapp._config_data))
 
-        # Logging the list of registered xApps (got from AppMgr)
-        xapp_list = requests.get("http://service-ricplt-appmgr-http.ricplt:8080/ric/v1/xapps")
+        # Logging the list of registered xApps (got from AppMgr, or from the local stand-in set in controls.platform)
+        appmgr_url = self._xapp._config_data.get("controls", {}).get("platform", {}).get("appmgr_url", "http://service-ricplt-appmgr-http.ricplt:8080/ric/v1")
+        xapp_list = requests.get(appmgr_url + "/xapps")
         self.logger.info("List of registered xApps: " + str(xapp_list.json()))
         
-        # Starting the xApp loop
+        # Seeding the SDL index once and following the changes published by other writers
+        self.logger.info("Seeding the SDL index.")
+        self._sdl_index.seed()
+        self._sdl_index.subscribe()
+        self._xapp.sdl.start_event_listener()
+
+        # Scheduling the SDL cache flushes
+        self.logger.info("Starting SDL cache flusher.")
+        self._sdl_cache.start(self._scheduler)
+
+        # Scheduling the xApp loop every second, at a fixed rate so its run time does not add up
         self.logger.info("Starting xApp loop in threaded mode.")
-        Thread(target=self._loop).start()
-
-    def _loop(self):
-        """
-        Loops logging an increasing counter each second.
-        """    
-        while not self._shutdown: # True since custom xApp initialization until stop() is called
-            n_loops = self._xapp.sdl_get(namespace="xapp2logsdlrest", key="xapp-loops")
-            if n_loops is None:
-                n_loops = 0
-            n_loops += 1
-            self._xapp.sdl_set(namespace="xapp2logsdlrest", key="xapp-loops", value=n_loops)
-            if n_loops >= 30:
-                self._xapp.sdl_delete(namespace="xapp2logsdlrest", key="xapp-loops")
-                n_resets = self._xapp.sdl_get(namespace="xapp2logsdlrest", key="xapp-deletes")
-                if n_resets is None:
-                    n_resets = 0
-                self._xapp.sdl_set(namespace="xapp2logsdlrest", key="xapp-deletes", value=n_resets+1)
-            self.logger.info(self._xapp.sdl_find_and_get(namespace="xapp2logsdlrest", prefix="xapp"))
-            sleep(1) # Sleeps for 1 second  
+        self._scheduler.fixed_rate("xapp-loop", 1, self._loop_iteration, initial_delay=0)
+        self._scheduler.start()
+
+    def _loop_iteration(self):
+        """
+        Logs an increasing counter. Run by the scheduler each second.
+        """
+        self._loop_counter.add() # Batched in the SDL cache and added atomically to one shard on flush
+        self._reset_counter.add(self._loop_counter.close_windows()) # Counts the finished windows closed by this replica
+        self.logger.info({"xapp-loops": self._loop_counter.value(), "xapp-deletes": self._reset_counter.value()})
 
     def _handle_signal(self, signum: int, frame):
         """
@@ -166,7 +257,7 @@ class XappLogSdlRest:
         self.logger.info("Received POST /ric/v1/reset_count request with content type {}.".format(ctype))
         data_dict = json.loads(data)
         self.logger.debug("Received payload {}".format(data_dict))
-        self._xapp.sdl_set(namespace="xapp2logsdlrest", key="xapp-deletes", value=data_dict["xapp-deletes"])
+        self._reset_counter.reset(value=data_dict["xapp-deletes"]) # Written and published right away
         response = xapp_rest.initResponse(
             status=200, # Status = 200 OK
             response="SDL delete"
@@ -174,6 +265,167 @@ class XappLogSdlRest:
         response['payload'] = "Updated xapp-deletes successfully."
         return response
 
+    def sdl_batch_handler(self, name:str, path:str, data:bytes, ctype:str):
+        """
+        Handler for the HTTP POST /ric/v1/sdl/batch request.
+        Body: {"namespace": str (optional), "operations": [{"op": "set" | "delete" | "set_if" | "set_if_not_exists" | "delete_if", "key": str, "value": ..., "old_value": ...}]}
+        """
+        self.logger.info("Received POST /ric/v1/sdl/batch request with content type {}.".format(ctype))
+        try:
+            body = json.loads(data)
+        except ValueError:
+            body = None
+        error = self._sdl_batch.validate(body.get("operations")) if isinstance(body, dict) else "body must be a JSON object"
+        namespace = body.get("namespace", "xapp2logsdlrest") if isinstance(body, dict) else None
+        if error is None and namespace != "xapp2logsdlrest":
+            error = "namespace {} is not owned by this xApp".format(namespace)
+        if error is not None:
+            response = xapp_rest.initResponse(
+                status=400, # Status = 400 Bad Request
+                response="SDL batch"
+            )
+            response['payload'] = json.dumps({"error": error})
+            return response
+        result = self._sdl_batch.execute(namespace, body["operations"])
+        self.logger.debug("Executed {} SDL operations in {} round trips.".format(len(body["operations"]), result["round_trips"]))
+        response = xapp_rest.initResponse(
+            status=200, # Status = 200 OK
+            response="SDL batch"
+        )
+        response['payload'] = json.dumps(result) # Payload = per-operation results
+        return response
+
+    def sdl_export_handler(self, name:str, path:str, data:bytes, ctype:str):
+        """
+        Handler for the HTTP GET /ric/v1/sdl/export[?prefix=<key prefix>] request.
+        Streams the namespace as newline-delimited JSON records, one page of keys at a time.
+        """
+        self.logger.info("Received GET /ric/v1/sdl/export request with content type {}.".format(ctype))
+        prefix = parse_qs(urlparse(path).query).get("prefix", [""])[0]
+        self._sdl_cache.flush() # The snapshot includes the writes and increments still pending in memory
+        response = xapp_rest.initResponse(
+            status=200, # Status = 200 OK
+            response="SDL export"
+        ) # Initiating HTTP response
+        response['ctype'] = "application/x-ndjson"
+        response['mode'] = "stream" # Sent with chunked transfer encoding as the pages are read
+        response['payload'] = self._sdl_snapshot.export(prefix) # Payload = one record per key
+        return response
+
+    def sdl_import_handler(self, name:str, path:str, data, ctype:str):
+        """
+        Handler for the HTTP POST /ric/v1/sdl/import request.
+        Body: newline-delimited JSON records as produced by /ric/v1/sdl/export, read and written in batches as they arrive.
+        """
+        self.logger.info("Received POST /ric/v1/sdl/import request with content type {}.".format(ctype))
+        result = self._sdl_snapshot.import_records(data) # data iterates over the body lines
+        response = xapp_rest.initResponse(
+            status=200 if result["failed"] == 0 else 207, # Status = 200 OK, or 207 Multi-Status if some records failed
+            response="SDL import"
+        )
+        response['payload'] = json.dumps(result) # Payload = imported and failed record counts
+        return response
+
+    def profile_handler(self, name:str, path:str, data:bytes, ctype:str):
+        """
+        Handler for the HTTP GET /ric/v1/debug/profile[?format=collapsed|json&weight=cpu|samples] request.
+        Returns the latest profile started by POST /ric/v1/debug/profile: collapsed stacks for flame graphs, or a JSON summary with the CPU time per handler.
+        """
+        self.logger.info("Received GET /ric/v1/debug/profile request with content type {}.".format(ctype))
+        query = parse_qs(urlparse(path).query)
+        profile = self._profiler.result()
+        if self._profiler.running() or profile is None:
+            response = xapp_rest.initResponse(
+                status=202 if self._profiler.running() else 404, # Status = 202 Accepted (still sampling) or 404 Not Found
+                response="Profile"
+            )
+            response['payload'] = json.dumps({"status": "running" if self._profiler.running() else "No profile, start one with POST /ric/v1/debug/profile."})
+            return response
+        response = xapp_rest.initResponse(
+            status=200, # Status = 200 OK
+            response="Profile"
+        ) # Initiating HTTP response
+        if query.get("format", ["collapsed"])[0] == "json":
+            response['payload'] = json.dumps(profile.to_dict()) # Payload = CPU time per handler and collapsed stacks
+        else:
+            response['ctype'] = "text/plain"
+            weight = query.get("weight", ["cpu"])[0] if profile.cpu_clocks else "samples"
+            response['payload'] = profile.collapsed(weight) # Payload = one "thread;frame;...;frame count" line per stack
+        return response
+
+    def profile_control_handler(self, name:str, path:str, data:bytes, ctype:str):
+        """
+        Handler for the HTTP POST /ric/v1/debug/profile[?seconds=5&hz=100] request.
+        Starts sampling the stacks of every thread in the background, the profile is then read with GET /ric/v1/debug/profile.
+        """
+        self.logger.info("Received POST /ric/v1/debug/profile request with content type {}.".format(ctype))
+        query = parse_qs(urlparse(path).query)
+        try:
+            seconds = float(query.get("seconds", ["5"])[0]) # Profile duration, the HTTP server keeps answering meanwhile
+            started = self._profiler.start(
+                seconds=seconds,
+                hz=float(query.get("hz", ["100"])[0]) # Sampling frequency
+            )
+        except ValueError as e:
+            response = xapp_rest.initResponse(
+                status=400, # Status = 400 Bad Request
+                response="Profile"
+            )
+            response['payload'] = json.dumps({"error": str(e)})
+            return response
+        if not started:
+            response = xapp_rest.initResponse(
+                status=409, # Status = 409 Conflict
+                response="Profile"
+            )
+            response['payload'] = json.dumps({"error": "A profile is already running."})
+            return response
+        response = xapp_rest.initResponse(
+            status=202, # Status = 202 Accepted
+            response="Profile"
+        ) # Initiating HTTP response
+        response['payload'] = json.dumps({"status": "running", "seconds": seconds})
+        return response
+
+    def metrics_handler(self, name:str, path:str, data:bytes, ctype:str):
+        """
+        Handler for the HTTP GET /ric/v1/metrics request.
+        """
+        self.logger.debug("Received GET /ric/v1/metrics request with content type {}.".format(ctype))
+        response = xapp_rest.initResponse(
+            status=200, # Status = 200 OK
+            response="Metrics"
+        ) # Initiating HTTP response
+        response['ctype'] = MetricsRegistry.CONTENT_TYPE
+        response['payload'] = self._metrics.expose() # Payload = every metric in the Prometheus text format
+        return response
+
+    def sdl_cache_stats_handler(self, name:str, path:str, data:bytes, ctype:str):
+        """
+        Handler for the HTTP GET /ric/v1/sdl/cache_stats request.
+        """
+        self.logger.info("Received GET /ric/v1/sdl/cache_stats request with content type {}.".format(ctype))
+        response = xapp_rest.initResponse(
+            status=200, # Status = 200 OK
+            response="SDL cache stats"
+        ) # Initiating HTTP response
+        response['payload'] = json.dumps(self._sdl_cache.stats()) # Payload = hit ratio and flush latency
+        self.logger.debug("SDL cache stats handler response: {}.".format(response))
+        return response
+
+    def scheduler_handler(self, name:str, path:str, data:bytes, ctype:str):
+        """
+        Handler for the HTTP GET /ric/v1/debug/scheduler request.
+        """
+        self.logger.info("Received GET /ric/v1/debug/scheduler request with content type {}.".format(ctype))
+        response = xapp_rest.initResponse(
+            status=200, # Status = 200 OK
+            response="Scheduler stats"
+        ) # Initiating HTTP response
+        response['payload'] = json.dumps(self._scheduler.stats()) # Payload = runs, overruns and skips of every task
+        self.logger.debug("Scheduler handler response: {}.".format(response))
+        return response
+
     def start(self):
         """
         Starts the xApp loop.
@@ -184,7 +436,9 @@ class XappLogSdlRest:
         """
         Terminates the xApp. Can only be called if the xApp is running in threaded mode.
         """
-        self._shutdown = True
+        self._scheduler.stop() # Waits for the loop iteration in progress
+        self.logger.info("Flushing pending SDL writes.")
+        self._sdl_cache.stop() # Also writes the pending counter increments
         self.logger.info("Calling framework termination to unregister the xApp from AppMgr.")
         self._xapp.stop()
         self.http_server.stop()
\ No newline at end of file
@@ -0,0 +1,112 @@
+
+# Imports from OSC libraries
+from ricxappframe import xapp_rest
+
+# Imports from other libraries
+from typing import Iterator
+import socket
+
+class StreamingRestHandler(xapp_rest.RestHandler):
+    """
+    Framework REST handler that can also stream request and response bodies.
+
+    Responses whose mode is "stream" carry an iterable of str or bytes chunks as payload, which are
+    sent with chunked transfer encoding as they are produced instead of being built in memory first.
+    If the iterable raises, the connection is closed without the final chunk, so clients see a
+    truncated body instead of a complete one.
+
+    Callbacks registered with add_streaming_handler() receive an iterator over the lines of the
+    request body (without the newline) instead of the whole body. Both Content-Length and chunked
+    request bodies are supported.
+    """
+    streaming_names = set() # Names of the POST handlers that receive the request body as a line iterator
+
+    def add_streaming_handler(self, method=None, name=None, uri=None, callback=None):
+        """
+        Adds a handler like add_handler(), but the callback receives an iterator over the body lines.
+        """
+        self.add_handler(self, method=method, name=name, uri=uri, callback=callback)
+        self.streaming_names.add(name)
+
+    def do_POST(self):
+        """
+        Passes the body lines to streaming handlers and falls back to the framework for the others.
+        """
+        cbname, hndl = self._findUrihandler(self.path, self.handlers['post'])
+        if hndl is None or cbname not in self.streaming_names:
+            return super().do_POST()
+        try:
+            response = hndl['cb'](cbname, self.path, self._body_lines(), self.headers['Content-Type'])
+            self._sendResponse(response)
+        except (socket.error, IOError):
+            pass
+
+    def _sendResponse(self, response):
+        """
+        Sends stream mode responses chunk by chunk and the others through the framework.
+        """
+        if response['mode'] != 'stream':
+            return super()._sendResponse(response)
+        self.protocol_version = "HTTP/1.1" # Chunked transfer encoding needs an HTTP/1.1 status line
+        self.close_connection = True
+        self.send_response(response['status'])
+        self.send_header("Server-name", "XAPP REST SERVER 0.9")
+        self.send_header('Content-type', response['ctype'])
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.send_header('Connection', 'close')
+        if response['attachment'] is not None:
+            self.send_header('Content-Disposition', "attachment; filename=" + response['attachment'])
+        self.end_headers()
+        for chunk in response['payload']:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            if chunk: # An empty chunk would end the body
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _read_body(self) -> Iterator[bytes]:
+        """
+        Yields the request body in blocks as it arrives.
+        """
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            while True:
+                size = int(self.rfile.readline().split(b";")[0].strip(), 16)
+                if size == 0:
+                    while self.rfile.readline() not in (b"\r\n", b"\n", b""): # Skips the trailers
+                        pass
+                    return
+                yield self.rfile.read(size)
+                self.rfile.readline() # CRLF closing the chunk
+        remaining = int(self.headers.get('Content-Length', 0))
+        while remaining > 0:
+            block = self.rfile.read(min(remaining, 65536))
+            if not block:
+                return
+            remaining -= len(block)
+            yield block
+
+    def _body_lines(self) -> Iterator[bytes]:
+        """
+        Yields the lines of the request body, keeping at most one partial line in memory.
+        """
+        rest = b""
+        for block in self._read_body():
+            lines = (rest + block).split(b"\n")
+            rest = lines.pop()
+            for line in lines:
+                yield line
+        if rest:
+            yield rest
+
+class StreamingHTTPServer(xapp_rest.ThreadedHTTPServer):
+    """
+    Framework threaded HTTP server using the streaming REST handler.
+
+    Parameters
+    ----------
+    host: str
+        HTTP listen interface ip ("0.0.0.0" binds all interfaces).
+    port: int
+        Listen service port.
+    """
+    handler = StreamingRestHandler
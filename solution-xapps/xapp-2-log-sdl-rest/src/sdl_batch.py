@@ -0,0 +1,152 @@
+
+# Imports from OSC libraries
+from ricxappframe.xapp_sdl import SDLWrapper
+
+# Imports from other libraries
+from typing import List
+import msgpack
+
+# Imports from local files
+from .sdl_index import SdlPrefixIndex
+
+_DELETED = object() # Marks a delete in a run of unconditional operations
+
+class SdlBatch:
+    """
+    Executes lists of SDL mutations on a namespace with as few round trips as possible.
+
+    Consecutive unconditional operations ("set" and "delete") are merged into one multi-set plus one
+    multi-remove, later operations on a key replacing earlier ones. Conditional operations ("set_if",
+    "set_if_not_exists" and "delete_if") are atomic on their own, so each one ends the current run and
+    costs a single round trip. Operations keep their order semantics and each one gets its own result.
+
+    Parameters
+    ----------
+    sdl: SDLWrapper
+        The framework SDL wrapper (xapp.sdl).
+    index: SdlPrefixIndex = None
+        Index of the namespace. If given, every mutation publishes a change event on the index channel
+        and is applied to the local index and its listeners.
+    """
+    OPERATIONS = ("set", "delete", "set_if", "set_if_not_exists", "delete_if")
+
+    def __init__(self, sdl:SDLWrapper, index:SdlPrefixIndex = None):
+        """
+        Initializes the batch executor.
+        """
+        self._sdl = sdl
+        self._index = index
+
+    def validate(self, operations:list) -> str:
+        """
+        Returns a description of the first malformed operation, or None if all operations are valid.
+        """
+        if not isinstance(operations, list):
+            return "operations must be a list"
+        for i, operation in enumerate(operations):
+            if not isinstance(operation, dict) or operation.get("op") not in self.OPERATIONS:
+                return "operation {} must have an op in {}".format(i, list(self.OPERATIONS))
+            if not isinstance(operation.get("key"), str):
+                return "operation {} must have a string key".format(i)
+            if operation["op"] in ("set", "set_if", "set_if_not_exists") and "value" not in operation:
+                return "operation {} must have a value".format(i)
+            if operation["op"] in ("set_if", "delete_if") and "old_value" not in operation:
+                return "operation {} must have an old_value".format(i)
+        return None
+
+    def execute(self, namespace:str, operations:List[dict]) -> dict:
+        """
+        Executes validated operations in order and returns their results and the number of SDL round trips.
+        """
+        results = [None] * len(operations)
+        round_trips = 0
+        run = {} # Key -> value or _DELETED for the current run of unconditional operations
+        run_indexes = [] # Positions of the operations merged into the current run
+        for i, operation in enumerate(operations):
+            op, key = operation["op"], operation["key"]
+            if op in ("set", "delete"):
+                run.pop(key, None) # Keeps the key at the position of its last write
+                run[key] = operation["value"] if op == "set" else _DELETED
+                run_indexes.append(i)
+                continue
+            round_trips += self._flush_run(namespace, run, run_indexes, operations, results)
+            run, run_indexes = {}, []
+            round_trips += 1
+            try:
+                applied = self._conditional(namespace, operation)
+                results[i] = {"op": op, "key": key, "status": "ok" if applied else "not_applied"}
+            except Exception as e:
+                results[i] = {"op": op, "key": key, "status": "error", "error": str(e)}
+        round_trips += self._flush_run(namespace, run, run_indexes, operations, results)
+        return {"results": results, "round_trips": round_trips}
+
+    def _flush_run(self, namespace:str, run:dict, run_indexes:List[int], operations:List[dict], results:list) -> int:
+        """
+        Writes a run of unconditional operations with one multi-set and one multi-remove.
+        Returns the number of SDL round trips.
+        """
+        if not run:
+            return 0
+        round_trips = 0
+        to_set = {k: msgpack.packb(v, use_bin_type=True) for k, v in run.items() if v is not _DELETED}
+        to_remove = {k for k, v in run.items() if v is _DELETED}
+        status = {"status": "ok"}
+        try:
+            # SDLWrapper only writes one key per call, so runs go straight to its SyncStorage
+            if self._index is not None:
+                channel = self._index.channel
+                if to_set:
+                    events = [self._index.encode_event("set", k, self._payload(run[k])) for k in to_set]
+                    self._sdl._sdl.set_and_publish(namespace, {channel: events}, to_set)
+                    round_trips += 1
+                if to_remove:
+                    events = [self._index.encode_event("del", k) for k in to_remove]
+                    self._sdl._sdl.remove_and_publish(namespace, {channel: events}, to_remove)
+                    round_trips += 1
+                for key, value in run.items():
+                    self._index.apply_change("del" if value is _DELETED else "set", key, None if value is _DELETED else self._payload(value))
+            else:
+                if to_set:
+                    self._sdl._sdl.set(namespace, to_set)
+                    round_trips += 1
+                if to_remove:
+                    self._sdl._sdl.remove(namespace, to_remove)
+                    round_trips += 1
+        except Exception as e:
+            status = {"status": "error", "error": str(e)}
+        for i in run_indexes:
+            results[i] = dict({"op": operations[i]["op"], "key": operations[i]["key"]}, **status)
+        return round_trips
+
+    def _conditional(self, namespace:str, operation:dict) -> bool:
+        """
+        Executes one conditional operation and returns whether it was applied.
+        """
+        op, key = operation["op"], operation["key"]
+        if self._index is None:
+            if op == "set_if":
+                return self._sdl.set_if(namespace, key, operation["old_value"], operation["value"])
+            if op == "set_if_not_exists":
+                return self._sdl.set_if_not_exists(namespace, key, operation["value"])
+            return self._sdl.delete_if(namespace, key, operation["old_value"])
+        channel = self._index.channel
+        if op == "delete_if":
+            applied = self._sdl.remove_if_and_publish(namespace, channel, self._index.encode_event("del", key), key, operation["old_value"])
+            if applied:
+                self._index.apply_change("del", key)
+            return applied
+        payload = self._payload(operation["value"])
+        event = self._index.encode_event("set", key, payload)
+        if op == "set_if":
+            applied = self._sdl.set_if_and_publish(namespace, channel, event, key, operation["old_value"], operation["value"])
+        else:
+            applied = self._sdl.set_if_not_exists_and_publish(namespace, channel, event, key, operation["value"])
+        if applied:
+            self._index.apply_change("set", key, payload)
+        return applied
+
+    def _payload(self, value):
+        """
+        Returns the change event payload of a value, or None if other replicas must read it from SDL.
+        """
+        return {"value": value} if isinstance(value, (int, float, str, bool)) else None
@@ -0,0 +1,398 @@
+
+# Imports from OSC libraries
+from ricxappframe.xapp_sdl import SDLWrapper
+from mdclogpy import Logger
+
+# Imports from other libraries
+from threading import Lock
+from time import perf_counter
+import msgpack
+
+# Imports from local files
+from .sdl_index import SdlPrefixIndex
+from .scheduler import Scheduler
+
+_MISSING = object() # Marks a key known to be absent from SDL
+_DELETED = object() # Marks a pending delete in the dirty set
+
+class SdlWriteBehindCache:
+    """
+    Namespace-scoped write-behind cache for SDL.
+
+    Reads are served from memory after the first fetch of each key. Writes and deletes are
+    applied locally and coalesced, then flushed to SDL in one multi-set plus one multi-remove
+    every flush_interval seconds, or as soon as max_dirty keys are pending.
+
+    With an index, prefix reads are answered from the index instead of scanning SDL, and flushes
+    publish change events on the index channel carrying the new values, or the accumulated deltas
+    of keys changed with incr(). Replicas sharing the namespace apply those events to their local
+    copy, so they see each other's changes without polling SDL.
+
+    Deltas are added to SDL with conditional sets instead of the multi-set, so replicas
+    incrementing the same key never overwrite each other's increments.
+
+    Parameters
+    ----------
+    sdl: SDLWrapper
+        The framework SDL wrapper (xapp.sdl).
+    namespace: str
+        SDL namespace owned by the cache.
+    flush_interval: float = 5.0
+        Seconds between periodic flushes.
+    max_dirty: int = 100
+        Number of pending keys that triggers an early flush.
+    logger: Logger = None
+        Logger used to report flush failures.
+    index: SdlPrefixIndex = None
+        Prefix index of the same namespace, kept current by the cache writes.
+    """
+    def __init__(self, sdl:SDLWrapper, namespace:str, flush_interval:float = 5.0, max_dirty:int = 100, logger:Logger = None,
+                 index:SdlPrefixIndex = None):
+        """
+        Initializes the cache. Periodic flushes only run after start() is called.
+        """
+        self._sdl = sdl
+        self.namespace = namespace
+        self.flush_interval = flush_interval
+        self.max_dirty = max_dirty
+        self.logger = logger if logger is not None else Logger(name="SdlWriteBehindCache")
+        self.max_retries = 5 # Conditional set attempts per delta and flush before keeping it for the next flush
+
+        self._lock = Lock() # Protects the local values, the dirty set and the stats
+        self._flush_lock = Lock() # Keeps batches reaching SDL in order
+        self._values = {} # Local copy of the namespace: key -> value or _MISSING
+        self._dirty = {} # Pending writes: key -> value or _DELETED
+        self._deltas = {} # Increments accumulated by incr() since the last flush: key -> delta
+        self._flushing = {} # Increments of the flush in progress, not in SDL yet: key -> delta
+        self._loaded_prefixes = set() # Prefixes already scanned by find_and_get()
+        self._task = None # Flush task of the scheduler, set by start()
+        self._own_scheduler = None # Scheduler started by start() when none is given
+        self._index = index
+        if index is not None:
+            index.add_listener(self._handle_remote_change)
+
+        # Stats
+        self._hits = 0
+        self._misses = 0
+        self._writes = 0
+        self._flushes = 0
+        self._flushed_keys = 0
+        self._flush_errors = 0
+        self._remote_updates = 0
+        self._conflicts = {} # Conditional sets of deltas lost to other writers: key -> count
+        self._flush_time_total = 0.0
+        self._flush_time_max = 0.0
+        self._flush_time_last = 0.0
+
+    # ------------------ READS
+
+    def get(self, key:str):
+        """
+        Returns the value of a key, fetching it from SDL only on the first read.
+        Answers None if the key does not exist.
+        """
+        with self._lock:
+            if key in self._values:
+                self._hits += 1
+                value = self._values[key]
+                return None if value is _MISSING else value
+            self._misses += 1
+        value = self._sdl.get(self.namespace, key)
+        with self._lock:
+            # A local write may have happened while SDL was being read; it wins
+            value = self._values.setdefault(key, _MISSING if value is None else value)
+        return None if value is _MISSING else value
+
+    def find_and_get(self, prefix:str) -> dict:
+        """
+        Returns all key-value pairs whose key starts with prefix.
+        Keys come from the index if there is one; otherwise SDL is scanned the first time a prefix is requested.
+        """
+        if self._index is not None:
+            keys = self._index.keys(prefix)
+            with self._lock:
+                missing = {k for k in keys if k not in self._values}
+                self._hits += len(keys) - len(missing)
+                self._misses += len(missing)
+            if missing:
+                fetched = self._sdl._sdl.get(self.namespace, missing) # One multi-get for every uncached key
+                with self._lock:
+                    for key in missing:
+                        value = msgpack.unpackb(fetched[key], raw=False) if key in fetched else _MISSING
+                        self._values.setdefault(key, value)
+            with self._lock:
+                return {k: self._values[k] for k in keys if self._values.get(k, _MISSING) is not _MISSING}
+        with self._lock:
+            loaded = prefix in self._loaded_prefixes or any(prefix.startswith(p) for p in self._loaded_prefixes)
+            if loaded:
+                self._hits += 1
+        if not loaded:
+            fetched = self._sdl.find_and_get(self.namespace, prefix)
+            with self._lock:
+                self._misses += 1
+                for key, value in fetched.items():
+                    self._values.setdefault(key, value)
+                self._loaded_prefixes.add(prefix)
+        with self._lock:
+            return {k: v for k, v in self._values.items() if k.startswith(prefix) and v is not _MISSING}
+
+    # ------------------ WRITES
+
+    def set(self, key:str, value):
+        """
+        Sets a key locally and schedules it to be written to SDL.
+        """
+        with self._lock:
+            self._values[key] = value
+            self._dirty[key] = value
+            self._deltas.pop(key, None) # Other replicas must take the whole value
+            self._writes += 1
+            full = len(self._dirty) >= self.max_dirty
+        if self._index is not None:
+            self._index.add(key)
+        if full:
+            self._request_flush()
+
+    def incr(self, key:str, delta = 1):
+        """
+        Adds delta to a numeric key (missing keys count as 0) and returns the new value.
+        The delta is added to SDL atomically on flush and other replicas receive it instead of the
+        value, so concurrent increments add up.
+        """
+        self.get(key) # Loads the current value on the first use of the key
+        with self._lock:
+            value = self._values.get(key, _MISSING)
+            value = (0 if value is _MISSING or value is None else value) + delta
+            self._values[key] = value
+            self._dirty[key] = value
+            self._deltas[key] = self._deltas.get(key, 0) + delta
+            self._writes += 1
+            full = len(self._dirty) >= self.max_dirty
+        if self._index is not None:
+            self._index.add(key)
+        if full:
+            self._request_flush()
+        return value
+
+    def delete(self, key:str):
+        """
+        Deletes a key locally and schedules its removal from SDL.
+        """
+        with self._lock:
+            self._values[key] = _MISSING
+            self._dirty[key] = _DELETED
+            self._deltas.pop(key, None)
+            self._writes += 1
+            full = len(self._dirty) >= self.max_dirty
+        if self._index is not None:
+            self._index.discard(key)
+        if full:
+            self._request_flush()
+
+    def flush(self):
+        """
+        Writes all pending changes to SDL in one batch. Failed batches are kept for the next flush.
+        """
+        with self._flush_lock:
+            self._flush()
+
+    def _flush(self):
+        """
+        Swaps out the dirty set and writes it to SDL. Must be called holding the flush lock.
+        """
+        with self._lock:
+            if not self._dirty:
+                return
+            batch, self._dirty = self._dirty, {}
+            deltas, self._deltas = self._deltas, {}
+            self._flushing = dict(deltas)
+        to_set = {k: msgpack.packb(v, use_bin_type=True) for k, v in batch.items() if v is not _DELETED and k not in deltas}
+        to_remove = {k for k, v in batch.items() if v is _DELETED}
+        failed = {} # Changes kept for the next flush: key -> value
+        start = perf_counter()
+        for key, delta in deltas.items():
+            try:
+                if self._add_delta(key, batch[key], delta):
+                    continue
+                self.logger.error("Could not add {} to SDL key {} after {} attempts.".format(delta, key, self.max_retries))
+            except Exception as e:
+                self.logger.error("SDL cache flush of key {} failed: {}".format(key, e))
+            failed[key] = batch[key]
+        try:
+            # SDLWrapper only sets one key per call, so batches go straight to its SyncStorage
+            if self._index is not None:
+                channel = self._index.channel
+                if to_set:
+                    events = [self._change_event(k, batch[k]) for k in to_set]
+                    self._sdl._sdl.set_and_publish(self.namespace, {channel: events}, to_set)
+                if to_remove:
+                    events = [self._index.encode_event("del", k) for k in to_remove]
+                    self._sdl._sdl.remove_and_publish(self.namespace, {channel: events}, to_remove)
+            else:
+                if to_set:
+                    self._sdl._sdl.set(self.namespace, to_set)
+                if to_remove:
+                    self._sdl._sdl.remove(self.namespace, to_remove)
+        except Exception as e:
+            failed.update({k: batch[k] for k in to_set.keys() | to_remove})
+            self.logger.error("SDL cache flush of {} keys failed: {}".format(len(to_set) + len(to_remove), e))
+        elapsed = perf_counter() - start
+        with self._lock:
+            self._flushing = {}
+            if failed:
+                self._flush_errors += 1
+                for key, value in failed.items():
+                    if key not in self._dirty: # Newer local writes are kept
+                        self._dirty[key] = value
+                        if key in deltas:
+                            self._deltas[key] = deltas[key]
+                    elif key in deltas and key in self._deltas: # Increments on top of increments still add up
+                        self._deltas[key] += deltas[key]
+            for key in to_remove - failed.keys():
+                self._conflicts.pop(key, None)
+                if key not in self._dirty and self._values.get(key) is _MISSING:
+                    del self._values[key] # Deleted for good, a later read fetches it again
+            if len(failed) == len(batch):
+                return
+            self._flushes += 1
+            self._flushed_keys += len(batch) - len(failed)
+            self._flush_time_total += elapsed
+            self._flush_time_last = elapsed
+            self._flush_time_max = max(self._flush_time_max, elapsed)
+
+    def _add_delta(self, key:str, value, delta) -> bool:
+        """
+        Adds the delta accumulated by incr() to a key with a conditional set, reading the key again
+        when another writer changed it first. Returns False if every attempt lost the race.
+        On success the local value is set to the written one plus the increments made since the flush started.
+        """
+        old = (value - delta) or None # Last value of the key known here, 0 is tried as a missing key
+        for _ in range(self.max_retries):
+            new = (old or 0) + delta
+            if self._index is not None:
+                event = self._index.encode_event("delta", key, {"delta": delta, "value": new})
+                if old is None:
+                    done = self._sdl.set_if_not_exists_and_publish(self.namespace, self._index.channel, event, key, new)
+                else:
+                    done = self._sdl.set_if_and_publish(self.namespace, self._index.channel, event, key, old, new)
+            elif old is None:
+                done = self._sdl.set_if_not_exists(self.namespace, key, new)
+            else:
+                done = self._sdl.set_if(self.namespace, key, old, new)
+            if done:
+                with self._lock:
+                    self._flushing.pop(key, None)
+                    if key not in self._dirty or key in self._deltas: # Not set or deleted locally meanwhile
+                        self._values[key] = new + self._deltas.get(key, 0)
+                        if key in self._dirty:
+                            self._dirty[key] = self._values[key]
+                return True
+            with self._lock:
+                self._conflicts[key] = self._conflicts.get(key, 0) + 1
+            old = self._sdl.get(self.namespace, key)
+        return False
+
+    def _change_event(self, key:str, value) -> str:
+        """
+        Builds the change event of a key flushed with the multi-set, carrying its value if it is JSON friendly.
+        """
+        if isinstance(value, (int, float, str, bool)):
+            return self._index.encode_event("set", key, {"value": value})
+        return self._index.encode_event("set", key) # Not JSON friendly, other replicas read it from SDL
+
+    def _handle_remote_change(self, op:str, key:str, payload):
+        """
+        Index listener that applies the changes published by other writers to the local copy.
+        Pending local writes win over remote values, but remote deltas are added to them when they
+        follow the value known here. Deltas out of sequence (already seen by a read or a conditional
+        set, or following a missed one) make the next read fetch the key again.
+        """
+        with self._lock:
+            if op == "del":
+                self._conflicts.pop(key, None)
+            if key not in self._values:
+                return # Not cached, the first read will fetch it
+            self._remote_updates += 1
+            current = self._values[key]
+            if op == "delta" and payload is not None:
+                pending = self._deltas.get(key, 0) + self._flushing.get(key, 0) # Local increments not in SDL yet
+                numeric = isinstance(current, (int, float)) and not isinstance(current, bool)
+                if numeric and current - pending == payload["value"] - payload["delta"]:
+                    self._values[key] = current + payload["delta"]
+                    if key in self._dirty:
+                        self._dirty[key] = self._values[key]
+                elif key not in self._dirty and not pending:
+                    self._values.pop(key, None) # The next read fetches it from SDL
+            elif key in self._dirty:
+                return
+            elif op != "del" and payload is not None:
+                self._values[key] = payload["value"]
+            else:
+                self._values.pop(key, None) # The next read fetches it from SDL
+
+    # ------------------ PERIODIC FLUSH
+
+    def start(self, scheduler:Scheduler = None):
+        """
+        Schedules a flush flush_interval seconds after the end of the previous one, on the given
+        scheduler, or on a scheduler of its own started here.
+        """
+        if scheduler is None:
+            scheduler = self._own_scheduler = Scheduler(logger=self.logger)
+            scheduler.start()
+        self._task = scheduler.fixed_delay("sdl-cache-flush:" + self.namespace, self.flush_interval, self.flush)
+
+    def stop(self):
+        """
+        Stops the periodic flushes and writes any pending changes to SDL.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._own_scheduler is not None:
+            self._own_scheduler.stop()
+            self._own_scheduler = None
+        self.flush()
+
+    def _request_flush(self):
+        """
+        Flushes before the interval elapses, as soon as the scheduler runs the task (right after
+        the flush in progress, if any).
+        """
+        task = self._task
+        if task is not None:
+            task.trigger()
+
+    # ------------------ STATS
+
+    def conflicts(self, key:str) -> int:
+        """
+        Returns how many conditional sets of the deltas of a key were lost to other writers.
+        """
+        with self._lock:
+            return self._conflicts.get(key, 0)
+
+    def stats(self) -> dict:
+        """
+        Returns hit ratio, write coalescing and flush latency statistics.
+        """
+        with self._lock:
+            reads = self._hits + self._misses
+            return {
+                "namespace": self.namespace,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": self._hits / reads if reads else 0.0,
+                "writes": self._writes,
+                "pending": len(self._dirty),
+                "flushes": self._flushes,
+                "flushed_keys": self._flushed_keys,
+                "flush_errors": self._flush_errors,
+                "remote_updates": self._remote_updates,
+                "conflicts": sum(self._conflicts.values()),
+                "flush_latency_ms": {
+                    "last": self._flush_time_last * 1000,
+                    "avg": self._flush_time_total * 1000 / self._flushes if self._flushes else 0.0,
+                    "max": self._flush_time_max * 1000
+                }
+            }
@@ -0,0 +1,165 @@
+
+# Imports from OSC libraries
+from ricxappframe.xapp_sdl import SDLWrapper
+from mdclogpy import Logger
+
+# Imports from other libraries
+import random
+
+# Imports from local files
+from .sdl_cache import SdlWriteBehindCache
+from .clock import Clock
+
+class SdlShardedCounter:
+    """
+    Distributed counter spread over sharded SDL keys.
+
+    Increments go through the write-behind cache of the namespace: they are batched there with
+    incr() and each flush adds them to a single shard key with an SDL conditional set, so each write
+    is atomic without read-modify-write races. Every replica starts on its own random shard and
+    moves to another one when its writes lose races, so many replicas can count without contending
+    on one key. Reads sum the shards from the cache, which the change events of the other replicas
+    keep current.
+
+    With a window, the counter restarts every window seconds: keys are named
+    "<name>:<window id>:<shard>" and close_windows() lets exactly one replica close each finished
+    window and delete its keys. Without a window the window id is always 0.
+
+    Parameters
+    ----------
+    sdl: SDLWrapper
+        The framework SDL wrapper (xapp.sdl), used for the closing markers of the windows.
+    cache: SdlWriteBehindCache
+        Write-behind cache of the SDL namespace of the counter keys.
+    name: str
+        Counter name, used as the key prefix.
+    shards: int = 8
+        Number of shard keys per window.
+    window: float = None
+        Window length in seconds, or None for a counter that never restarts.
+    logger: Logger = None
+        Logger used to report closed windows.
+    clock: Clock = None
+        Source of the window times (the system clock by default).
+    """
+    def __init__(self, sdl:SDLWrapper, cache:SdlWriteBehindCache, name:str, shards:int = 8, window:float = None,
+                 logger:Logger = None, clock:Clock = None):
+        """
+        Initializes the counter and picks the shard this replica writes to.
+        """
+        self._sdl = sdl
+        self._cache = cache
+        self.namespace = cache.namespace
+        self.name = name
+        self.shards = shards
+        self.window = window
+        self.logger = logger if logger is not None else Logger(name="SdlShardedCounter")
+        self._clock = clock if clock is not None else Clock()
+
+        self._shard = random.randrange(shards) # Shard this replica currently writes to
+        self._shard_conflicts = 0 # Lost races of the current shard key when it was picked
+        self._open_windows = set() # Windows this replica counted in and has not closed yet
+
+    # ------------------ KEYS
+
+    def window_id(self) -> int:
+        """
+        Returns the id of the current window.
+        """
+        return int(self._clock.time() // self.window) if self.window else 0
+
+    def _prefix(self, window_id:int) -> str:
+        """
+        Returns the key prefix of the shards of a window.
+        """
+        return "{}:{}:".format(self.name, window_id)
+
+    # ------------------ INCREMENTS
+
+    def add(self, n:int = 1):
+        """
+        Adds n to the counter of the current window. The increment is written by the next flush of the cache.
+        """
+        if n == 0:
+            return
+        window_id = self.window_id()
+        key = self._prefix(window_id) + str(self._shard)
+        conflicts = self._cache.conflicts(key)
+        if conflicts > self._shard_conflicts: # Another replica raced us on this shard, move elsewhere
+            self._shard = random.randrange(self.shards)
+            key = self._prefix(window_id) + str(self._shard)
+            conflicts = self._cache.conflicts(key)
+        self._shard_conflicts = conflicts
+        self._cache.incr(key, n)
+        self._open_windows.add(window_id)
+
+    # ------------------ READS
+
+    def value(self, window_id:int = None) -> int:
+        """
+        Returns the counter value of a window (the current one by default), including unwritten increments.
+        """
+        if window_id is None:
+            window_id = self.window_id()
+        return sum(self._cache.find_and_get(self._prefix(window_id)).values())
+
+    # ------------------ WINDOWS
+
+    def close_windows(self) -> int:
+        """
+        Closes the finished windows this replica counted in and returns how many of them it closed.
+        A window is closed by exactly one replica, which deletes every key of older windows.
+        """
+        if not self.window:
+            return 0
+        current = self.window_id()
+        finished = sorted(w for w in self._open_windows if w < current)
+        self._open_windows.difference_update(finished)
+        if not finished:
+            return 0
+        self._cache.flush() # Late increments still land in their own window before it is closed
+        closed = 0
+        for window_id in finished:
+            if self._sdl.set_if_not_exists(self.namespace, "{}:closed:{}".format(self.name, window_id), True):
+                closed += 1
+        if closed:
+            self._delete_windows_before(current)
+        return closed
+
+    def _delete_windows_before(self, current:int):
+        """
+        Deletes the shard keys and closing markers of every window older than the given one.
+        Closing markers of the previous window are kept so that late replicas do not close it twice.
+        """
+        for key in self._sdl.find_keys(self.namespace, self.name + ":"):
+            parts = key.split(":")
+            if len(parts) != 3:
+                continue
+            if parts[1] == "closed" and parts[2].isdigit():
+                if int(parts[2]) < current - 1:
+                    self._cache.delete(key)
+            elif parts[1].isdigit() and int(parts[1]) < current:
+                self._cache.delete(key) # Removed and published by the next flush
+
+    # ------------------ RESET
+
+    def reset(self, value:int = 0):
+        """
+        Sets the counter of the current window to value, dropping every shard and unwritten increment.
+        """
+        prefix = self._prefix(self.window_id())
+        for key in self._cache.find_and_get(prefix):
+            self._cache.delete(key)
+        if value:
+            self._cache.set(prefix + "0", value)
+        self._cache.flush() # Written and published right away instead of on the next flush
+
+    def stats(self) -> dict:
+        """
+        Returns the shard this replica writes to and the races it lost on it.
+        """
+        return {
+            "name": self.name,
+            "shard": self._shard,
+            "conflicts": self._shard_conflicts
+        }
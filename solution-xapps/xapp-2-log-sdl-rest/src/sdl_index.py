@@ -0,0 +1,181 @@
+
+# Imports from OSC libraries
+from ricxappframe.xapp_sdl import SDLWrapper
+from mdclogpy import Logger
+
+# Imports from other libraries
+from threading import Lock
+from bisect import bisect_left
+from typing import Callable, Iterator, List, Tuple
+import json
+import uuid
+import msgpack
+
+class SdlPrefixIndex:
+    """
+    Locally maintained, sorted index of the keys of an SDL namespace.
+
+    The index is seeded with a single key scan. After that it is kept current by the xApp's own
+    writes (add() and discard()) and by the change events other writers publish on an SDL channel,
+    so prefix queries are answered from memory instead of scanning Redis.
+
+    Change events are JSON lists [origin, op, key, payload] published on the index channel, where
+    op is "set", "delta" or "del" and payload is an optional JSON object. Listeners registered with
+    add_listener() receive every event from other writers, which lets caches and replicated state
+    reuse the same subscription.
+
+    Parameters
+    ----------
+    sdl: SDLWrapper
+        The framework SDL wrapper (xapp.sdl).
+    namespace: str
+        Indexed SDL namespace.
+    channel: str = "sdl-key-changes"
+        SDL channel carrying the change events of the namespace.
+    logger: Logger = None
+        Logger used to report malformed events.
+    """
+    def __init__(self, sdl:SDLWrapper, namespace:str, channel:str = "sdl-key-changes", logger:Logger = None):
+        """
+        Initializes an empty index. Call seed() and subscribe() before querying it.
+        """
+        self._sdl = sdl
+        self.namespace = namespace
+        self.channel = channel
+        self.origin = uuid.uuid4().hex # Identifies the events published by this replica
+        self.logger = logger if logger is not None else Logger(name="SdlPrefixIndex")
+
+        self._lock = Lock() # Protects the sorted key list
+        self._keys:List[str] = [] # Sorted keys of the namespace
+        self._listeners:List[Callable] = [] # Called with (op, key, payload) for every remote change event
+        self.seeded = False # True after the initial key scan
+
+    # ------------------ SEEDING AND NOTIFICATIONS
+
+    def seed(self):
+        """
+        Loads every key of the namespace with a single scan.
+        """
+        keys = self._sdl.find_keys(self.namespace, "")
+        with self._lock:
+            self._keys = sorted(set(keys) | set(self._keys))
+            self.seeded = True
+        self.logger.info("Seeded the SDL index of namespace {} with {} keys.".format(self.namespace, len(keys)))
+
+    def subscribe(self):
+        """
+        Subscribes to the change events of the namespace. The caller must start the SDL event listener afterwards.
+        """
+        self._sdl.subscribe_channel(self.namespace, self._handle_events, self.channel)
+
+    def add_listener(self, listener:Callable):
+        """
+        Registers a function with the signature (op, key, payload) called for every change event from other writers.
+        """
+        self._listeners.append(listener)
+
+    def encode_event(self, op:str, key:str, payload = None) -> str:
+        """
+        Builds the change event published for an operation on a key.
+        """
+        return json.dumps([self.origin, op, key, payload])
+
+    def _handle_events(self, channel:str, events:List[str]):
+        """
+        SDL channel callback that applies the change events of other writers to the index.
+        """
+        for event in events:
+            try:
+                origin, op, key, payload = json.loads(event)
+            except ValueError:
+                self.logger.warning("Ignoring malformed SDL change event {}.".format(event))
+                continue
+            if origin == self.origin:
+                continue # Our own writes were already applied locally
+            self.apply_change(op, key, payload)
+
+    def apply_change(self, op:str, key:str, payload = None):
+        """
+        Applies a change made outside the listeners' own write paths to the index and notifies the listeners.
+        """
+        if op == "del":
+            self.discard(key)
+        else:
+            self.add(key)
+        for listener in self._listeners:
+            listener(op, key, payload)
+
+    # ------------------ LOCAL UPDATES
+
+    def add(self, key:str):
+        """
+        Adds a key to the index.
+        """
+        with self._lock:
+            i = bisect_left(self._keys, key)
+            if i == len(self._keys) or self._keys[i] != key:
+                self._keys.insert(i, key)
+
+    def discard(self, key:str):
+        """
+        Removes a key from the index, if present.
+        """
+        with self._lock:
+            i = bisect_left(self._keys, key)
+            if i < len(self._keys) and self._keys[i] == key:
+                del self._keys[i]
+
+    # ------------------ QUERIES
+
+    def __len__(self) -> int:
+        """
+        Returns the number of indexed keys.
+        """
+        return len(self._keys)
+
+    def keys(self, prefix:str = "") -> List[str]:
+        """
+        Returns the sorted keys starting with prefix.
+        """
+        with self._lock:
+            start = bisect_left(self._keys, prefix)
+            end = start
+            while end < len(self._keys) and self._keys[end].startswith(prefix):
+                end += 1
+            return self._keys[start:end]
+
+    def iter_keys(self, prefix:str = "", page_size:int = 500) -> Iterator[List[str]]:
+        """
+        Yields the keys starting with prefix in sorted pages of at most page_size keys.
+        Each page is read under the lock separately, so the index can change between pages.
+        """
+        cursor = prefix
+        first = True
+        while True:
+            with self._lock:
+                start = bisect_left(self._keys, cursor)
+                if not first and start < len(self._keys) and self._keys[start] == cursor:
+                    start += 1 # The cursor key was the last key of the previous page
+                page = []
+                for key in self._keys[start:start + page_size]:
+                    if not key.startswith(prefix):
+                        break
+                    page.append(key)
+            if not page:
+                return
+            yield page
+            if len(page) < page_size:
+                return
+            cursor = page[-1]
+            first = False
+
+    def iter_items(self, prefix:str = "", page_size:int = 500) -> Iterator[Tuple[str, object]]:
+        """
+        Yields the (key, value) pairs starting with prefix, reading values from SDL one page
+        (one multi-get) at a time instead of materializing the whole namespace.
+        """
+        for page in self.iter_keys(prefix, page_size):
+            values = self._sdl._sdl.get(self.namespace, set(page)) # SDLWrapper only gets one key per call
+            for key in page:
+                if key in values:
+                    yield key, msgpack.unpackb(values[key], raw=False)
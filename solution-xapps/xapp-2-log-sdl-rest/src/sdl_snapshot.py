@@ -0,0 +1,150 @@
+
+# Imports from OSC libraries
+from ricxappframe.xapp_sdl import SDLWrapper
+from mdclogpy import Logger
+
+# Imports from other libraries
+from threading import Thread
+from queue import Queue
+from typing import Iterable, Iterator
+import base64
+import json
+import msgpack
+
+# Imports from local files
+from .sdl_index import SdlPrefixIndex
+from .sdl_batch import SdlBatch
+
+class SdlSnapshot:
+    """
+    Streaming export and import of an SDL namespace as newline-delimited JSON records.
+
+    Each record is {"key": str, "value": ...} when the value survives a JSON round trip, or
+    {"key": str, "msgpack": base64 str} with the stored bytes otherwise, so every value can be
+    restored exactly. Exports walk the namespace index one page of keys at a time (one multi-get per
+    page), and imports write one multi-set per batch of records in a writer thread while the next
+    batch is being parsed, so neither side holds more than a few pages of the namespace in memory.
+
+    Parameters
+    ----------
+    sdl: SDLWrapper
+        The framework SDL wrapper (xapp.sdl).
+    index: SdlPrefixIndex
+        Index of the namespace, used to page its keys.
+    batch: SdlBatch
+        Batch executor that writes imported records and publishes their change events.
+    page_size: int = 500
+        Keys read per SDL round trip on export.
+    batch_size: int = 500
+        Records written per SDL round trip on import.
+    logger: Logger = None
+        Logger used to report import progress.
+    """
+    def __init__(self, sdl:SDLWrapper, index:SdlPrefixIndex, batch:SdlBatch, page_size:int = 500, batch_size:int = 500,
+                 logger:Logger = None):
+        """
+        Initializes the exporter and importer.
+        """
+        self._sdl = sdl
+        self._index = index
+        self._batch = batch
+        self.namespace = index.namespace
+        self.page_size = page_size
+        self.batch_size = batch_size
+        self.max_errors = 10 # Import errors reported in detail, the others are only counted
+        self.logger = logger if logger is not None else Logger(name="SdlSnapshot")
+
+    # ------------------ EXPORT
+
+    def export(self, prefix:str = "") -> Iterator[str]:
+        """
+        Yields the records of the keys starting with prefix, one page of newline-terminated records at a time.
+        """
+        for page in self._index.iter_keys(prefix, self.page_size):
+            values = self._sdl._sdl.get(self.namespace, set(page)) # SDLWrapper only gets one key per call
+            yield "".join(self._record(key, values[key]) + "\n" for key in page if key in values)
+
+    def _record(self, key:str, data:bytes) -> str:
+        """
+        Encodes a stored value as a record, falling back to its msgpack bytes if JSON would change it.
+        """
+        value = msgpack.unpackb(data, raw=False)
+        try:
+            if json.loads(json.dumps(value)) == value:
+                return json.dumps({"key": key, "value": value})
+        except (TypeError, ValueError):
+            pass
+        return json.dumps({"key": key, "msgpack": base64.b64encode(data).decode("ascii")})
+
+    # ------------------ IMPORT
+
+    def import_records(self, lines:Iterable[bytes]) -> dict:
+        """
+        Writes the records of an export to SDL and returns the counts of imported and failed records.
+        Blank lines are skipped. Malformed records are reported and do not stop the import.
+        """
+        batches = Queue(maxsize=2) # Bounds the records parsed ahead of the writer
+        result = {"imported": 0, "failed": 0, "batches": 0, "round_trips": 0, "errors": []} # Updated by the writer thread only
+        parse_errors = {"failed": 0, "errors": []}
+        writer = Thread(target=self._write_batches, args=(batches, result), name="sdl-import-writer", daemon=True)
+        writer.start()
+        operations = []
+        try:
+            for number, line in enumerate(lines, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    operations.append(self._operation(line))
+                except (ValueError, KeyError, TypeError, AttributeError) as e:
+                    self._fail(parse_errors, "line {}: {}".format(number, e))
+                    continue
+                if len(operations) >= self.batch_size:
+                    batches.put(operations)
+                    operations = []
+            if operations:
+                batches.put(operations)
+        finally:
+            batches.put(None)
+            writer.join()
+        result["failed"] += parse_errors["failed"]
+        result["errors"] = (parse_errors["errors"] + result["errors"])[:self.max_errors]
+        self.logger.info("Imported {} SDL records in {} batches ({} failed).".format(result["imported"], result["batches"], result["failed"]))
+        return result
+
+    def _operation(self, line:bytes) -> dict:
+        """
+        Decodes a record into a batch set operation.
+        """
+        record = json.loads(line)
+        if not isinstance(record.get("key"), str):
+            raise ValueError("record has no string key")
+        if "msgpack" in record:
+            value = msgpack.unpackb(base64.b64decode(record["msgpack"]), raw=False)
+        else:
+            value = record["value"]
+        return {"op": "set", "key": record["key"], "value": value}
+
+    def _write_batches(self, batches:Queue, result:dict):
+        """
+        Writer thread that executes the queued batches until it receives None.
+        """
+        while True:
+            operations = batches.get()
+            if operations is None:
+                return
+            executed = self._batch.execute(self.namespace, operations)
+            result["batches"] += 1
+            result["round_trips"] += executed["round_trips"]
+            for operation_result in executed["results"]:
+                if operation_result["status"] == "ok":
+                    result["imported"] += 1
+                else:
+                    self._fail(result, "key {}: {}".format(operation_result["key"], operation_result.get("error")))
+
+    def _fail(self, result:dict, error:str):
+        """
+        Counts a failed record and keeps its description if there is room for it.
+        """
+        result["failed"] += 1
+        if len(result["errors"]) < self.max_errors:
+            result["errors"].append(error)
@@ -0,0 +1,156 @@
+
+# Imports from other libraries
+from threading import Condition, Event
+from typing import Callable
+import heapq
+import time
+
+class Clock:
+    """
+    Source of time of the xApp, which the waits of its scheduler go through. This one is the system
+    clock; VirtualClock replaces it in tests and benchmarks.
+    """
+    def time(self) -> float:
+        """
+        Returns the seconds since the epoch.
+        """
+        return time.time()
+
+    def monotonic(self) -> float:
+        """
+        Returns the seconds of a clock that never goes back, for measuring intervals.
+        """
+        return time.monotonic()
+
+    def sleep(self, seconds:float):
+        """
+        Suspends the calling thread for the given seconds.
+        """
+        time.sleep(seconds)
+
+    def wait(self, event:Event, timeout:float) -> bool:
+        """
+        Waits until event is set or timeout seconds elapse. Returns True if the event is set.
+        """
+        return event.wait(max(0.0, timeout))
+
+class VirtualClock(Clock):
+    """
+    Clock whose time only moves when it is told to, so periodic logic runs deterministically and
+    without waiting: an hour of a 1 second loop takes as long as 3600 iterations of its body.
+
+    With auto_advance, sleep() moves the time forward by the slept seconds and returns at once,
+    which suits a single thread driving the clock (e.g. an xApp loop called directly). Otherwise
+    sleep() blocks until another thread calls advance() past its deadline, and wait_for_sleepers()
+    tells that thread when the loops are blocked again, so it can step them one period at a time.
+
+    Callbacks scheduled with call_at() run when the time reaches them, with the clock set to their
+    exact time, e.g. clock.call_at(3600, xapp.stop) to end a soak run after one virtual hour.
+
+    Parameters
+    ----------
+    start: float = 0.0
+        Initial monotonic time, in seconds.
+    epoch: float = 1700000000.0
+        Value of time() when the monotonic time is 0 (a fixed date, so runs are reproducible).
+    auto_advance: bool = True
+        True for sleep() to advance the time itself, False for it to wait for advance().
+    """
+    def __init__(self, start:float = 0.0, epoch:float = 1700000000.0, auto_advance:bool = True):
+        """
+        Initializes the clock at its start time.
+        """
+        self._now = start
+        self.epoch = epoch
+        self.auto_advance = auto_advance
+        self._condition = Condition() # Protects the time and the timers, notified when the time moves or a thread sleeps
+        self._timers = [] # (time, sequence, callback) heap
+        self._seq = 0
+        self._deadlines = [] # Wake-up times of the threads blocked in sleep()
+
+    def time(self) -> float:
+        return self.epoch + self._now
+
+    def monotonic(self) -> float:
+        return self._now
+
+    def sleep(self, seconds:float):
+        if self.auto_advance:
+            self.advance(seconds)
+            return
+        with self._condition:
+            deadline = self._now + max(0.0, seconds)
+            self._deadlines.append(deadline)
+            self._condition.notify_all() # Wakes wait_for_sleepers()
+            try:
+                while self._now < deadline:
+                    self._condition.wait()
+            finally:
+                self._deadlines.remove(deadline)
+
+    def wait(self, event:Event, timeout:float) -> bool:
+        if event.is_set() or self.auto_advance:
+            if not event.is_set():
+                self.advance(timeout)
+            return event.is_set()
+        with self._condition:
+            deadline = self._now + max(0.0, timeout)
+            self._deadlines.append(deadline)
+            self._condition.notify_all() # Wakes wait_for_sleepers()
+            try:
+                while self._now < deadline and not event.is_set():
+                    self._condition.wait(0.01) # Event.set() does not notify the clock, so it is polled in real time
+            finally:
+                self._deadlines.remove(deadline)
+        return event.is_set()
+
+    # ------------------ VIRTUAL TIME CONTROL
+
+    def call_at(self, when:float, callback:Callable):
+        """
+        Runs callback() when the monotonic time reaches when.
+        """
+        with self._condition:
+            self._seq += 1
+            heapq.heappush(self._timers, (when, self._seq, callback))
+
+    def call_later(self, delay:float, callback:Callable):
+        """
+        Runs callback() after delay virtual seconds.
+        """
+        self.call_at(self._now + delay, callback)
+
+    def advance(self, seconds:float):
+        """
+        Moves the time forward, running the callbacks that become due (each one at its own time,
+        outside the clock lock) and waking the threads whose sleep ends.
+        """
+        with self._condition:
+            target = self._now + max(0.0, seconds)
+        while True:
+            with self._condition:
+                if not self._timers or self._timers[0][0] > target:
+                    self._now = max(self._now, target)
+                    self._condition.notify_all()
+                    return
+                when, _, callback = heapq.heappop(self._timers)
+                self._now = max(self._now, when)
+                self._condition.notify_all()
+            callback()
+
+    def sleepers(self) -> int:
+        """
+        Returns the number of threads blocked in sleep() whose deadline has not been reached.
+        """
+        with self._condition:
+            return self._pending_sleepers()
+
+    def _pending_sleepers(self) -> int:
+        return sum(1 for deadline in self._deadlines if deadline > self._now) # Woken threads may not have left sleep() yet
+
+    def wait_for_sleepers(self, count:int = 1, timeout:float = 5.0) -> bool:
+        """
+        Waits, for up to timeout real seconds, until count threads are blocked in sleep(). Returns False on timeout.
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: self._pending_sleepers() >= count, timeout=timeout)
@@ -5,17 +5,24 @@ from mdclogpy import Logger, Level
 from ricxappframe import xapp_rest
 
 # Imports from other libraries
-from time import sleep
-from threading import Thread
 import signal
+from urllib.parse import urlparse, parse_qs
 import json
 import requests
 
+# Imports from local files
+from .metrics import MetricsRegistry
+from .profiler import SamplingProfiler
+from .tracing import Tracer
+from .clock import Clock
+from .scheduler import Scheduler
+from .hash_router import MeidRouter, read_route_table
+
 class XappRmrSubAct:
     """
     Custom xApp class.
     """
-    def __init__(self, thread:bool = True):
+    def __init__(self, thread:bool = True, clock:Clock = None):
         """
         Initializes the custom xApp instance and instatiates the xApp framework object.
         """
@@ -33,25 +40,73 @@ class XappRmrSubAct:
             use_fake_sdl=False # Use a fake in-memory SDL
         )
 
+        # End-to-end RMR message tracing, with spans exported to a rotating OTLP JSON file
+        tracing_config = self._xapp._config_data.get("controls", {}).get("tracing", {})
+        self._tracer = Tracer(
+            service="xapp3rmrsubact",
+            sample_rate=tracing_config.get("sample_rate", 0.01), # Probability of tracing a message that starts a trace
+            root_mtypes=tracing_config.get("root_mtypes", []), # Received message types that start traces
+            path=tracing_config.get("path", "/tmp/xapp-spans.jsonl"),
+            max_bytes=tracing_config.get("max_bytes", 10485760), # Export file size before rotation
+            backups=tracing_config.get("backups", 3), # Rotated export files kept
+            logger=self.logger
+        )
+        self._tracer.instrument_rmr(self._xapp) # Before the metrics, which count the traced sends too
+
+        # Metrics registry, instrumenting the RMR sends and the SDL calls of the framework
+        self._metrics = MetricsRegistry()
+        self._metrics.instrument_rmr(self._xapp)
+        self._metrics.instrument_sdl(self._xapp.sdl)
+
+        # Sampling profiler of every thread, started by POST and read by GET /ric/v1/debug/profile
+        self._profiler = SamplingProfiler()
+
         # Registering a handler for terminating the xApp after TERMINATE, QUIT, or INTERRUPT signals
         signal.signal(signal.SIGTERM, self._handle_signal)
         signal.signal(signal.SIGQUIT, self._handle_signal)
         signal.signal(signal.SIGINT, self._handle_signal)
 
         # Initializing custom control variables
-        self._shutdown = False # Stops the xApp loop if True
         self._thread = thread # True for executing the xApp loop as a thread
+        self._clock = clock if clock is not None else Clock() # Every wait of the scheduler goes through it
+        self._scheduler = Scheduler(clock=self._clock, logger=self.logger) # Runs the xApp loop each second
         self._ready = False # True when the xApp is ready to start
 
+        # Routing of the messages to the reactive xApp replicas by E2 node MEID (consistent hashing), instead of the static route
+        routing_config = self._xapp._config_data.get("controls", {}).get("routing", {})
+        self._router = None
+        if routing_config.get("enabled", False):
+            self._routed_mtype = routing_config.get("mtype", 30000)
+            self._router = MeidRouter(
+                xapp=self._xapp,
+                endpoints=routing_config.get("endpoints", []) or read_route_table(self._routed_mtype), # Replicas, from the route table if not listed
+                vnodes=routing_config.get("vnodes", 100), # Virtual nodes per replica in the hash ring
+                failure_threshold=routing_config.get("failure_threshold", 3), # Failed sends in a row before a replica is down
+                retry_after=routing_config.get("retry_after", 10.0), # Seconds before a replica that is down is tried again
+                clock=self._clock,
+                logger=self.logger
+            )
+            self._router.instrument(self._metrics) # Sends, health and key share per replica
+
         # Registering handlers for RMR messages
         self._dispatch = {} # Dictionary for calling handlers of specific message types
         self._dispatch[30001] = self._handle_react_xapp_msg
+        self._tracer.trace_dispatch(self._dispatch) # Continues the traces carried by the received messages
+        self._metrics.instrument_dispatch(self._dispatch) # Counts and times the messages of each type
+        self._instrumented_default_handler = self._metrics.instrument_rmr_handler(self._tracer.trace_handler(self._default_handler))
 
         # Starting a threaded HTTP server listening to any host at port 8080 
         self.http_server = xapp_rest.ThreadedHTTPServer("0.0.0.0", 8080)
         self.http_server.handler.add_handler(self.http_server.handler, method="GET", name="config", uri="/ric/v1/config", callback=self.config_handler)
         self.http_server.handler.add_handler(self.http_server.handler, method="GET", name="liveness", uri="/ric/v1/health/alive", callback=self.liveness_handler)
         self.http_server.handler.add_handler(self.http_server.handler, method="GET", name="readiness", uri="/ric/v1/health/ready", callback=self.readiness_handler)
+        self.http_server.handler.add_handler(self.http_server.handler, method="GET", name="metrics", uri="/ric/v1/metrics", callback=self.metrics_handler)
+        self.http_server.handler.add_handler(self.http_server.handler, method="GET", name="profile", uri="/ric/v1/debug/profile", callback=self.profile_handler)
+        self.http_server.handler.add_handler(self.http_server.handler, method="POST", name="profile_control", uri="/ric/v1/debug/profile", callback=self.profile_control_handler)
+        self.http_server.handler.add_handler(self.http_server.handler, method="GET", name="tracing", uri="/ric/v1/debug/tracing", callback=self.tracing_handler)
+        self.http_server.handler.add_handler(self.http_server.handler, method="GET", name="routing", uri="/ric/v1/routing", callback=self.routing_handler)
+        self.http_server.handler.add_handler(self.http_server.handler, method="POST", name="routing_control", uri="/ric/v1/routing", callback=self.routing_control_handler)
+        self._metrics.instrument_rest(self.http_server.handler) # Counts and times every handler above
         self.logger.info("Starting HTTP server.")
         self.http_server.start()  
 
@@ -69,29 +124,41 @@ class XappRmrSubAct:
             This is the xApp framework object (passed by the framework).
         """
         
+        self._tracer.start() # Span exporter thread
+
         # Starting the xApp loop
         self.logger.info("Starting xApp loop in threaded mode.")
-        Thread(target=self._loop).start()
+        self._scheduler.fixed_rate("xapp-loop", 1, self._loop_iteration, initial_delay=0) # Every second, without drifting
+        self._scheduler.start()
 
-    def _loop(self):
+    def _loop_iteration(self):
         """
-        Loops sending a message to the reactive xApp.
-        """     
-        while not self._shutdown: # True since custom xApp initialization until stop() is called
-            self._receive_RMR_messages() # Call handlers for all received RMR messages
-            if not self._xapp.rmr_send(payload="Message of type 30000 from the active xApp".encode(), mtype=30000): # Sends an RMR message of type 30000
-                self.logger.error("Message of type 30000 could not be sent")
-            else:
-                self.logger.info("Message of type 30000 sent to the reactive xApp.")
-            sleep(1) # Sleeps for 1 second
-            
+        Handles the received messages and sends a message to the reactive xApp. Run by the scheduler each second.
+        """
+        self._receive_RMR_messages() # Call handlers for all received RMR messages
+        if self._router is not None:
+            self._send_to_e2_node_owners()
+        elif not self._xapp.rmr_send(payload="Message of type 30000 from the active xApp".encode(), mtype=30000): # Sends an RMR message of type 30000
+            self.logger.error("Message of type 30000 could not be sent")
+        else:
+            self.logger.info("Message of type 30000 sent to the reactive xApp.")
+
+    def _send_to_e2_node_owners(self):
+        """
+        Sends one message per E2 node to the reactive xApp replica owning the node, with its inventory name as MEID.
+        """
+        for nodeb in self._xapp.GetListNodebIds(): # E2 nodes from R-NIB
+            payload = "Message of type {} from the active xApp about {}".format(self._routed_mtype, nodeb.inventory_name).encode()
+            if not self._router.send(payload, self._routed_mtype, key=nodeb.inventory_name):
+                self.logger.error("Message of type {} about {} could not be sent to any replica".format(self._routed_mtype, nodeb.inventory_name))
+        self.logger.info("Messages of type {} sent to the reactive xApp replicas.".format(self._routed_mtype))
 
     def _receive_RMR_messages(self):
         """
         Call handlers for all received RMR messages.
         """
         for summary, sbuf in self._xapp.rmr_get_messages():
-            func = self._dispatch.get(summary[rmr.RMR_MS_MSG_TYPE], self._default_handler)
+            func = self._dispatch.get(summary[rmr.RMR_MS_MSG_TYPE], self._instrumented_default_handler)
             self.logger.debug("Invoking RMR message handler on type {}".format(summary[rmr.RMR_MS_MSG_TYPE]))
             func(self._xapp, summary, sbuf)
     
@@ -168,6 +235,133 @@ class XappRmrSubAct:
         self.logger.debug("Readiness handler response: {}.".format(response))
         return response
 
+    def profile_handler(self, name:str, path:str, data:bytes, ctype:str):
+        """
+        Handler for the HTTP GET /ric/v1/debug/profile[?format=collapsed|json&weight=cpu|samples] request.
+        Returns the latest profile started by POST /ric/v1/debug/profile: collapsed stacks for flame graphs, or a JSON summary with the CPU time per handler.
+        """
+        self.logger.info("Received GET /ric/v1/debug/profile request with content type {}.".format(ctype))
+        query = parse_qs(urlparse(path).query)
+        profile = self._profiler.result()
+        if self._profiler.running() or profile is None:
+            response = xapp_rest.initResponse(
+                status=202 if self._profiler.running() else 404, # Status = 202 Accepted (still sampling) or 404 Not Found
+                response="Profile"
+            )
+            response['payload'] = json.dumps({"status": "running" if self._profiler.running() else "No profile, start one with POST /ric/v1/debug/profile."})
+            return response
+        response = xapp_rest.initResponse(
+            status=200, # Status = 200 OK
+            response="Profile"
+        ) # Initiating HTTP response
+        if query.get("format", ["collapsed"])[0] == "json":
+            response['payload'] = json.dumps(profile.to_dict()) # Payload = CPU time per handler and collapsed stacks
+        else:
+            response['ctype'] = "text/plain"
+            weight = query.get("weight", ["cpu"])[0] if profile.cpu_clocks else "samples"
+            response['payload'] = profile.collapsed(weight) # Payload = one "thread;frame;...;frame count" line per stack
+        return response
+
+    def profile_control_handler(self, name:str, path:str, data:bytes, ctype:str):
+        """
+        Handler for the HTTP POST /ric/v1/debug/profile[?seconds=5&hz=100] request.
+        Starts sampling the stacks of every thread in the background, the profile is then read with GET /ric/v1/debug/profile.
+        """
+        self.logger.info("Received POST /ric/v1/debug/profile request with content type {}.".format(ctype))
+        query = parse_qs(urlparse(path).query)
+        try:
+            seconds = float(query.get("seconds", ["5"])[0]) # Profile duration, the HTTP server keeps answering meanwhile
+            started = self._profiler.start(
+                seconds=seconds,
+                hz=float(query.get("hz", ["100"])[0]) # Sampling frequency
+            )
+        except ValueError as e:
+            response = xapp_rest.initResponse(
+                status=400, # Status = 400 Bad Request
+                response="Profile"
+            )
+            response['payload'] = json.dumps({"error": str(e)})
+            return response
+        if not started:
+            response = xapp_rest.initResponse(
+                status=409, # Status = 409 Conflict
+                response="Profile"
+            )
+            response['payload'] = json.dumps({"error": "A profile is already running."})
+            return response
+        response = xapp_rest.initResponse(
+            status=202, # Status = 202 Accepted
+            response="Profile"
+        ) # Initiating HTTP response
+        response['payload'] = json.dumps({"status": "running", "seconds": seconds})
+        return response
+
+    def tracing_handler(self, name:str, path:str, data:bytes, ctype:str):
+        """
+        Handler for the HTTP GET /ric/v1/debug/tracing request.
+        """
+        self.logger.debug("Received GET /ric/v1/debug/tracing request with content type {}.".format(ctype))
+        response = xapp_rest.initResponse(
+            status=200, # Status = 200 OK
+            response="Tracing stats"
+        ) # Initiating HTTP response
+        response['payload'] = json.dumps(self._tracer.stats()) # Payload = sampled, exported and dropped spans
+        return response
+
+    def routing_handler(self, name:str, path:str, data:bytes, ctype:str):
+        """
+        Handler for the HTTP GET /ric/v1/routing request.
+        """
+        self.logger.debug("Received GET /ric/v1/routing request with content type {}.".format(ctype))
+        if self._router is None:
+            response = xapp_rest.initResponse(
+                status=404, # Status = 404 Not Found
+                response="Routing"
+            )
+            response['payload'] = json.dumps({"error": "MEID routing is disabled (controls.routing.enabled)."})
+            return response
+        response = xapp_rest.initResponse(
+            status=200, # Status = 200 OK
+            response="Routing"
+        ) # Initiating HTTP response
+        response['payload'] = json.dumps(self._router.stats()) # Payload = health, key share and sends per replica
+        return response
+
+    def routing_control_handler(self, name:str, path:str, data:bytes, ctype:str):
+        """
+        Handler for the HTTP POST /ric/v1/routing request, with {"endpoints": ["host:port", ...]} as body.
+        Replaces the replica endpoints when reactive xApp replicas join or leave.
+        """
+        self.logger.info("Received POST /ric/v1/routing request with content type {}.".format(ctype))
+        if self._router is None:
+            return self.routing_handler(name, path, data, ctype)
+        try:
+            endpoints = json.loads(data)["endpoints"]
+            if not isinstance(endpoints, list) or not all(isinstance(endpoint, str) for endpoint in endpoints):
+                raise ValueError("endpoints must be a list of host:port strings")
+        except (ValueError, KeyError, TypeError) as e:
+            response = xapp_rest.initResponse(
+                status=400, # Status = 400 Bad Request
+                response="Routing"
+            )
+            response['payload'] = json.dumps({"error": str(e)})
+            return response
+        self._router.set_endpoints(endpoints)
+        return self.routing_handler(name, path, data, ctype)
+
+    def metrics_handler(self, name:str, path:str, data:bytes, ctype:str):
+        """
+        Handler for the HTTP GET /ric/v1/metrics request.
+        """
+        self.logger.debug("Received GET /ric/v1/metrics request with content type {}.".format(ctype))
+        response = xapp_rest.initResponse(
+            status=200, # Status = 200 OK
+            response="Metrics"
+        ) # Initiating HTTP response
+        response['ctype'] = MetricsRegistry.CONTENT_TYPE
+        response['payload'] = self._metrics.expose() # Payload = every metric in the Prometheus text format
+        return response
+
 
     def start(self):
         """
@@ -179,7 +373,8 @@ class XappRmrSubAct:
         """
         Terminates the xApp. Can only be called if the xApp is running in threaded mode.
         """
-        self._shutdown = True
+        self._scheduler.stop()
         self.logger.info("Calling framework termination to unregister the xApp from AppMgr.")
         self._xapp.stop()
+        self._tracer.stop() # Exports the spans still queued
         self.http_server.stop()
\ No newline at end of file
@@ -0,0 +1,302 @@
+
+# Imports from OSC libraries
+from ricxappframe.xapp_frame import Xapp, rmr
+from mdclogpy import Logger
+
+# Imports from other libraries
+from threading import Lock
+from bisect import bisect_left
+from hashlib import blake2b
+from typing import Dict, Iterator, List
+import os
+
+# Imports from local files
+from .metrics import MetricsRegistry
+from .clock import Clock
+
+def _hash(data:bytes) -> int:
+    return int.from_bytes(blake2b(data, digest_size=8).digest(), "big")
+
+def read_route_table(mtype:int, path:str = None) -> List[str]:
+    """
+    Returns the endpoints (host:port) the static route table sends mtype to, every round-robin group
+    of its mse or rte entries included. path defaults to the seed route table of RMR (RMR_SEED_RT).
+    """
+    path = path if path is not None else os.environ.get("RMR_SEED_RT", "")
+    endpoints = []
+    try:
+        with open(path) as route_table:
+            for line in route_table:
+                fields = [field.strip() for field in line.split("#", 1)[0].split("|")]
+                if fields[0] == "mse" and len(fields) >= 4:
+                    entry_mtype, groups = fields[1], fields[3] # mse|mtype[,sender]|subid|groups
+                elif fields[0] == "rte" and len(fields) >= 3:
+                    entry_mtype, groups = fields[1], fields[-1] # rte|mtype[,sender]|groups
+                else:
+                    continue
+                if entry_mtype.split(",")[0] != str(mtype):
+                    continue
+                for group in groups.split(";"): # Groups receive a copy each, the endpoints of a group take turns
+                    endpoints += [endpoint.strip() for endpoint in group.split(",") if endpoint.strip() not in endpoints + [""]]
+    except OSError:
+        return []
+    return endpoints
+
+class HashRing:
+    """
+    Consistent-hash ring of endpoints: each endpoint owns the arcs that end at its virtual nodes,
+    and a key belongs to the first virtual node at or after its hash. Adding or removing an endpoint
+    only moves the keys of the arcs it gains or loses (about 1/N of them), every other key keeps its owner.
+
+    Parameters
+    ----------
+    vnodes: int = 100
+        Virtual nodes per endpoint. More of them even out the share of each endpoint.
+    """
+    def __init__(self, vnodes:int = 100):
+        """
+        Initializes an empty ring.
+        """
+        self.vnodes = vnodes
+        self.endpoints:List[str] = []
+        self._hashes:List[int] = [] # Sorted hashes of the virtual nodes
+        self._owners:List[str] = [] # Endpoint of each virtual node
+
+    def _rebuild(self):
+        points = sorted((_hash("{}#{}".format(endpoint, i).encode()), endpoint) for endpoint in self.endpoints for i in range(self.vnodes))
+        self._hashes = [point for point, _ in points]
+        self._owners = [endpoint for _, endpoint in points]
+
+    def add(self, endpoint:str):
+        if endpoint not in self.endpoints:
+            self.endpoints.append(endpoint)
+            self._rebuild()
+
+    def remove(self, endpoint:str):
+        if endpoint in self.endpoints:
+            self.endpoints.remove(endpoint)
+            self._rebuild()
+
+    def walk(self, key:bytes) -> Iterator[str]:
+        """
+        Yields every endpoint once, from the owner of key onwards along the ring (its fallbacks, in order).
+        """
+        if not self._hashes:
+            return
+        start = bisect_left(self._hashes, _hash(key))
+        seen = set()
+        for i in range(len(self._owners)):
+            endpoint = self._owners[(start + i) % len(self._owners)]
+            if endpoint not in seen:
+                seen.add(endpoint)
+                yield endpoint
+                if len(seen) == len(self.endpoints):
+                    return
+
+    def owner(self, key:bytes) -> str:
+        """
+        Returns the endpoint owning key, None if the ring is empty.
+        """
+        return next(self.walk(key), None)
+
+    def shares(self) -> Dict[str, float]:
+        """
+        Returns the fraction of the hash space owned by each endpoint.
+        """
+        shares = {endpoint: 0.0 for endpoint in self.endpoints}
+        for i, point in enumerate(self._hashes):
+            previous = self._hashes[i - 1] if i > 0 else self._hashes[-1] - 2 ** 64
+            shares[self._owners[i]] += (point - previous) / 2 ** 64
+        return shares
+
+class _Endpoint:
+    """
+    Send statistics and health of one endpoint of a MeidRouter.
+    """
+    def __init__(self, name:str):
+        self.name = name
+        self.whid = -1 # RMR wormhole, -1 until opened
+        self.up = True
+        self.sent = 0
+        self.bytes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.retry_at = 0.0 # Monotonic time after which an endpoint that is down is probed again
+        self.last_error = ""
+
+class MeidRouter:
+    """
+    Sender-side routing of RMR messages to the replicas of a scaled-out xApp by a key, usually the
+    MEID of the E2 node the message is about, so each replica keeps receiving the messages of the
+    same E2 nodes (and keeps their state in its caches) instead of RMR's round-robin spreading them.
+
+    The replica endpoints (host:port of their RMR data port) form a HashRing; messages are sent
+    directly to the owner of their key through an RMR wormhole, with the key set as the MEID.
+    When a replica joins or leaves (set_endpoints()), only the keys of its arcs move. A replica
+    failing failure_threshold sends in a row is marked down and its keys go, in ring order, to the
+    next replicas that are up, until it is probed again retry_after seconds later; one successful
+    send marks it up again and gives it its keys back.
+
+    Parameters
+    ----------
+    xapp: Xapp
+        Framework object whose RMR context sends the messages.
+    endpoints: List[str]
+        Replica endpoints, as host:port.
+    vnodes: int = 100
+        Virtual nodes per endpoint in the hash ring.
+    failure_threshold: int = 3
+        Consecutive failed sends after which an endpoint is marked down.
+    retry_after: float = 10.0
+        Seconds before an endpoint that is down is tried again.
+    clock: Clock = None
+        Source of time of the retries (the system clock by default).
+    logger: Logger = None
+        Logger used to report endpoints going down and up.
+    """
+    def __init__(self, xapp:Xapp, endpoints:List[str], vnodes:int = 100, failure_threshold:int = 3, retry_after:float = 10.0,
+                 clock:Clock = None, logger:Logger = None):
+        """
+        Initializes the ring with the given endpoints. Wormholes are opened on the first send to each endpoint.
+        """
+        self._xapp = xapp
+        self.failure_threshold = failure_threshold
+        self.retry_after = retry_after
+        self._clock = clock if clock is not None else Clock()
+        self.logger = logger if logger is not None else Logger(name="MeidRouter")
+        self._lock = Lock() # Protects the ring and the endpoints against set_endpoints() from the HTTP server
+        self._ring = HashRing(vnodes)
+        self._endpoints:Dict[str, _Endpoint] = {}
+        self._retired:List[int] = [] # Wormholes of the endpoints that left, closed by the sending thread
+        self._sends = None # Counter of sends per endpoint and result, set by instrument()
+        self.set_endpoints(endpoints)
+
+    def set_endpoints(self, endpoints:List[str]) -> Dict[str, float]:
+        """
+        Replaces the replica endpoints (replicas joining and leaving). Returns the new share of the
+        hash space of each endpoint.
+        """
+        with self._lock:
+            for name in [name for name in self._endpoints if name not in endpoints]:
+                endpoint = self._endpoints.pop(name)
+                self._ring.remove(name)
+                if endpoint.whid >= 0:
+                    self._retired.append(endpoint.whid) # A send may be using it right now
+                self.logger.info("Endpoint {} left the routing ring.".format(name))
+            for name in endpoints:
+                if name not in self._endpoints:
+                    self._endpoints[name] = _Endpoint(name)
+                    self._ring.add(name)
+                    self.logger.info("Endpoint {} joined the routing ring.".format(name))
+            return self._ring.shares()
+
+    def owner(self, key) -> str:
+        """
+        Returns the endpoint key is routed to while every endpoint is up.
+        """
+        with self._lock:
+            return self._ring.owner(key.encode() if isinstance(key, str) else key)
+
+    # ------------------ SEND
+
+    def _candidates(self, key:bytes) -> List[_Endpoint]:
+        """
+        Returns the endpoints to try for key, in ring order: the ones that are up, and the ones down whose retry time has come.
+        """
+        now = self._clock.monotonic()
+        with self._lock:
+            endpoints = [self._endpoints[name] for name in self._ring.walk(key)]
+        return [endpoint for endpoint in endpoints if endpoint.up or now >= endpoint.retry_at]
+
+    def send(self, payload:bytes, mtype:int, key, retries:int = 100) -> bool:
+        """
+        Sends a message to the endpoint owning key (or, if it is down, to the next one up), with key
+        as its MEID. Returns False if no endpoint accepted it.
+        """
+        key = key.encode() if isinstance(key, str) else key
+        while self._retired:
+            rmr.rmr_wh_close(self._xapp._mrc, self._retired.pop())
+        for endpoint in self._candidates(key):
+            error = self._send_to(endpoint, payload, mtype, key, retries)
+            if error is None:
+                self._record_success(endpoint, len(payload))
+                return True
+            self._record_failure(endpoint, error)
+        return False
+
+    def _send_to(self, endpoint:_Endpoint, payload:bytes, mtype:int, key:bytes, retries:int) -> str:
+        """
+        Sends a message through the wormhole of endpoint, opening it if needed. Returns None on success, else the error.
+        """
+        mrc = self._xapp._mrc
+        if endpoint.whid < 0:
+            endpoint.whid = rmr.rmr_wh_open(mrc, endpoint.name.encode())
+            if endpoint.whid < 0:
+                return "wormhole could not be opened"
+        sbuf = rmr.rmr_alloc_msg(mrc, len(payload), payload=payload, gen_transaction_id=True, mtype=mtype,
+                                 meid=key if len(key) < 32 else None) # RMR MEIDs hold up to 31 bytes, longer keys only route
+        for _ in range(retries):
+            sbuf = rmr.rmr_wh_send_msg(mrc, endpoint.whid, sbuf)
+            if sbuf.contents.state != rmr.RMR_ERR_RETRY:
+                break
+        state = sbuf.contents.state
+        rmr.rmr_free_msg(sbuf)
+        if state == rmr.RMR_OK:
+            return None
+        rmr.rmr_wh_close(mrc, endpoint.whid) # Reopened by the next send, in case the replica restarted
+        endpoint.whid = -1
+        return "send state {}".format(state)
+
+    def _record_success(self, endpoint:_Endpoint, size:int):
+        if not endpoint.up:
+            self.logger.info("Endpoint {} is up again, its keys are routed back to it.".format(endpoint.name))
+        endpoint.up = True
+        endpoint.consecutive_failures = 0
+        endpoint.sent += 1
+        endpoint.bytes += size
+        if self._sends is not None:
+            self._sends.inc(endpoint.name, "ok")
+
+    def _record_failure(self, endpoint:_Endpoint, error:str):
+        endpoint.failures += 1
+        endpoint.consecutive_failures += 1
+        endpoint.last_error = error
+        if endpoint.up and endpoint.consecutive_failures >= self.failure_threshold:
+            self.logger.warning("Endpoint {} is down after {} failed sends ({}), its keys go to the next endpoints.".format(
+                endpoint.name, endpoint.consecutive_failures, error))
+            endpoint.up = False
+        if not endpoint.up:
+            endpoint.retry_at = self._clock.monotonic() + self.retry_after
+        if self._sends is not None:
+            self._sends.inc(endpoint.name, "failed")
+
+    # ------------------ STATS
+
+    def stats(self) -> Dict[str, dict]:
+        """
+        Returns the health, share of the keys and sends of every endpoint.
+        """
+        with self._lock:
+            shares = self._ring.shares()
+            endpoints = list(self._endpoints.values())
+        return {
+            endpoint.name: {
+                "up": endpoint.up,
+                "share": shares.get(endpoint.name, 0.0), # Fraction of the keys owned while every endpoint is up
+                "sent": endpoint.sent,
+                "bytes": endpoint.bytes,
+                "failures": endpoint.failures,
+                "consecutive_failures": endpoint.consecutive_failures,
+                "last_error": endpoint.last_error
+            } for endpoint in endpoints
+        }
+
+    def instrument(self, metrics:MetricsRegistry):
+        """
+        Exports the sends, health and share of every endpoint as metrics.
+        """
+        self._sends = metrics.counter("rmr_router_sends_total", "RMR messages sent by the MEID router per endpoint and result.", ("endpoint", "result"))
+        metrics.callback("rmr_router_endpoint_up", "1 if the endpoint receives its keys, 0 while it is down.", ("endpoint",),
+                         lambda: {(name,): int(entry["up"]) for name, entry in self.stats().items()})
+        metrics.callback("rmr_router_endpoint_share", "Fraction of the keys owned by the endpoint.", ("endpoint",),
+                         lambda: {(name,): entry["share"] for name, entry in self.stats().items()})
@@ -0,0 +1,377 @@
+
+# Imports from OSC libraries
+from mdclogpy import Logger
+
+# Imports from other libraries
+from threading import Thread, Lock, Event, Semaphore, current_thread
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+import math
+import traceback
+
+# Imports from local files
+from .clock import Clock
+
+_SLOT_BITS = 8
+_SLOTS = 1 << _SLOT_BITS # Slots per wheel level
+_SLOT_MASK = _SLOTS - 1
+
+class Task:
+    """
+    A job of the scheduler, with its run statistics. Created by Scheduler.fixed_rate(), fixed_delay() and once().
+    """
+    def __init__(self, scheduler, name:str, fn:Callable, period:float, fixed_rate:bool):
+        self.name = name
+        self.fn = fn
+        self.period = period # Seconds between due times (fixed rate), or between a run end and the next start (fixed delay), None once
+        self.fixed_rate = fixed_rate
+        self._scheduler = scheduler
+        self._due = 0.0 # Clock time of the next run
+        self._generation = 0 # Changes when the task is rescheduled, invalidating its previous wheel entry
+        self._running = False
+        self._triggered = False # trigger() was called while the task was running
+        self.cancelled = False
+
+        # Stats
+        self.runs = 0
+        self.errors = 0
+        self.overruns = 0 # Runs longer than the period
+        self.skipped = 0 # Due runs not started: previous run still going, executor full, or missed periods
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.max_lateness = 0.0 # Largest delay of a start behind its due time
+
+    def cancel(self):
+        """
+        Stops scheduling the task. A run in progress finishes.
+        """
+        self._scheduler.cancel(self)
+
+    def trigger(self):
+        """
+        Runs the task as soon as possible, out of its schedule. The next runs are counted from this one.
+        """
+        self._scheduler.trigger(self)
+
+    def stats(self) -> dict:
+        return {
+            "period": self.period,
+            "fixed_rate": self.fixed_rate,
+            "runs": self.runs,
+            "errors": self.errors,
+            "overruns": self.overruns,
+            "skipped": self.skipped,
+            "mean_seconds": self.total_seconds / self.runs if self.runs else 0.0,
+            "max_seconds": self.max_seconds,
+            "max_lateness": self.max_lateness,
+            "running": self._running,
+            "next_due": None if self.cancelled else self._due
+        }
+
+class _TimerWheel:
+    """
+    Hierarchical timer wheel: levels of 256 slots, level k slots spanning 256^k ticks. Adding or
+    removing a timer costs O(1), and advancing one tick only touches one slot, plus a cascade of
+    one higher-level slot every 256 ticks. Entries are (task, generation) pairs, dropped when stale.
+    """
+    def __init__(self, levels:int = 4):
+        self.levels = levels
+        self.current = 0 # Last tick processed
+        self._slots = [[[] for _ in range(_SLOTS)] for _ in range(levels)]
+        self._counts = [0] * levels # Entries per level
+        self._overflow = [] # (tick, entry) beyond the span of the wheel
+
+    def __len__(self) -> int:
+        return sum(self._counts) + len(self._overflow)
+
+    def add(self, tick:int, entry:tuple, due:list):
+        """
+        Adds an entry expiring at tick, or appends it to due if the tick has already been processed
+        (only when cascading, new timers are added for a later tick).
+        """
+        if tick <= self.current:
+            due.append(entry)
+            return
+        for level in range(self.levels):
+            shift = _SLOT_BITS * level
+            if tick >> (shift + _SLOT_BITS) == self.current >> (shift + _SLOT_BITS): # Same rotation of the level above
+                self._slots[level][(tick >> shift) & _SLOT_MASK].append((tick, entry))
+                self._counts[level] += 1
+                return
+        self._overflow.append((tick, entry))
+
+    def advance(self, target:int, due:list):
+        """
+        Processes the ticks up to target, appending the expired entries to due. Stretches of empty
+        level 0 slots are skipped, so a long jump (e.g. of a virtual clock) costs one step per rotation.
+        """
+        while self.current < target:
+            if self._counts[0] == 0: # Nothing before the next cascade point
+                self.current = min(target, (self.current | _SLOT_MASK) + 1) - 1
+            self.current += 1
+            tick = self.current
+            if tick & ((1 << (_SLOT_BITS * self.levels)) - 1) == 0 and self._overflow:
+                overflow, self._overflow = self._overflow, []
+                for expiry, entry in overflow:
+                    self.add(expiry, entry, due)
+            for level in range(self.levels - 1, 0, -1): # Higher levels first, they refill the lower ones
+                shift = _SLOT_BITS * level
+                if tick & ((1 << shift) - 1) == 0:
+                    slot = self._slots[level][(tick >> shift) & _SLOT_MASK]
+                    if slot:
+                        self._slots[level][(tick >> shift) & _SLOT_MASK] = []
+                        self._counts[level] -= len(slot)
+                        for expiry, entry in slot:
+                            self.add(expiry, entry, due)
+            slot = self._slots[0][tick & _SLOT_MASK]
+            if slot:
+                self._slots[0][tick & _SLOT_MASK] = []
+                self._counts[0] -= len(slot)
+                due.extend(entry for _, entry in slot)
+
+    def next_tick(self) -> int:
+        """
+        Returns the next tick worth waking up for: the next non-empty level 0 slot of this rotation, or the next cascade point.
+        """
+        base = self.current
+        if self._counts[0]:
+            for offset in range(1, _SLOTS - (base & _SLOT_MASK)):
+                if self._slots[0][(base + offset) & _SLOT_MASK]:
+                    return base + offset
+        return (base | _SLOT_MASK) + 1
+
+class Scheduler:
+    """
+    Runs the periodic and delayed jobs of the xApp on one thread, driven by a hierarchical timer wheel.
+
+    Fixed-rate tasks are due at start + n * period whatever their run times, so they do not drift;
+    a run that is due while the previous one is still going is skipped (and counted) instead of
+    piling up. Fixed-delay tasks start period seconds after their previous run ended. Runs longer
+    than their period are counted as overruns. Jobs run on the scheduler thread by default, or on a
+    bounded pool of workers, whose full queue also skips runs rather than growing.
+
+    Time comes from the xApp clock, so the tasks follow a VirtualClock in tests and benchmarks.
+
+    Parameters
+    ----------
+    clock: Clock = None
+        Source of time (the system clock by default).
+    tick: float = 0.01
+        Resolution of the timers, in seconds.
+    workers: int = 0
+        Worker threads running the jobs, 0 to run them on the scheduler thread.
+    max_queued: int = 16
+        Runs waiting for a worker before further runs are skipped.
+    logger: Logger = None
+        Logger used to report failed and overrunning jobs.
+    """
+    def __init__(self, clock:Clock = None, tick:float = 0.01, workers:int = 0, max_queued:int = 16, logger:Logger = None):
+        """
+        Initializes the scheduler without tasks. Jobs only run after start() or run() is called.
+        """
+        self.clock = clock if clock is not None else Clock()
+        self.tick = tick
+        self.logger = logger if logger is not None else Logger(name="Scheduler")
+        self._lock = Lock() # Protects the wheel and the task states, also changed by the workers
+        self._wheel = _TimerWheel()
+        self._start = self.clock.monotonic() - tick # Clock time of tick 0, processed already: now is tick 1, so tasks due now are not late
+        self._wakeup = Event() # Set when a task is due earlier than the scheduler thread planned to wake up
+        self._planned_tick = None # Tick the scheduler thread is waiting for
+        self._tasks:Dict[str, Task] = {}
+        self._running = False
+        self._thread = None
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scheduler-worker") if workers > 0 else None
+        self._slots = Semaphore(workers + max_queued) if workers > 0 else None
+
+    # ------------------ TASKS
+
+    def fixed_rate(self, name:str, period:float, fn:Callable, initial_delay:float = None) -> Task:
+        """
+        Runs fn() every period seconds, the first time after initial_delay (one period by default).
+        """
+        return self._add(Task(self, name, fn, period, fixed_rate=True), period if initial_delay is None else initial_delay)
+
+    def fixed_delay(self, name:str, delay:float, fn:Callable, initial_delay:float = None) -> Task:
+        """
+        Runs fn() delay seconds after the end of its previous run, the first time after initial_delay (delay by default).
+        """
+        return self._add(Task(self, name, fn, delay, fixed_rate=False), delay if initial_delay is None else initial_delay)
+
+    def once(self, name:str, delay:float, fn:Callable) -> Task:
+        """
+        Runs fn() once, after delay seconds.
+        """
+        return self._add(Task(self, name, fn, None, fixed_rate=False), delay)
+
+    def _add(self, task:Task, delay:float) -> Task:
+        """
+        Registers a task (replacing any task of the same name) and schedules its first run.
+        """
+        with self._lock:
+            previous = self._tasks.get(task.name, None)
+            if previous is not None:
+                previous.cancelled = True
+                previous._generation += 1
+            self._tasks[task.name] = task
+            self._schedule(task, self.clock.monotonic() + delay)
+        return task
+
+    def _tick_of(self, when:float) -> int:
+        return math.ceil((when - self._start) / self.tick - 1e-9) # Never before its time, tolerating float noise
+
+    def _schedule(self, task:Task, due:float):
+        """
+        Puts a task in the wheel for due (clock time). Called with the lock held.
+        """
+        task._due = due
+        task._generation += 1
+        tick = max(self._tick_of(due), self._wheel.current + 1) # Ticks up to the current one are already processed
+        self._wheel.add(tick, (task, task._generation), None)
+        if self._planned_tick is None or tick < self._planned_tick:
+            self._wakeup.set()
+
+    def cancel(self, task:Task):
+        """
+        Stops scheduling a task.
+        """
+        with self._lock:
+            task.cancelled = True
+            task._generation += 1 # Its wheel entry becomes stale
+            if self._tasks.get(task.name, None) is task:
+                del self._tasks[task.name]
+
+    def trigger(self, task:Task):
+        """
+        Runs a task as soon as possible, or right after its current run.
+        """
+        with self._lock:
+            if task.cancelled:
+                return
+            if task._running:
+                task._triggered = True # Runs again right after the current run
+            else:
+                self._schedule(task, self.clock.monotonic())
+
+    # ------------------ DISPATCH
+
+    def start(self):
+        """
+        Runs the scheduler on its own thread.
+        """
+        self._thread = Thread(target=self.run, name="scheduler", daemon=True)
+        self._thread.start()
+
+    def run(self):
+        """
+        Runs the due tasks until stop() is called. Blocks the calling thread.
+        """
+        self._running = True
+        while self._running:
+            due = []
+            with self._lock:
+                self._wheel.advance(math.floor((self.clock.monotonic() - self._start) / self.tick + 1e-9), due) # Same tolerance as _tick_of()
+                planned = self._wheel.next_tick()
+                self._planned_tick = planned
+            for task, generation in due:
+                self._dispatch(task, generation)
+            if not self._running:
+                break
+            self.clock.wait(self._wakeup, self._start + planned * self.tick - self.clock.monotonic())
+            self._wakeup.clear()
+
+    def stop(self, wait:bool = True):
+        """
+        Stops the scheduler. With wait, also waits for the runs in progress (except when called by a task).
+        """
+        self._running = False
+        self._wakeup.set()
+        if self._thread is not None and wait and self._thread is not current_thread():
+            self._thread.join()
+        self._thread = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+
+    def _dispatch(self, task:Task, generation:int):
+        """
+        Starts a due run of a task (inline or on a worker) and schedules a fixed-rate task's next run.
+        """
+        with self._lock:
+            if task.cancelled or generation != task._generation:
+                return # Stale entry of a rescheduled or cancelled task
+            now = self.clock.monotonic()
+            lateness = now - task._due
+            if task.fixed_rate:
+                due = task._due + task.period
+                if due <= now: # Missed periods (the scheduler or the clock jumped) are skipped, not run back to back
+                    missed = math.floor((now - due) / task.period) + 1
+                    task.skipped += missed
+                    due += missed * task.period
+                self._schedule(task, due)
+            if task._running:
+                task.skipped += 1
+                return
+            if self._slots is not None and not self._slots.acquire(blocking=False):
+                task.skipped += 1
+                if not task.fixed_rate and task.period is not None:
+                    self._schedule(task, now + task.period)
+                return
+            task._running = True
+            task.max_lateness = max(task.max_lateness, lateness)
+        if self._executor is not None:
+            self._executor.submit(self._run, task)
+        else:
+            self._run(task)
+
+    def _run(self, task:Task):
+        """
+        Runs a task and records its duration, then schedules a fixed-delay task's next run.
+        """
+        start = self.clock.monotonic()
+        try:
+            task.fn()
+        except Exception:
+            task.errors += 1
+            self.logger.error("Scheduled task {} failed: {}".format(task.name, traceback.format_exc()))
+        seconds = self.clock.monotonic() - start
+        if self._slots is not None:
+            self._slots.release()
+        with self._lock:
+            task._running = False
+            task.runs += 1
+            task.total_seconds += seconds
+            task.max_seconds = max(task.max_seconds, seconds)
+            if task.period is not None and seconds > task.period:
+                task.overruns += 1
+                if task.overruns == 1:
+                    self.logger.warning("Scheduled task {} ran for {:.3f} s, over its period of {} s.".format(task.name, seconds, task.period))
+            if task.cancelled:
+                return
+            if task._triggered:
+                task._triggered = False
+                self._schedule(task, self.clock.monotonic())
+            elif not task.fixed_rate:
+                if task.period is None: # One-shot
+                    task.cancelled = True
+                    self._tasks.pop(task.name, None)
+                else:
+                    self._schedule(task, self.clock.monotonic() + task.period)
+
+    # ------------------ STATS
+
+    def stats(self) -> dict:
+        """
+        Returns the statistics of every task and the number of pending timers.
+        """
+        with self._lock:
+            return {
+                "tick": self.tick,
+                "timers": len(self._wheel),
+                "tasks": {name: task.stats() for name, task in self._tasks.items()}
+            }
+
+    def tasks(self) -> List[Task]:
+        """
+        Returns the scheduled tasks.
+        """
+        with self._lock:
+            return list(self._tasks.values())
@@ -2,21 +2,48 @@
 # Imports from OSC libraries
 from ricxappframe.xapp_frame import RMRXapp, rmr
 from mdclogpy import Logger, Level
-from ricxappframe import xapp_rest, xapp_subscribe
+from ricxappframe import xapp_rest # xapp_subscribe is not imported, see subscribe_to_e2_nodes()
 
 # Imports from other libraries
-from time import sleep
-from threading import Thread
+from time import sleep, monotonic
+from threading import Thread, Lock
 import signal
+from urllib.parse import urlparse, parse_qs
 import json
 import requests
-from typing import Dict
+from typing import Dict, Tuple
+
+# Imports from local files
+from .sdl_cache import SdlReadThroughCache
+from .sdl_codec import SdlCodecs, CompactCodec
+from .metrics import MetricsRegistry
+from .profiler import SamplingProfiler
+from .tracing import Tracer
+from .watchdog import HandlerWatchdog
+from .memory_diag import MemoryDiagnostics
+from .startup import StartupProfiler
+from .recorder import RmrRecorder
+from .threads import ThreadRegistry
+from .supervisor import shard_of
+from .shm_ring import ShmRing
 
 class XappRmrSubReact:
     """
     Custom xApp class.
+
+    Parameters
+    ----------
+    thread: bool = True
+        Flag for executing the xApp loop as a thread. Default is True.
+    rmr_port: int = 4560
+        RMR data port, also given to the Subscription Manager for the indications.
+    http_port: int = 8080
+        Port of the REST server, also given to the Subscription Manager for the notifications.
+    shard: Tuple[int, int] = None
+        (index, count) of a worker of the multi-process mode (see supervisor.py), which only subscribes
+        to the E2 nodes of its shard. None subscribes to every node.
     """
-    def __init__(self, thread:bool = True):
+    def __init__(self, thread:bool = True, rmr_port:int = 4560, http_port:int = 8080, shard:Tuple[int, int] = None):
         """
         Initializes the custom xApp instance and instatiates the xApp framework object.
         """
@@ -26,22 +53,141 @@ class XappRmrSubReact:
         #self.logger.get_env_params_values() # Getting the MDC key-value pairs from the environment
         self.logger.info("Initializing the xApp.")
 
+        # Start-up timeline, served by GET /ric/v1/startup
+        self._startup = StartupProfiler(logger=self.logger)
+
         # Initializing custom control variables
-        self._shutdown = False # Stops the xApp loop if True
         self._thread = thread # True for executing the xApp loop as a thread
+        self._rmr_port = rmr_port
+        self._http_port = http_port
+        self._shard = shard # (index, count) of the E2 nodes owned by this worker, None for all of them
         self._ready = False # True when the xApp is ready to start
         self.subscription_responses:Dict[int, Dict] = {} # Stores the subscription responses for each E2 node inventory name
         self.sub_id_to_node:Dict[str, str] = {} # Maps subscription IDs to E2 node inventory names
-        
+        self._early_notifications:Dict[str, Tuple[float, list]] = {} # Subscription ID -> (arrival, instances) notified before their subscription request returned
+        self._subscription_lock = Lock() # Protects the three dicts above against the notifications of the Subscription Manager
+        self._startup.checkpoint("logger")
+
+        # Phases that do not depend on the framework object run while its constructor waits for the RMR route table
+        self._startup.background("http_server", self._start_http_server)
+        self._startup.background("submgr_session", self._open_submgr_session)
+
         # Instatiating the xApp framework object 
         self._rmrxapp = RMRXapp(
             default_handler=self.default_rmr_handler, # Called when no specific handler is found for an RMR message
             config_handler=self.config_change_handler, # Called when a config change event is detected by inotify
             post_init=self.post_init, # Called during the RMRXapp initialization, right after _BaseXapp is initialized
-            rmr_port=4560, # Port for RMR data
+            rmr_port=self._rmr_port, # Port for RMR data
             rmr_wait_for_ready=True, # Block xApp initiation until RMR is ready
             use_fake_sdl=False # Use a fake in-memory SDL
         )
+        self._startup.checkpoint("rmr_init") # Mostly waiting for the RMR route table
+
+        # End-to-end RMR message tracing, with spans exported to a rotating OTLP JSON file
+        tracing_config = self._rmrxapp._config_data.get("controls", {}).get("tracing", {})
+        self._tracer = Tracer(
+            service="xapp4rmrsubreact",
+            sample_rate=tracing_config.get("sample_rate", 0.01), # Probability of tracing a message that starts a trace
+            root_mtypes=tracing_config.get("root_mtypes", [12050]), # Received message types that start traces
+            path=tracing_config.get("path", "/tmp/xapp-spans.jsonl"),
+            max_bytes=tracing_config.get("max_bytes", 10485760), # Export file size before rotation
+            backups=tracing_config.get("backups", 3), # Rotated export files kept
+            logger=self.logger
+        )
+        self._tracer.instrument_rmr(self._rmrxapp) # Before the metrics, which count the traced sends too
+
+        # Recorder of the received RMR messages, replayed by benchmarks/rmr_replay.py
+        recording_config = self._rmrxapp._config_data.get("controls", {}).get("recording", {})
+        self._recorder = RmrRecorder(
+            path=recording_config.get("path", "/tmp/xapp-rmr.rec"),
+            max_bytes=recording_config.get("max_bytes", 67108864), # Log size limit, later messages are dropped
+            mtypes=recording_config.get("mtypes", []), # Recorded message types, all of them if empty
+            logger=self.logger
+        )
+        self._recorder.instrument_rmr(self._rmrxapp) # Also wraps the handlers registered below
+        if recording_config.get("enabled", False):
+            self._recorder.start()
+
+        # Metrics registry, instrumenting the RMR handlers and sends and the SDL calls of the framework
+        self._metrics = MetricsRegistry()
+        self._metrics.instrument_rmr(self._rmrxapp) # Also wraps the handlers registered below
+        self._metrics.instrument_sdl(self._rmrxapp.sdl)
+
+        # Registry of the xApp threads (names, CPU affinity, CPU accounting and the coordinated join of stop())
+        threads_config = self._rmrxapp._config_data.get("controls", {}).get("threads", {})
+        self._threads = ThreadRegistry(
+            affinity=threads_config.get("affinity", {}), # CPUs per thread name pattern, e.g. {"rmr-*": [0], "*": [1, 2, 3]}
+            join_timeout=threads_config.get("join_timeout", 5.0), # Seconds stop() waits for the threads, in total
+            logger=self.logger
+        )
+        self._threads.instrument(self._metrics) # CPU time and context switches per thread
+        self._threads.adopt("rmr-receive", self._rmrxapp._rmr_loop._thread) # Framework thread moving RMR messages to the dispatch queue
+
+        # Shared memory ring handing the received RIC indications to analytics processes (see shm_ring.py)
+        ring_config = self._rmrxapp._config_data.get("controls", {}).get("analytics_ring", {})
+        self._ring = None
+        if ring_config.get("enabled", False):
+            ring_name = ring_config.get("name", "xapp4rmrsubreact-indications")
+            self._ring = ShmRing(
+                name=ring_name if self._shard is None else "{}-{}".format(ring_name, self._shard[0]), # One ring per worker
+                slots=ring_config.get("slots", 4096),
+                slot_size=ring_config.get("slot_size", 1024), # Largest payload, larger ones are dropped
+                consumers=ring_config.get("consumers", 4), # Cursors the analytics processes attach to by index
+                policy=ring_config.get("policy", "overwrite"), # "overwrite" the oldest messages or "block" the handler when full
+                block_timeout=ring_config.get("block_timeout", 0.01), # Seconds the handler waits with "block" before dropping
+                logger=self.logger
+            )
+            self._ring.instrument(self._metrics) # Occupancy, drops and consumer lag
+
+        # Watchdog reporting RMR handlers that stall the receive loop
+        watchdog_config = self._rmrxapp._config_data.get("controls", {}).get("watchdog", {})
+        self._watchdog = HandlerWatchdog(
+            budget=watchdog_config.get("budget", 0.5), # Seconds a handler may run before it is reported
+            metrics=self._metrics,
+            logger=self.logger
+        )
+        self._watchdog.watch_rmrxapp(self._rmrxapp) # Also wraps the handlers registered below
+        self._unready_on_stall = watchdog_config.get("unready_on_stall", False) # Readiness fails while a handler is stalled
+
+        # Sampling profiler of every thread, started by POST and read by GET /ric/v1/debug/profile
+        self._profiler = SamplingProfiler()
+
+        # Memory growth diagnostics (allocation snapshots and the size of the xApp state containers)
+        self._memory = MemoryDiagnostics(containers={
+            "subscription_responses": lambda: self.subscription_responses,
+            "sub_id_to_node": lambda: self.sub_id_to_node,
+            "early_notifications": lambda: self._early_notifications,
+            "sdl_cache_entries": lambda: self._sdl_cache._entries,
+            "sdl_codec_sizes": lambda: self._sdl_codecs._sizes
+        })
+
+        # SDL value codecs (the compact codec compresses large values such as subscription responses)
+        codec_config = self._rmrxapp._config_data.get("controls", {}).get("sdl_codec", {})
+        self._sdl_codecs = SdlCodecs()
+        if codec_config.get("compact", True):
+            self._sdl_codecs.register("xapp4rmrsubreact", CompactCodec(compress_threshold=codec_config.get("compress_threshold", 256)))
+
+        # Read-through cache for SDL reads (keys are reloaded from SDL only after their namespace TTL expires)
+        cache_config = self._rmrxapp._config_data.get("controls", {}).get("sdl_cache", {})
+        self._sdl_cache = SdlReadThroughCache(
+            sdl=self._rmrxapp.sdl,
+            ttls=cache_config.get("ttls", {}), # TTL in seconds per namespace
+            default_ttl=cache_config.get("default_ttl", 30.0), # TTL in seconds for the other namespaces
+            max_entries=cache_config.get("max_entries", 1024), # LRU capacity
+            logger=self.logger,
+            codecs=self._sdl_codecs # Encodes values and tracks their stored size
+        )
+        if cache_config.get("coherent", False): # Invalidates the cache of other replicas through SDL channels
+            self._sdl_cache.enable_coherency(namespaces=["xapp4rmrsubreact"])
+
+        # Platform endpoints (the in-cluster services by default, or a local stand-in such as benchmarks/platform_standin.py)
+        platform_config = self._rmrxapp._config_data.get("controls", {}).get("platform", {})
+        self._submgr_url = platform_config.get("submgr_url", "http://service-ricplt-submgr-http.ricplt.svc.cluster.local:8088/ric/v1")
+        self._e2mgr_url = platform_config.get("e2mgr_url", "") # If set, E2 nodes are listed by E2 Manager instead of read from R-NIB in SDL
+        self._client_host = platform_config.get("client_host", "service-ricxapp-xapp4rmrsubreact-http.ricxapp") # Host notified by submgr
+        self._early_notification_ttl = platform_config.get("early_notification_ttl", 60.0) # Seconds a notification waits for its subscription request
+        self._max_early_notifications = platform_config.get("max_early_notifications", 1000) # Notifications kept waiting, the oldest ones are dropped
+        self._startup.checkpoint("components")
 
         # Registering handlers for RMR messages
         self._rmrxapp.register_callback(handler=self.active_xapp_handler, message_type=30000)
@@ -52,19 +198,49 @@ class XappRmrSubReact:
         signal.signal(signal.SIGQUIT, self._handle_signal)
         signal.signal(signal.SIGINT, self._handle_signal)
 
-        # Starting a threaded HTTP server listening to any host at port 8080 
-        self.http_server = xapp_rest.ThreadedHTTPServer("0.0.0.0", 8080)
+        # Registering the other HTTP handlers on the server started in the background
+        self._startup.wait("http_server", "submgr_session")
+        self._threads.adopt("http-server", self.http_server.server_thread)
         self.http_server.handler.add_handler(self.http_server.handler, method="GET", name="config", uri="/ric/v1/config", callback=self.config_handler)
-        self.http_server.handler.add_handler(self.http_server.handler, method="GET", name="liveness", uri="/ric/v1/health/alive", callback=self.liveness_handler)
-        self.http_server.handler.add_handler(self.http_server.handler, method="GET", name="readiness", uri="/ric/v1/health/ready", callback=self.readiness_handler)
         self.http_server.handler.add_handler(self.http_server.handler, method="POST", name="sub_resp", uri="/ric/v1/subscriptions/response", callback=self.subscription_response_handler)
         self.http_server.handler.add_handler(self.http_server.handler, method="GET", name="resubscribe", uri="/ric/v1/resubscribe", callback=self.resubscribe_handler)
-        self.logger.info("Starting HTTP server.")
-        self.http_server.start() 
+        self.http_server.handler.add_handler(self.http_server.handler, method="GET", name="sdl_cache_stats", uri="/ric/v1/sdl/cache_stats", callback=self.sdl_cache_stats_handler)
+        self.http_server.handler.add_handler(self.http_server.handler, method="GET", name="sdl_sizes", uri="/ric/v1/sdl/sizes", callback=self.sdl_sizes_handler)
+        self.http_server.handler.add_handler(self.http_server.handler, method="GET", name="metrics", uri="/ric/v1/metrics", callback=self.metrics_handler)
+        self.http_server.handler.add_handler(self.http_server.handler, method="GET", name="profile", uri="/ric/v1/debug/profile", callback=self.profile_handler)
+        self.http_server.handler.add_handler(self.http_server.handler, method="POST", name="profile_control", uri="/ric/v1/debug/profile", callback=self.profile_control_handler)
+        self.http_server.handler.add_handler(self.http_server.handler, method="GET", name="tracing", uri="/ric/v1/debug/tracing", callback=self.tracing_handler)
+        self.http_server.handler.add_handler(self.http_server.handler, method="GET", name="memory", uri="/ric/v1/debug/memory", callback=self.memory_handler)
+        self.http_server.handler.add_handler(self.http_server.handler, method="POST", name="memory_control", uri="/ric/v1/debug/memory", callback=self.memory_control_handler)
+        self.http_server.handler.add_handler(self.http_server.handler, method="GET", name="recording", uri="/ric/v1/debug/recording", callback=self.recording_handler)
+        self.http_server.handler.add_handler(self.http_server.handler, method="POST", name="recording_control", uri="/ric/v1/debug/recording", callback=self.recording_control_handler)
+        self.http_server.handler.add_handler(self.http_server.handler, method="GET", name="threads", uri="/ric/v1/debug/threads", callback=self.threads_handler)
+        self.http_server.handler.add_handler(self.http_server.handler, method="GET", name="analytics_ring", uri="/ric/v1/debug/analytics_ring", callback=self.analytics_ring_handler)
+        self._metrics.instrument_rest(self.http_server.handler) # Counts and times every handler above
+        self._startup.checkpoint("handlers")
 
         # xApp is ready to start
         self._ready = True
+        self._startup.mark("ready")
         self.logger.info("xApp is ready.")
+
+    def _start_http_server(self):
+        """
+        Starts a threaded HTTP server listening to any host at the HTTP port (8080 by default), serving the health probes and
+        the start-up timeline right away. The other handlers are registered once the xApp is initialized.
+        """
+        self.http_server = xapp_rest.ThreadedHTTPServer("0.0.0.0", self._http_port)
+        self.http_server.handler.add_handler(self.http_server.handler, method="GET", name="liveness", uri="/ric/v1/health/alive", callback=self.liveness_handler)
+        self.http_server.handler.add_handler(self.http_server.handler, method="GET", name="readiness", uri="/ric/v1/health/ready", callback=self.readiness_handler)
+        self.http_server.handler.add_handler(self.http_server.handler, method="GET", name="startup", uri="/ric/v1/startup", callback=self.startup_handler)
+        self.logger.info("Starting HTTP server.")
+        self.http_server.start()
+
+    def _open_submgr_session(self):
+        """
+        Opens the HTTP session to the Subscription Manager, whose connection is reused by every subscription request.
+        """
+        self._submgr = requests.Session()
         
     # ------------------ RMR MESSAGE HANDLERS
 
@@ -88,6 +264,8 @@ class XappRmrSubReact:
         Handler for the E2 node RIC indication.
         """
         self.logger.info("Received E2 node RIC indication, responding with a RIC Control")
+        if self._ring is not None: # The payload is copied once into the ring, the analytics processes read it in place
+            self._ring.publish(summary[rmr.RMR_MS_PAYLOAD], summary[rmr.RMR_MS_MSG_TYPE], summary[rmr.RMR_MS_MEID], summary[rmr.RMR_MS_SUB_ID])
         rmrxapp.rmr_rts(sbuf, new_mtype=12040)
         rmrxapp.rmr_free(sbuf)
 
@@ -112,22 +290,30 @@ class XappRmrSubReact:
 
     def subscribe_to_e2_nodes(self):
         """
-        Subscribes to all available E2 nodes.
+        Subscribes to all available E2 nodes, or to the ones of its shard in the multi-process mode.
         """
 
         # DEPRECATED - WE DO NOT USE xapp_subscribe BECAUSE IT DOES NOT WORK
+        # (it is not imported either, to keep it and its generated REST client out of the start-up time)
+        # from ricxappframe import xapp_subscribe
         # self.subscriber = xapp_subscribe.NewSubscriber(
         #     uri="http://service-ricplt-submgr-http.ricplt.svc.cluster.local:8088/ric/v1/subscriptions",
         #     local_port=8080,
         #     rmr_port=4560
         # )
 
-        e2_nodes = self._rmrxapp.GetListNodebIds()
-        sub_trs_id = self._rmrxapp.sdl_get(namespace="xapp4rmrsubreact", key="subscription_transaction_id")
+        e2_nodes = self._list_e2_nodes()
+        trs_id_key = "subscription_transaction_id" # One per worker in the multi-process mode, the workers do not share a counter
+        if self._shard is not None:
+            index, count = self._shard
+            e2_nodes = [name for name in e2_nodes if shard_of(name, count) == index]
+            trs_id_key += ":" + str(index)
+            self.logger.info(f"Worker {index} of {count} owns {len(e2_nodes)} E2 nodes.")
+        sub_trs_id = self._sdl_cache.get(namespace="xapp4rmrsubreact", key=trs_id_key)
         if sub_trs_id is None:
             sub_trs_id = 54321
-        for node in e2_nodes:
-            self.logger.info(f"Subscribing to node {node.inventory_name}") # We use the inventory name as the node ID 
+        for inventory_name in e2_nodes:
+            self.logger.info(f"Subscribing to node {inventory_name}") # We use the inventory name as the node ID 
             
             # DEPRECATED - WE DO NOT USE xapp_subscribe BECAUSE IT DOES NOT WORK
             # # Workouround class to send the correct subscription request body,
@@ -140,29 +326,63 @@ class XappRmrSubReact:
             
             # # Sending the subscription request
             # data, reason, status = self.subscriber.Subscribe(
-            #     subs_params= Params(self.generate_subscription_request(node.inventory_name, sub_trs_id))
+            #     subs_params= Params(self.generate_subscription_request(inventory_name, sub_trs_id))
             #     # subs_params = self.generate_sub_params(
             #     #     subscriber=self.subscriber,
-            #     #     inventory_name=node.inventory_name,
+            #     #     inventory_name=inventory_name,
             #     #     subscription_transaction_id=sub_trs_id
             #     # )
             # )
-            # self.subscription_responses[node.inventory_name] = json.loads(data) # {"SubscriptionId": "my_string_id", "SubscriptionInstances": null}
+            # self.subscription_responses[inventory_name] = json.loads(data) # {"SubscriptionId": "my_string_id", "SubscriptionInstances": null}
 
             # Sending the subscription request
-            resp = requests.post(
-                "http://service-ricplt-submgr-http.ricplt.svc.cluster.local:8088/ric/v1/subscriptions",
-                json=self.generate_subscription_request(node.inventory_name, sub_trs_id)
+            resp = self._submgr.post(
+                self._submgr_url + "/subscriptions",
+                json=self.generate_subscription_request(inventory_name, sub_trs_id)
             )
-            data = resp.json() # {"SubscriptionId": "my_string_id", "SubscriptionInstances": null}
             status = resp.status_code
             reason = resp.reason
+            if status >= 300:
+                self.logger.error(f"Subscription to {inventory_name} rejected: status = {status}, reason = {reason}, body = {resp.text}")
+                continue
+            data = resp.json() # {"SubscriptionId": "my_string_id", "SubscriptionInstances": null}
 
-            self.sub_id_to_node[data["SubscriptionId"]] = node.inventory_name
-            self.subscription_responses[node.inventory_name] = data
-            self.logger.debug(f"Subscription response from {node.inventory_name}: status = {status}, reason = {reason}, data = {data}")
-            self._rmrxapp.sdl_set(namespace="xapp4rmrsubreact", key="subscription_transaction_id", value=sub_trs_id+1) # Update sub_trs_id on SDL
+            with self._subscription_lock:
+                self.sub_id_to_node[data["SubscriptionId"]] = inventory_name
+                early = self._early_notifications.pop(data["SubscriptionId"], None)
+                if early is not None: # The notification arrived first
+                    data["SubscriptionInstances"] = early[1]
+                self.subscription_responses[inventory_name] = data
+            self._sdl_cache.set(namespace="xapp4rmrsubreact", key="subscription_response:" + inventory_name, value=data) # Persisting the response
+            self.logger.debug(f"Subscription response from {inventory_name}: status = {status}, reason = {reason}, data = {data}")
+            self._sdl_cache.set(namespace="xapp4rmrsubreact", key=trs_id_key, value=sub_trs_id+1) # Update sub_trs_id on SDL
     
+    def _save_early_notification(self, sub_id:str, instances:list):
+        """
+        Keeps the instances notified for a subscription whose request has not returned yet. Must be called holding the
+        subscription lock. Notifications for deleted subscriptions, other xApps' subscriptions or failed requests are
+        never matched, so entries older than early_notification_ttl and the oldest beyond max_early_notifications are dropped.
+        """
+        now = monotonic()
+        self._early_notifications.pop(sub_id, None) # Re-inserted last, the dict stays in arrival order
+        self._early_notifications[sub_id] = (now, instances)
+        while self._early_notifications:
+            oldest_id, (arrival, _) = next(iter(self._early_notifications.items()))
+            if now - arrival <= self._early_notification_ttl and len(self._early_notifications) <= self._max_early_notifications:
+                break
+            del self._early_notifications[oldest_id]
+            self.logger.debug(f"Dropped the notification of unknown subscription {oldest_id}.")
+
+    def _list_e2_nodes(self) -> list:
+        """
+        Returns the inventory names of the E2 nodes, from E2 Manager if its URL is configured, otherwise from R-NIB.
+        """
+        if self._e2mgr_url:
+            resp = self._submgr.get(self._e2mgr_url + "/nodeb/states")
+            resp.raise_for_status()
+            return [node["inventoryName"] for node in resp.json()] # [{"inventoryName": ..., "globalNbId": ..., "connectionStatus": ...}]
+        return [node.inventory_name for node in self._rmrxapp.GetListNodebIds()]
+
     def unsubscribe_from_e2_nodes(self):
         """
         Unsubscribes from all subscribed E2 nodes (stored in the self.subscription_responses dict).
@@ -175,13 +395,15 @@ class XappRmrSubReact:
         #     data, reason, status = self.subscriber.UnSubscribe(subs_id=self.subscription_responses[node]["SubscriptionId"])
         #     self.logger.info(f"Unsubscribe from node {node}: status = {status}, reason = {reason}, data = {data}")
         
-        for sub_id in self.sub_id_to_node.keys():
-            resp = requests.delete(
-                f"http://service-ricplt-submgr-http.ricplt.svc.cluster.local:8088/ric/v1/subscriptions/{sub_id}"
+        for sub_id in list(self.sub_id_to_node.keys()): # Copy, the subscription sweep may still be running
+            resp = self._submgr.delete(
+                f"{self._submgr_url}/subscriptions/{sub_id}"
             )
             status = resp.status_code
             reason = resp.reason
             self.logger.info(f"Unsubscribe from sub id {sub_id}: status = {status}, reason = {reason}")
+        with self._subscription_lock:
+            self._early_notifications.clear() # Left by subscriptions that will never be matched
 
     # ------------------ SIGNAL HANDLERS
 
@@ -213,14 +435,280 @@ class XappRmrSubReact:
         """
         sub_resp = json.loads(data.decode())
         self.logger.info("Received POST /ric/v1/subscriptions/response request with data {}.".format(sub_resp))
-        nodeb = self.sub_id_to_node[sub_resp["SubscriptionId"]]
-        self.subscription_responses[nodeb]["SubscriptionInstances"] = sub_resp["SubscriptionInstances"]
+        with self._subscription_lock:
+            nodeb = self.sub_id_to_node.get(sub_resp["SubscriptionId"], None)
+            if nodeb is None: # Notified before the subscription request returned, applied by subscribe_to_e2_nodes()
+                self._save_early_notification(sub_resp["SubscriptionId"], sub_resp["SubscriptionInstances"])
+            else:
+                self.subscription_responses[nodeb]["SubscriptionInstances"] = sub_resp["SubscriptionInstances"]
+        if nodeb is not None:
+            self._sdl_cache.set(namespace="xapp4rmrsubreact", key="subscription_response:" + nodeb, value=self.subscription_responses[nodeb])
         response = xapp_rest.initResponse(
             status=200, # Status = 200 OK
             response="ACK subscription response"
         ) # Initiating HTTP response
         return response
 
+    def sdl_cache_stats_handler(self, name:str, path:str, data:bytes, ctype:str):
+        """
+        Handler for the HTTP GET /ric/v1/sdl/cache_stats request.
+        """
+        self.logger.info("Received GET /ric/v1/sdl/cache_stats request with content type {}.".format(ctype))
+        response = xapp_rest.initResponse(
+            status=200, # Status = 200 OK
+            response="SDL cache stats"
+        ) # Initiating HTTP response
+        response['payload'] = json.dumps(self._sdl_cache.stats()) # Payload = hit and miss metrics
+        return response
+
+    def sdl_sizes_handler(self, name:str, path:str, data:bytes, ctype:str):
+        """
+        Handler for the HTTP GET /ric/v1/sdl/sizes request.
+        """
+        self.logger.info("Received GET /ric/v1/sdl/sizes request with content type {}.".format(ctype))
+        response = xapp_rest.initResponse(
+            status=200, # Status = 200 OK
+            response="SDL sizes"
+        ) # Initiating HTTP response
+        response['payload'] = json.dumps({
+            "namespaces": self._sdl_codecs.stats(), # Stored bytes per namespace
+            "largest": self._sdl_codecs.largest() # Largest keys first
+        })
+        return response
+
+    def profile_handler(self, name:str, path:str, data:bytes, ctype:str):
+        """
+        Handler for the HTTP GET /ric/v1/debug/profile[?format=collapsed|json&weight=cpu|samples] request.
+        Returns the latest profile started by POST /ric/v1/debug/profile: collapsed stacks for flame graphs, or a JSON summary with the CPU time per handler.
+        """
+        self.logger.info("Received GET /ric/v1/debug/profile request with content type {}.".format(ctype))
+        query = parse_qs(urlparse(path).query)
+        profile = self._profiler.result()
+        if self._profiler.running() or profile is None:
+            response = xapp_rest.initResponse(
+                status=202 if self._profiler.running() else 404, # Status = 202 Accepted (still sampling) or 404 Not Found
+                response="Profile"
+            )
+            response['payload'] = json.dumps({"status": "running" if self._profiler.running() else "No profile, start one with POST /ric/v1/debug/profile."})
+            return response
+        response = xapp_rest.initResponse(
+            status=200, # Status = 200 OK
+            response="Profile"
+        ) # Initiating HTTP response
+        if query.get("format", ["collapsed"])[0] == "json":
+            response['payload'] = json.dumps(profile.to_dict()) # Payload = CPU time per handler and collapsed stacks
+        else:
+            response['ctype'] = "text/plain"
+            weight = query.get("weight", ["cpu"])[0] if profile.cpu_clocks else "samples"
+            response['payload'] = profile.collapsed(weight) # Payload = one "thread;frame;...;frame count" line per stack
+        return response
+
+    def profile_control_handler(self, name:str, path:str, data:bytes, ctype:str):
+        """
+        Handler for the HTTP POST /ric/v1/debug/profile[?seconds=5&hz=100] request.
+        Starts sampling the stacks of every thread in the background, the profile is then read with GET /ric/v1/debug/profile.
+        """
+        self.logger.info("Received POST /ric/v1/debug/profile request with content type {}.".format(ctype))
+        query = parse_qs(urlparse(path).query)
+        try:
+            seconds = float(query.get("seconds", ["5"])[0]) # Profile duration, the HTTP server keeps answering meanwhile
+            started = self._profiler.start(
+                seconds=seconds,
+                hz=float(query.get("hz", ["100"])[0]) # Sampling frequency
+            )
+        except ValueError as e:
+            response = xapp_rest.initResponse(
+                status=400, # Status = 400 Bad Request
+                response="Profile"
+            )
+            response['payload'] = json.dumps({"error": str(e)})
+            return response
+        if not started:
+            response = xapp_rest.initResponse(
+                status=409, # Status = 409 Conflict
+                response="Profile"
+            )
+            response['payload'] = json.dumps({"error": "A profile is already running."})
+            return response
+        response = xapp_rest.initResponse(
+            status=202, # Status = 202 Accepted
+            response="Profile"
+        ) # Initiating HTTP response
+        response['payload'] = json.dumps({"status": "running", "seconds": seconds})
+        return response
+
+    def memory_handler(self, name:str, path:str, data:bytes, ctype:str):
+        """
+        Handler for the HTTP GET /ric/v1/debug/memory[?snapshot=<name>&compare=<old name>&group=lineno|filename|traceback&limit=20] request.
+        Returns the tracing status and the state container sizes, plus the top allocation sites of a
+        snapshot or, with compare, the growth from the compared snapshot to it.
+        """
+        self.logger.info("Received GET /ric/v1/debug/memory request with content type {}.".format(ctype))
+        query = parse_qs(urlparse(path).query)
+        report = {"status": self._memory.status(), "containers": self._memory.containers()}
+        try:
+            group = query.get("group", ["lineno"])[0]
+            limit = int(query.get("limit", ["20"])[0])
+            if "snapshot" in query and "compare" in query:
+                report["diff"] = self._memory.diff(query["compare"][0], query["snapshot"][0], group=group, limit=limit)
+            elif "snapshot" in query:
+                report["top"] = self._memory.top(query["snapshot"][0], group=group, limit=limit)
+        except (KeyError, ValueError) as e:
+            response = xapp_rest.initResponse(
+                status=400, # Status = 400 Bad Request
+                response="Memory"
+            )
+            response['payload'] = json.dumps({"error": str(e)})
+            return response
+        response = xapp_rest.initResponse(
+            status=200, # Status = 200 OK
+            response="Memory"
+        ) # Initiating HTTP response
+        response['payload'] = json.dumps(report)
+        return response
+
+    def memory_control_handler(self, name:str, path:str, data:bytes, ctype:str):
+        """
+        Handler for the HTTP POST /ric/v1/debug/memory request.
+        Body: {"action": "start" | "stop" | "snapshot", "frames": int (start only), "name": str (snapshot only)}
+        """
+        self.logger.info("Received POST /ric/v1/debug/memory request with content type {}.".format(ctype))
+        try:
+            body = json.loads(data)
+            action = body["action"]
+            if action == "start":
+                self._memory.start(frames=int(body.get("frames", 10)))
+                result = {"tracing": True}
+            elif action == "stop":
+                self._memory.stop()
+                result = {"tracing": False}
+            elif action == "snapshot":
+                result = {"snapshot": self._memory.snapshot(body.get("name", None))}
+            else:
+                raise ValueError("action must be start, stop or snapshot")
+        except (KeyError, TypeError, ValueError, RuntimeError) as e:
+            response = xapp_rest.initResponse(
+                status=400, # Status = 400 Bad Request
+                response="Memory"
+            )
+            response['payload'] = json.dumps({"error": str(e)})
+            return response
+        self.logger.info("Memory diagnostics action {} done.".format(action))
+        response = xapp_rest.initResponse(
+            status=200, # Status = 200 OK
+            response="Memory"
+        ) # Initiating HTTP response
+        response['payload'] = json.dumps(result)
+        return response
+
+    def tracing_handler(self, name:str, path:str, data:bytes, ctype:str):
+        """
+        Handler for the HTTP GET /ric/v1/debug/tracing request.
+        """
+        self.logger.debug("Received GET /ric/v1/debug/tracing request with content type {}.".format(ctype))
+        response = xapp_rest.initResponse(
+            status=200, # Status = 200 OK
+            response="Tracing stats"
+        ) # Initiating HTTP response
+        response['payload'] = json.dumps(self._tracer.stats()) # Payload = sampled, exported and dropped spans
+        return response
+
+    def recording_handler(self, name:str, path:str, data:bytes, ctype:str):
+        """
+        Handler for the HTTP GET /ric/v1/debug/recording request.
+        """
+        self.logger.debug("Received GET /ric/v1/debug/recording request with content type {}.".format(ctype))
+        response = xapp_rest.initResponse(
+            status=200, # Status = 200 OK
+            response="Recording"
+        ) # Initiating HTTP response
+        response['payload'] = json.dumps(self._recorder.stats()) # Payload = recording state, recorded and dropped messages
+        return response
+
+    def recording_control_handler(self, name:str, path:str, data:bytes, ctype:str):
+        """
+        Handler for the HTTP POST /ric/v1/debug/recording request.
+        Body: {"action": "start" | "stop"}
+        """
+        self.logger.info("Received POST /ric/v1/debug/recording request with content type {}.".format(ctype))
+        try:
+            action = json.loads(data)["action"]
+            if action == "start":
+                self._recorder.start()
+            elif action == "stop":
+                self._recorder.stop()
+            else:
+                raise ValueError("action must be start or stop")
+        except (KeyError, TypeError, ValueError, OSError) as e:
+            response = xapp_rest.initResponse(
+                status=400, # Status = 400 Bad Request
+                response="Recording"
+            )
+            response['payload'] = json.dumps({"error": str(e)})
+            return response
+        response = xapp_rest.initResponse(
+            status=200, # Status = 200 OK
+            response="Recording"
+        ) # Initiating HTTP response
+        response['payload'] = json.dumps(self._recorder.stats())
+        return response
+
+    def threads_handler(self, name:str, path:str, data:bytes, ctype:str):
+        """
+        Handler for the HTTP GET /ric/v1/debug/threads request.
+        """
+        self.logger.debug("Received GET /ric/v1/debug/threads request with content type {}.".format(ctype))
+        response = xapp_rest.initResponse(
+            status=200, # Status = 200 OK
+            response="Threads"
+        ) # Initiating HTTP response
+        response['payload'] = json.dumps(self._threads.stats()) # Payload = CPUs, CPU time and context switches per thread
+        return response
+
+    def analytics_ring_handler(self, name:str, path:str, data:bytes, ctype:str):
+        """
+        Handler for the HTTP GET /ric/v1/debug/analytics_ring request.
+        """
+        self.logger.debug("Received GET /ric/v1/debug/analytics_ring request with content type {}.".format(ctype))
+        if self._ring is None:
+            response = xapp_rest.initResponse(
+                status=404, # Status = 404 Not Found
+                response="Analytics ring"
+            )
+            response['payload'] = json.dumps({"error": "The analytics ring is disabled (controls.analytics_ring.enabled)."})
+            return response
+        response = xapp_rest.initResponse(
+            status=200, # Status = 200 OK
+            response="Analytics ring"
+        ) # Initiating HTTP response
+        response['payload'] = json.dumps(self._ring.stats()) # Payload = occupancy, drops, and lag and losses per consumer
+        return response
+
+    def startup_handler(self, name:str, path:str, data:bytes, ctype:str):
+        """
+        Handler for the HTTP GET /ric/v1/startup request.
+        """
+        self.logger.debug("Received GET /ric/v1/startup request with content type {}.".format(ctype))
+        response = xapp_rest.initResponse(
+            status=200, # Status = 200 OK
+            response="Startup phases"
+        ) # Initiating HTTP response
+        response['payload'] = json.dumps(self._startup.to_dict()) # Payload = phases, events and time to ready
+        return response
+
+    def metrics_handler(self, name:str, path:str, data:bytes, ctype:str):
+        """
+        Handler for the HTTP GET /ric/v1/metrics request.
+        """
+        #self.logger.info("Received GET /ric/v1/metrics request with content type {}.".format(ctype))
+        response = xapp_rest.initResponse(
+            status=200, # Status = 200 OK
+            response="Metrics"
+        ) # Initiating HTTP response
+        response['ctype'] = MetricsRegistry.CONTENT_TYPE
+        response['payload'] = self._metrics.expose() # Payload = every metric in the Prometheus text format
+        return response
+
     def config_handler(self, name:str, path:str, data:bytes, ctype:str):
         """
         Handler for the HTTP GET /ric/v1/config request.
@@ -252,7 +740,13 @@ class XappRmrSubReact:
         Handler for the HTTP GET /ric/v1/health/ready request.
         """
         #self.logger.info("Received GET /ric/v1/health/ready request with content type {}.".format(ctype))
-        if self._ready:
+        if self._ready and self._unready_on_stall and self._watchdog.stalled():
+            response = xapp_rest.initResponse(
+                status=503, # Status = 503 Service Unavailable
+                response="Readiness"
+            )
+            response['payload'] = json.dumps({"status": "Stalled"}) # Payload = an RMR handler is over its budget
+        elif self._ready:
             response = xapp_rest.initResponse(
                 status=200, # Status = 200 OK
                 response="Readiness"
@@ -273,18 +767,29 @@ class XappRmrSubReact:
         """
         Starts the xApp loop.
         """ 
-        self.subscribe_to_e2_nodes()
+        self._threads.adopt("startup-subscriptions", self._startup.background("subscriptions", self.subscribe_to_e2_nodes)) # The RMR loop does not wait for the sweep
+        self._watchdog.start()
+        self._threads.adopt("rmr-handler-watchdog", self._watchdog._thread)
+        self._tracer.start() # Span exporter thread
+        self._threads.adopt("span-exporter", self._tracer._thread)
+        self._threads.adopt("rmr-dispatch") # This thread runs the dispatch loop and every RMR handler
+        self._startup.mark("rmr_loop")
         self._rmrxapp.run()    
 
     def stop(self):
         """
         Terminates the xApp. Can only be called if the xApp is running in threaded mode.
         """
-        self._shutdown = True
         self.unsubscribe_from_e2_nodes()
         self.logger.info("Calling framework termination to unregister the xApp from AppMgr.")
         self._rmrxapp.stop()
+        self._watchdog.stop()
+        self._tracer.stop() # Exports the spans still queued
+        self._recorder.stop() # Truncates the log to the recorded messages
         self.http_server.stop()
+        self._threads.stop() # Waits for the threads stopped above, up to join_timeout seconds
+        if self._ring is not None:
+            self._ring.close() # After the RMR loop, removes the shared memory block
 
     # ------------------ SUBSCRIPTION REQUEST JSON
     
@@ -293,9 +798,9 @@ class XappRmrSubReact:
         return {
             "SubscriptionId":"",
             "ClientEndpoint": {
-                "Host":"service-ricxapp-xapp4rmrsubreact-http.ricxapp",
-                "HTTPPort":8080,
-                "RMRPort":4560
+                "Host":self._client_host,
+                "HTTPPort":self._http_port,
+                "RMRPort":self._rmr_port
             },
             "Meid":inventory_name, # nobe B inventory_name
             "RANFunctionID":1, # Default = 0
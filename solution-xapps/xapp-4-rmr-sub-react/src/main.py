@@ -1,10 +1,15 @@
 # Imports from local files
 from .custom_xapp import XappRmrSubReact
+from .supervisor import WorkerSupervisor
 
 def launchXapp():
     """
     Entrypoint called in the xApp Dockerfile.
     """
+    supervisor = WorkerSupervisor.from_config() # None unless controls.workers.count is over 1
+    if supervisor is not None:
+        supervisor.run() # Multi-process mode, each worker process runs its own xApp instance
+        return
     xapp_instance = XappRmrSubReact() # Instantiating our custom xApp 
     xapp_instance.start() # Starting our custom xApp in threaded mode
 
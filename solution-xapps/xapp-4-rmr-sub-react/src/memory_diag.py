@@ -0,0 +1,178 @@
+
+# Imports from other libraries
+from threading import Lock
+from collections import OrderedDict
+from time import time
+from typing import Callable, Dict
+import sys
+import tracemalloc
+import types
+
+_GROUPS = ("lineno", "filename", "traceback") # Ways of grouping allocation sites
+
+class MemoryDiagnostics:
+    """
+    Memory growth diagnostics: allocation tracing with named snapshots and container sizes.
+
+    Allocation tracing (tracemalloc) is off until start() is called, because it slows allocations
+    down and uses memory of its own. Snapshots are kept by name so that the top allocation sites of
+    one snapshot, or the growth between two of them, can be listed later. Independently of tracing,
+    containers() reports the length and deep size of the registered state containers of the xApp.
+
+    Parameters
+    ----------
+    containers: Dict[str, Callable] = None
+        Name -> function returning a state container, called on every report so reassigned containers are seen.
+    max_snapshots: int = 5
+        Snapshots kept before the oldest one is dropped.
+    max_objects: int = 100000
+        Objects visited per container when computing deep sizes.
+    """
+    def __init__(self, containers:Dict[str, Callable] = None, max_snapshots:int = 5, max_objects:int = 100000):
+        """
+        Initializes the diagnostics without tracing allocations.
+        """
+        self._containers = containers if containers is not None else {}
+        self.max_snapshots = max_snapshots
+        self.max_objects = max_objects
+        self._lock = Lock() # Protects the snapshots
+        self._snapshots:OrderedDict = OrderedDict() # Name -> (creation time, tracemalloc snapshot), oldest first
+
+    # ------------------ TRACING
+
+    def start(self, frames:int = 10):
+        """
+        Starts tracing allocations, keeping up to frames frames per allocation traceback.
+        """
+        if tracemalloc.is_tracing():
+            tracemalloc.stop() # Restarting is the only way to change the number of frames
+        tracemalloc.start(frames)
+
+    def stop(self):
+        """
+        Stops tracing allocations and drops the snapshots, which cannot be compared with later ones.
+        """
+        tracemalloc.stop()
+        with self._lock:
+            self._snapshots.clear()
+
+    def snapshot(self, name:str = None) -> str:
+        """
+        Takes a snapshot of the traced allocations and returns its name. Raises RuntimeError if tracing is off.
+        """
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("allocation tracing is not started")
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__), # Allocations of tracemalloc itself
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<unknown>")
+        ))
+        with self._lock:
+            name = name if name else "snapshot-{}".format(len(self._snapshots) + 1)
+            self._snapshots.pop(name, None)
+            self._snapshots[name] = (time(), snapshot)
+            while len(self._snapshots) > self.max_snapshots:
+                self._snapshots.popitem(last=False)
+        return name
+
+    def _get(self, name:str):
+        """
+        Returns a snapshot by name. Raises KeyError if it does not exist.
+        """
+        with self._lock:
+            if name not in self._snapshots:
+                raise KeyError("unknown snapshot {}".format(name))
+            return self._snapshots[name][1]
+
+    def top(self, name:str, group:str = "lineno", limit:int = 20) -> list:
+        """
+        Returns the allocation sites of a snapshot holding the most memory.
+        """
+        if group not in _GROUPS:
+            raise ValueError("group must be one of {}".format(list(_GROUPS)))
+        stats = self._get(name).statistics(group)
+        return [self._site(stat.traceback, group, size=stat.size, count=stat.count) for stat in stats[:limit]]
+
+    def diff(self, old:str, new:str, group:str = "lineno", limit:int = 20) -> list:
+        """
+        Returns the allocation sites whose memory grew the most from snapshot old to snapshot new.
+        """
+        if group not in _GROUPS:
+            raise ValueError("group must be one of {}".format(list(_GROUPS)))
+        stats = self._get(new).compare_to(self._get(old), group)
+        return [
+            self._site(stat.traceback, group, size=stat.size, size_diff=stat.size_diff, count=stat.count, count_diff=stat.count_diff)
+            for stat in stats[:limit]
+        ]
+
+    def _site(self, traceback, group:str, **values) -> dict:
+        """
+        Formats an allocation site and its values.
+        """
+        site = {"site": traceback[0].filename if group == "filename" else str(traceback[0])}
+        if group == "traceback":
+            site["traceback"] = [str(frame) for frame in traceback]
+        site.update(values)
+        return site
+
+    def status(self) -> dict:
+        """
+        Returns whether allocations are traced, the traced memory and the available snapshots.
+        """
+        tracing = tracemalloc.is_tracing()
+        current, peak = tracemalloc.get_traced_memory() if tracing else (0, 0)
+        with self._lock:
+            snapshots = [{"name": name, "time": created} for name, (created, _) in self._snapshots.items()]
+        return {
+            "tracing": tracing,
+            "frames": tracemalloc.get_traceback_limit() if tracing else 0,
+            "traced_bytes": current,
+            "traced_peak_bytes": peak,
+            "tracemalloc_overhead_bytes": tracemalloc.get_tracemalloc_memory() if tracing else 0,
+            "snapshots": snapshots
+        }
+
+    # ------------------ CONTAINERS
+
+    def containers(self) -> dict:
+        """
+        Returns the type, length and deep size in bytes of every registered container.
+        """
+        report = {}
+        for name, getter in self._containers.items():
+            container = getter()
+            size, objects, truncated = self._deep_size(container)
+            report[name] = {
+                "type": type(container).__name__,
+                "len": len(container) if hasattr(container, "__len__") else None,
+                "bytes": size,
+                "objects": objects,
+                "truncated": truncated # True if max_objects was reached and bytes is a lower bound
+            }
+        return report
+
+    def _deep_size(self, root) -> tuple:
+        """
+        Returns the total size of an object and everything reachable through containers and instance
+        dicts, the number of objects visited and whether the walk stopped at max_objects.
+        """
+        seen = set()
+        stack = [root]
+        size = 0
+        while stack:
+            if len(seen) >= self.max_objects:
+                return size, len(seen), True
+            obj = stack.pop()
+            if id(obj) in seen:
+                continue
+            seen.add(id(obj))
+            size += sys.getsizeof(obj)
+            if isinstance(obj, dict):
+                for key, value in list(obj.items()): # Copying is atomic, iterating a dict that changes is not
+                    stack.append(key)
+                    stack.append(value)
+            elif isinstance(obj, (list, tuple, set, frozenset)):
+                stack.extend(list(obj))
+            elif hasattr(obj, "__dict__") and not isinstance(obj, (type, types.ModuleType)):
+                stack.append(obj.__dict__)
+        return size, len(seen), False
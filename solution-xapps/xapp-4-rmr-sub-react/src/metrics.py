@@ -0,0 +1,387 @@
+
+# Imports from OSC libraries
+from ricxappframe.xapp_frame import rmr
+
+# Imports from other libraries
+from threading import Lock, get_ident
+from time import perf_counter
+from bisect import bisect_left
+from functools import wraps
+from typing import Callable, Dict, Tuple
+
+# Latency buckets in seconds, from the sub-millisecond RMR handlers to slow SDL and HTTP calls
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# SyncStorage methods timed by instrument_sdl() (every SDLWrapper call goes through one of them)
+SDL_OPERATIONS = (
+    "set", "set_if", "set_if_not_exists", "get", "find_keys", "find_and_get", "remove", "remove_if",
+    "remove_all", "set_and_publish", "set_if_and_publish", "set_if_not_exists_and_publish", "remove_and_publish",
+    "remove_if_and_publish", "remove_all_and_publish", "add_member", "remove_member", "remove_group",
+    "get_members", "is_member", "group_size"
+)
+
+def _label_order(item) -> tuple:
+    """
+    Sort key of (label values, value) items that tolerates label values of mixed types.
+    """
+    return tuple(str(v) for v in item[0])
+
+class _Metric:
+    """
+    Base of the metric types: values are kept per thread and per label values, so updates take no lock.
+
+    Each thread writes only to its own shard (a dict created on its first update), and the shards are
+    only summed when the metrics are exposed. Copying a dict is atomic under the GIL, so exposition
+    never sees a shard in the middle of an update.
+    """
+    type = None
+
+    def __init__(self, name:str, help:str, labelnames:Tuple[str, ...] = ()):
+        """
+        Initializes a metric without values.
+        """
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = Lock() # Only taken when a thread creates its shard
+        self._shards:Dict[int, dict] = {} # Thread id -> label values -> value
+
+    def _shard(self) -> dict:
+        """
+        Returns the shard of the calling thread.
+        """
+        shard = self._shards.get(get_ident(), None)
+        if shard is None:
+            with self._lock:
+                shard = self._shards.setdefault(get_ident(), {})
+        return shard
+
+    def _labels(self, values:tuple, extra:str = "") -> str:
+        """
+        Formats label values (plus an already formatted extra label) as an exposition label set.
+        """
+        pairs = ['{}="{}"'.format(n, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+                 for n, v in zip(self.labelnames, values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Counter(_Metric):
+    """
+    Monotonically increasing counter.
+
+    Parameters
+    ----------
+    name: str
+        Metric name.
+    help: str
+        Description shown in the exposition.
+    labelnames: Tuple[str, ...] = ()
+        Names of the labels, whose values are passed to inc() in the same order.
+    """
+    type = "counter"
+
+    def inc(self, *labels, n = 1):
+        """
+        Adds n to the counter of the given label values.
+        """
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + n
+
+    def collect(self) -> dict:
+        """
+        Returns the totals of every label values over all threads.
+        """
+        totals = {}
+        for shard in list(self._shards.values()):
+            for labels, value in list(shard.items()):
+                totals[labels] = totals.get(labels, 0) + value
+        return totals
+
+    def expose(self) -> list:
+        """
+        Returns the exposition lines of the counter.
+        """
+        return ["{}{} {}".format(self.name, self._labels(labels), value) for labels, value in sorted(self.collect().items(), key=_label_order)]
+
+class Histogram(_Metric):
+    """
+    Histogram with fixed buckets.
+
+    Parameters
+    ----------
+    name: str
+        Metric name.
+    help: str
+        Description shown in the exposition.
+    labelnames: Tuple[str, ...] = ()
+        Names of the labels, whose values are passed to observe() in the same order.
+    buckets: Tuple[float, ...] = DEFAULT_BUCKETS
+        Sorted upper bounds of the buckets. The +Inf bucket is implicit.
+    """
+    type = "histogram"
+
+    def __init__(self, name:str, help:str, labelnames:Tuple[str, ...] = (), buckets:Tuple[float, ...] = DEFAULT_BUCKETS):
+        """
+        Initializes a histogram without observations.
+        """
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value:float, *labels):
+        """
+        Records an observation for the given label values.
+        """
+        shard = self._shard()
+        entry = shard.get(labels, None)
+        if entry is None:
+            entry = shard[labels] = [0] * (len(self.buckets) + 1) + [0.0] # Count per bucket (the last one is +Inf), then the sum
+        entry[bisect_left(self.buckets, value)] += 1
+        entry[-1] += value
+
+    def collect(self) -> dict:
+        """
+        Returns the bucket counts and sum of every label values over all threads.
+        """
+        totals = {}
+        for shard in list(self._shards.values()):
+            for labels, entry in list(shard.items()):
+                entry = list(entry)
+                total = totals.get(labels, None)
+                totals[labels] = entry if total is None else [a + b for a, b in zip(total, entry)]
+        return totals
+
+    def expose(self) -> list:
+        """
+        Returns the exposition lines of the histogram, with cumulative buckets.
+        """
+        lines = []
+        for labels, entry in sorted(self.collect().items(), key=_label_order):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), entry[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append('{}_bucket{} {}'.format(self.name, self._labels(labels, 'le="{}"'.format(le)), cumulative))
+            lines.append("{}_sum{} {}".format(self.name, self._labels(labels), entry[-1]))
+            lines.append("{}_count{} {}".format(self.name, self._labels(labels), cumulative))
+        return lines
+
+class CallbackMetric(_Metric):
+    """
+    Metric whose values are read from a callback when the metrics are exposed, for values kept
+    outside the xApp (e.g. the CPU time the kernel accounts to each thread).
+
+    Parameters
+    ----------
+    name: str
+        Metric name.
+    help: str
+        Description shown in the exposition.
+    labelnames: Tuple[str, ...]
+        Names of the labels, in the order of the label values returned by collect.
+    collect: Callable
+        Returns the current value of every label values, as a dict.
+    type: str = "gauge"
+        Exposed metric type, "counter" for values that only grow.
+    """
+    def __init__(self, name:str, help:str, labelnames:Tuple[str, ...], collect:Callable, type:str = "gauge"):
+        """
+        Initializes a metric read from collect.
+        """
+        super().__init__(name, help, labelnames)
+        self.type = type
+        self._collect = collect
+
+    def collect(self) -> dict:
+        """
+        Returns the values read from the callback.
+        """
+        return self._collect()
+
+    def expose(self) -> list:
+        """
+        Returns the exposition lines of the metric.
+        """
+        return ["{}{} {}".format(self.name, self._labels(labels), value) for labels, value in sorted(self.collect().items(), key=_label_order)]
+
+class MetricsRegistry:
+    """
+    Registry of the xApp metrics, exposed in the Prometheus text format.
+
+    Besides the metrics created with counter() and histogram(), the registry can instrument the
+    framework: RMR message handlers and sends, SDL storage calls and REST handlers are wrapped so
+    that they count and time themselves without changes to their code.
+    """
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        """
+        Initializes the registry and the framework metrics.
+        """
+        self._lock = Lock() # Protects the metric dict
+        self._metrics:Dict[str, _Metric] = {} # Name -> metric, in creation order
+
+        self.rmr_received = self.counter("rmr_messages_received_total", "RMR messages received per message type.", ("mtype",))
+        self.rmr_handler_latency = self.histogram("rmr_handler_duration_seconds", "RMR message handler latency per message type.", ("mtype",))
+        self.rmr_handler_errors = self.counter("rmr_handler_errors_total", "RMR message handlers that raised per message type.", ("mtype",))
+        self.rmr_sent = self.counter("rmr_messages_sent_total", "RMR messages sent per message type, call and result.", ("mtype", "call", "result"))
+        self.sdl_latency = self.histogram("sdl_operation_duration_seconds", "SDL storage call latency per operation.", ("operation",))
+        self.sdl_errors = self.counter("sdl_operation_errors_total", "SDL storage calls that raised per operation.", ("operation",))
+        self.http_requests = self.counter("http_requests_total", "REST requests per handler and status.", ("handler", "status"))
+        self.http_latency = self.histogram("http_request_duration_seconds", "REST handler latency per handler.", ("handler",))
+
+    # ------------------ METRICS
+
+    def counter(self, name:str, help:str, labelnames:Tuple[str, ...] = ()) -> Counter:
+        """
+        Returns the counter with the given name, creating it if needed.
+        """
+        return self._register(Counter(name, help, labelnames))
+
+    def histogram(self, name:str, help:str, labelnames:Tuple[str, ...] = (), buckets:Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        """
+        Returns the histogram with the given name, creating it if needed.
+        """
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def callback(self, name:str, help:str, labelnames:Tuple[str, ...], collect:Callable, type:str = "gauge") -> CallbackMetric:
+        """
+        Returns the metric with the given name, creating it to read its values from collect() on each exposition.
+        """
+        return self._register(CallbackMetric(name, help, labelnames, collect, type))
+
+    def _register(self, metric:_Metric) -> _Metric:
+        """
+        Adds a metric unless one with the same name exists, and returns the registered one.
+        """
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def expose(self) -> str:
+        """
+        Returns every metric in the Prometheus text exposition format.
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append("# HELP {} {}".format(metric.name, metric.help))
+            lines.append("# TYPE {} {}".format(metric.name, metric.type))
+            lines.extend(metric.expose())
+        return "\n".join(lines) + "\n"
+
+    # ------------------ RMR INSTRUMENTATION
+
+    def instrument_rmr_handler(self, handler:Callable) -> Callable:
+        """
+        Wraps an RMR message handler with the signature (xapp, summary, sbuf) to count and time its messages.
+        """
+        if getattr(handler, "_instrumented", False):
+            return handler
+        @wraps(handler)
+        def instrumented(xapp, summary, sbuf):
+            mtype = summary[rmr.RMR_MS_MSG_TYPE]
+            self.rmr_received.inc(mtype)
+            start = perf_counter()
+            try:
+                return handler(xapp, summary, sbuf)
+            except Exception:
+                self.rmr_handler_errors.inc(mtype)
+                raise
+            finally:
+                self.rmr_handler_latency.observe(perf_counter() - start, mtype)
+        instrumented._instrumented = True
+        return instrumented
+
+    def instrument_dispatch(self, dispatch:dict) -> dict:
+        """
+        Wraps every handler of a message type -> handler dispatch table in place and returns the table.
+        """
+        for mtype, handler in list(dispatch.items()):
+            dispatch[mtype] = self.instrument_rmr_handler(handler)
+        return dispatch
+
+    def instrument_rmr(self, xapp):
+        """
+        Instruments the RMR sends of a framework xApp and, for an RMRXapp, its registered handlers,
+        its default handler and every handler registered later with register_callback().
+        """
+        rmr_send, rmr_rts = xapp.rmr_send, xapp.rmr_rts
+
+        def send(payload, mtype, *args, **kwargs):
+            sent = rmr_send(payload, mtype, *args, **kwargs)
+            self.rmr_sent.inc(mtype, "send", "ok" if sent else "failed")
+            return sent
+
+        def rts(sbuf, *args, **kwargs):
+            mtype = kwargs.get("new_mtype", args[1] if len(args) > 1 else None)
+            sent = rmr_rts(sbuf, *args, **kwargs)
+            self.rmr_sent.inc("unchanged" if mtype is None else mtype, "rts", "ok" if sent else "failed")
+            return sent
+
+        xapp.rmr_send, xapp.rmr_rts = send, rts
+        if hasattr(xapp, "register_callback"): # RMRXapp
+            self.instrument_dispatch(xapp._dispatch)
+            xapp._default_handler = self.instrument_rmr_handler(xapp._default_handler)
+            register_callback = xapp.register_callback
+            xapp.register_callback = lambda handler, message_type: register_callback(self.instrument_rmr_handler(handler), message_type)
+
+    # ------------------ SDL INSTRUMENTATION
+
+    def instrument_sdl(self, sdl):
+        """
+        Times every storage call made through a framework SDL wrapper (xapp.sdl), including the
+        multi-key calls made directly on its SyncStorage.
+        """
+        storage = sdl._sdl
+        for operation in SDL_OPERATIONS:
+            method = getattr(storage, operation, None)
+            if method is not None and not getattr(method, "_instrumented", False):
+                setattr(storage, operation, self._timed_sdl_call(operation, method))
+
+    def _timed_sdl_call(self, operation:str, method:Callable) -> Callable:
+        """
+        Wraps a SyncStorage method to time it and count its failures.
+        """
+        @wraps(method)
+        def timed(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return method(*args, **kwargs)
+            except Exception:
+                self.sdl_errors.inc(operation)
+                raise
+            finally:
+                self.sdl_latency.observe(perf_counter() - start, operation)
+        timed._instrumented = True
+        return timed
+
+    # ------------------ REST INSTRUMENTATION
+
+    def instrument_rest(self, handler_class):
+        """
+        Wraps every callback registered on a framework REST handler class (http_server.handler)
+        to count requests per status and time them. Call it after the handlers are added.
+        """
+        for method in handler_class.handlers.values():
+            for name, entry in method.items():
+                if not getattr(entry['cb'], "_instrumented", False):
+                    entry['cb'] = self._timed_rest_callback(name, entry['cb'])
+
+    def _timed_rest_callback(self, name:str, callback:Callable) -> Callable:
+        """
+        Wraps a REST callback to count its responses per status and time it.
+        """
+        @wraps(callback)
+        def timed(cbname, path, data, ctype):
+            start = perf_counter()
+            status = 500
+            try:
+                response = callback(cbname, path, data, ctype)
+                status = response['status']
+                return response
+            finally:
+                self.http_requests.inc(name, status)
+                self.http_latency.observe(perf_counter() - start, name)
+        timed._instrumented = True
+        return timed
@@ -0,0 +1,229 @@
+
+# Imports from other libraries
+from threading import Lock, Thread, enumerate as enumerate_threads, get_ident
+from time import perf_counter, sleep
+from typing import Dict, List, Tuple
+import sys
+import time
+
+_PACKAGE = __name__.rpartition(".")[0] # Package of the xApp, whose handlers the CPU time is attributed to
+
+def _xapp_module(module:str) -> bool:
+    """
+    Returns True for the modules of the xApp, False for the standard library, the framework and the other libraries.
+    """
+    return module.startswith(_PACKAGE + ".") if _PACKAGE else True
+
+class Profile:
+    """
+    Stack samples collected by SamplingProfiler, aggregated per thread and stack.
+
+    Every sample carries the CPU time the thread used since its previous sample, so stacks can be
+    weighted either by sample count (wall time, idle threads included) or by CPU time.
+
+    Parameters
+    ----------
+    seconds: float
+        Requested profile duration.
+    hz: float
+        Requested sampling frequency.
+    """
+    def __init__(self, seconds:float, hz:float):
+        """
+        Initializes an empty profile.
+        """
+        self.seconds = seconds
+        self.hz = hz
+        self.samples = 0 # Sampling rounds taken
+        self.elapsed = 0.0 # Actual duration in seconds
+        self.cpu_clocks = hasattr(time, "pthread_getcpuclockid") # False if CPU weights are all 0
+        self._stacks:Dict[Tuple[str, tuple], list] = {} # (thread name, frames from the root) -> [samples, CPU seconds]
+
+    def add(self, thread:str, frames:tuple, cpu:float):
+        """
+        Records one sample of a thread.
+        """
+        entry = self._stacks.get((thread, frames), None)
+        if entry is None:
+            entry = self._stacks[(thread, frames)] = [0, 0.0]
+        entry[0] += 1
+        entry[1] += cpu
+
+    def collapsed(self, weight:str = "cpu") -> str:
+        """
+        Returns the profile in the collapsed stack format of flame graph tools: one line per stack,
+        "thread;frame;...;frame count", with the count in samples or in CPU microseconds.
+        """
+        lines = []
+        for (thread, frames), (samples, cpu) in sorted(self._stacks.items()):
+            count = samples if weight == "samples" else int(cpu * 1e6)
+            if count:
+                names = [thread] + ["{}.{}".format(module, function) for module, function in frames]
+                lines.append("{} {}".format(";".join(n.replace(";", "_").replace(" ", "_") for n in names), count))
+        return "\n".join(lines) + "\n"
+
+    def handlers(self) -> dict:
+        """
+        Returns the samples and CPU time per handler, sorted by CPU time. A stack belongs to the
+        outermost handler of the xApp on it (a function of its modules named *_handler or _handle_*,
+        so not e.g. socketserver._handle_request_noblock, which runs every REST handler); the time
+        outside handlers is reported per thread as "[thread name]".
+        """
+        totals = {}
+        for (thread, frames), (samples, cpu) in self._stacks.items():
+            name = "[{}]".format(thread)
+            for module, function in frames:
+                if _xapp_module(module) and (function.endswith("_handler") or function.startswith("_handle_")):
+                    name = "{}.{}".format(module, function)
+                    break
+            total = totals.setdefault(name, [0, 0.0])
+            total[0] += samples
+            total[1] += cpu
+        cpu_total = sum(cpu for _, cpu in totals.values())
+        return {
+            name: {"samples": samples, "cpu_ms": cpu * 1000, "cpu_share": cpu / cpu_total if cpu_total else 0.0}
+            for name, (samples, cpu) in sorted(totals.items(), key=lambda item: -item[1][1])
+        }
+
+    def to_dict(self) -> dict:
+        """
+        Returns the summary, the per-handler breakdown and the CPU-weighted collapsed stacks.
+        """
+        return {
+            "seconds": self.elapsed,
+            "hz": self.hz,
+            "samples": self.samples,
+            "cpu_clocks": self.cpu_clocks,
+            "handlers": self.handlers(),
+            "collapsed": self.collapsed("cpu" if self.cpu_clocks else "samples")
+        }
+
+class SamplingProfiler:
+    """
+    On-demand sampling profiler of every Python thread of the process.
+
+    The sampling thread takes a snapshot of the stacks of all other threads hz times per second
+    (sys._current_frames(), no tracing hooks) and reads the CPU clock of each thread, so the other
+    threads only pay for the snapshots while a profile runs. Only one profile runs at a time.
+
+    start() samples in a thread of its own and result() returns the latest finished profile, so
+    the single HTTP server thread keeps answering (e.g. the health probes) while a profile runs;
+    profile() samples on the calling thread and blocks it.
+
+    Parameters
+    ----------
+    max_seconds: float = 30.0
+        Longest profile accepted.
+    max_hz: float = 1000.0
+        Highest sampling frequency accepted.
+    max_depth: int = 128
+        Frames kept per stack, counted from the innermost one.
+    """
+    def __init__(self, max_seconds:float = 30.0, max_hz:float = 1000.0, max_depth:int = 128):
+        """
+        Initializes the profiler.
+        """
+        self.max_seconds = max_seconds
+        self.max_hz = max_hz
+        self.max_depth = max_depth
+        self._running = Lock() # Held while a profile runs, released by the thread that samples
+        self._last:Profile = None # Latest profile finished by start()
+
+    def _check(self, seconds:float, hz:float):
+        if not 0 < seconds <= self.max_seconds:
+            raise ValueError("seconds must be in (0, {}]".format(self.max_seconds))
+        if not 0 < hz <= self.max_hz:
+            raise ValueError("hz must be in (0, {}]".format(self.max_hz))
+
+    def profile(self, seconds:float = 5.0, hz:float = 100.0) -> Profile:
+        """
+        Samples every other thread for the given duration and frequency and returns the profile,
+        or None if another profile is already running. Raises ValueError for out-of-range arguments.
+        """
+        self._check(seconds, hz)
+        if not self._running.acquire(blocking=False):
+            return None
+        try:
+            return self._sample(Profile(seconds, hz))
+        finally:
+            self._running.release()
+
+    def start(self, seconds:float = 5.0, hz:float = 100.0) -> bool:
+        """
+        Starts sampling in the background, the profile is then returned by result(). Returns False if
+        another profile is already running. Raises ValueError for out-of-range arguments.
+        """
+        self._check(seconds, hz)
+        if not self._running.acquire(blocking=False):
+            return False
+        Thread(target=self._run, args=(Profile(seconds, hz),), name="profiler", daemon=True).start()
+        return True
+
+    def _run(self, profile:Profile):
+        try:
+            self._last = self._sample(profile)
+        finally:
+            self._running.release()
+
+    def running(self) -> bool:
+        """
+        Returns True while a profile runs.
+        """
+        return self._running.locked()
+
+    def result(self) -> Profile:
+        """
+        Returns the latest profile finished by start(), None if there is none yet.
+        """
+        return self._last
+
+    def _sample(self, profile:Profile) -> Profile:
+        """
+        Runs the sampling loop.
+        """
+        own = get_ident()
+        clocks:Dict[int, int] = {} # Thread id -> CPU clock id
+        last_cpu:Dict[int, float] = {} # Thread id -> CPU time at the previous sample
+        interval = 1.0 / profile.hz
+        start = perf_counter()
+        next_sample = start
+        while True:
+            names = {thread.ident: thread.name for thread in enumerate_threads()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                cpu = self._thread_cpu(ident, clocks)
+                delta = cpu - last_cpu.get(ident, cpu) if cpu is not None else 0.0 # The first sample only sets the baseline
+                if cpu is not None:
+                    last_cpu[ident] = cpu
+                profile.add(names.get(ident, str(ident)), self._frames(frame), delta)
+            profile.samples += 1
+            next_sample += interval
+            if next_sample - start > profile.seconds:
+                break
+            sleep(max(0.0, next_sample - perf_counter()))
+        profile.elapsed = perf_counter() - start
+        return profile
+
+    def _frames(self, frame) -> tuple:
+        """
+        Returns the (module, function) pairs of a stack, from the root to the innermost frame.
+        """
+        frames:List[Tuple[str, str]] = []
+        while frame is not None and len(frames) < self.max_depth:
+            frames.append((frame.f_globals.get("__name__", "?"), frame.f_code.co_name))
+            frame = frame.f_back
+        frames.reverse()
+        return tuple(frames)
+
+    def _thread_cpu(self, ident:int, clocks:Dict[int, int]):
+        """
+        Returns the CPU time in seconds used by a thread, or None if it cannot be read.
+        """
+        try:
+            clock = clocks.get(ident, None)
+            if clock is None:
+                clock = clocks[ident] = time.pthread_getcpuclockid(ident)
+            return time.clock_gettime(clock)
+        except (AttributeError, OSError, OverflowError):
+            return None
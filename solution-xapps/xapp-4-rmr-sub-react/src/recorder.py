@@ -0,0 +1,192 @@
+
+# Imports from OSC libraries
+from ricxappframe.xapp_frame import rmr
+from mdclogpy import Logger
+
+# Imports from other libraries
+from threading import Lock
+from functools import wraps
+from typing import Callable, Iterator, List
+import mmap
+import struct
+import time
+
+MAGIC = b"XRMRREC1" # Format and version of a recording
+_HEADER = struct.Struct("<8sQ") # Magic, committed length of the log (header included)
+_RECORD = struct.Struct("<QiiHI") # Receive time (ns since the epoch), message type, subscription ID, MEID length, payload length
+
+class Record:
+    """
+    A received RMR message read from a recording.
+    """
+    __slots__ = ("timestamp_ns", "mtype", "sub_id", "meid", "payload")
+
+    def __init__(self, timestamp_ns:int, mtype:int, sub_id:int, meid:bytes, payload:bytes):
+        self.timestamp_ns = timestamp_ns
+        self.mtype = mtype
+        self.sub_id = sub_id
+        self.meid = meid
+        self.payload = payload
+
+def read_records(path:str) -> Iterator[Record]:
+    """
+    Yields the records of a recording in the order they were received. A recording that was not
+    closed (e.g. the xApp was killed) is read up to its last committed record.
+    """
+    with open(path, "rb") as log_file:
+        with mmap.mmap(log_file.fileno(), 0, access=mmap.ACCESS_READ) as log:
+            magic, end = _HEADER.unpack_from(log, 0)
+            if magic != MAGIC:
+                raise ValueError("{} is not an RMR recording".format(path))
+            offset = _HEADER.size
+            while offset < end:
+                timestamp_ns, mtype, sub_id, meid_len, payload_len = _RECORD.unpack_from(log, offset)
+                offset += _RECORD.size
+                meid = log[offset:offset + meid_len]
+                offset += meid_len
+                yield Record(timestamp_ns, mtype, sub_id, meid, log[offset:offset + payload_len])
+                offset += payload_len
+
+class RmrRecorder:
+    """
+    Records the received RMR messages (receive time, message type, subscription ID, MEID and payload)
+    into an append-only binary log, replayed by benchmarks/rmr_replay.py.
+
+    The log file is allocated to max_bytes when recording starts and written through a memory map,
+    so recording a message is two buffer copies and no system call. The committed length in the
+    header is updated after each record, so a log cut by a crash is still readable. Messages that do
+    not fit are counted as dropped, and the file is truncated to the recorded length when recording stops.
+
+    Parameters
+    ----------
+    path: str = "/tmp/xapp-rmr.rec"
+        Log file, overwritten when recording starts.
+    max_bytes: int = 67108864
+        Log size limit.
+    mtypes: List[int] = None
+        Message types to record (all of them if empty or None).
+    logger: Logger = None
+        Logger used to report when recording starts, stops or the log fills up.
+    """
+    def __init__(self, path:str = "/tmp/xapp-rmr.rec", max_bytes:int = 67108864, mtypes:List[int] = None, logger:Logger = None):
+        """
+        Initializes the recorder, not recording.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.mtypes = set(mtypes) if mtypes else None
+        self.logger = logger if logger is not None else Logger(name="RmrRecorder")
+        self._lock = Lock() # Serializes the records with start() and stop(), which REST handlers call
+        self._file = None
+        self._log = None # Memory map of the log file while recording
+        self._offset = 0
+        self.recorded = 0
+        self.dropped = 0
+        self.started_at = None
+
+    @property
+    def recording(self) -> bool:
+        return self._log is not None
+
+    # ------------------ RECORDING
+
+    def start(self):
+        """
+        Starts recording into a new log, replacing the previous one.
+        """
+        with self._lock:
+            if self._log is not None:
+                return
+            self._file = open(self.path, "w+b")
+            self._file.truncate(self.max_bytes)
+            self._log = mmap.mmap(self._file.fileno(), self.max_bytes)
+            self._offset = _HEADER.size
+            _HEADER.pack_into(self._log, 0, MAGIC, self._offset)
+            self.recorded = self.dropped = 0
+            self.started_at = time.time()
+        self.logger.info("Recording RMR messages into {}.".format(self.path))
+
+    def stop(self):
+        """
+        Stops recording and truncates the log to the recorded messages.
+        """
+        with self._lock:
+            if self._log is None:
+                return
+            self._log.flush()
+            self._log.close()
+            self._log = None
+            self._file.truncate(self._offset)
+            self._file.close()
+            self._file = None
+        self.logger.info("Recorded {} RMR messages ({} bytes, {} dropped) into {}.".format(self.recorded, self._offset, self.dropped, self.path))
+
+    def record(self, summary:dict):
+        """
+        Appends a received message to the log, if recording.
+        """
+        if self._log is None or (self.mtypes is not None and summary[rmr.RMR_MS_MSG_TYPE] not in self.mtypes):
+            return
+        timestamp_ns = time.time_ns()
+        meid = summary[rmr.RMR_MS_MEID] or b""
+        if isinstance(meid, str):
+            meid = meid.encode()
+        payload = summary[rmr.RMR_MS_PAYLOAD] or b""
+        size = _RECORD.size + len(meid) + len(payload)
+        with self._lock:
+            if self._log is None:
+                return
+            offset = self._offset
+            if offset + size > self.max_bytes:
+                if self.dropped == 0:
+                    self.logger.warning("RMR recording {} is full, dropping the next messages.".format(self.path))
+                self.dropped += 1
+                return
+            _RECORD.pack_into(self._log, offset, timestamp_ns, summary[rmr.RMR_MS_MSG_TYPE], summary[rmr.RMR_MS_SUB_ID], len(meid), len(payload))
+            offset += _RECORD.size
+            self._log[offset:offset + len(meid)] = meid
+            offset += len(meid)
+            self._log[offset:offset + len(payload)] = payload
+            self._offset = offset + len(payload)
+            struct.pack_into("<Q", self._log, 8, self._offset) # Commits the record
+            self.recorded += 1
+
+    def stats(self) -> dict:
+        """
+        Returns the recording state and counters.
+        """
+        return {
+            "recording": self.recording,
+            "path": self.path,
+            "recorded": self.recorded,
+            "dropped": self.dropped,
+            "bytes": self._offset,
+            "max_bytes": self.max_bytes,
+            "started_at": self.started_at
+        }
+
+    # ------------------ RMR INSTRUMENTATION
+
+    def record_handler(self, handler:Callable) -> Callable:
+        """
+        Wraps an RMR message handler with the signature (xapp, summary, sbuf) to record its message first.
+        """
+        if getattr(handler, "_recorded", False):
+            return handler
+        @wraps(handler)
+        def recorded(xapp, summary, sbuf):
+            self.record(summary)
+            return handler(xapp, summary, sbuf)
+        recorded._recorded = True
+        return recorded
+
+    def instrument_rmr(self, xapp):
+        """
+        Records the messages of every handler of an RMRXapp: the registered ones, the default handler
+        and every handler registered later with register_callback().
+        """
+        for mtype, handler in list(xapp._dispatch.items()):
+            xapp._dispatch[mtype] = self.record_handler(handler)
+        xapp._default_handler = self.record_handler(xapp._default_handler)
+        register_callback = xapp.register_callback
+        xapp.register_callback = lambda handler, message_type: register_callback(self.record_handler(handler), message_type)
@@ -0,0 +1,234 @@
+
+# Imports from OSC libraries
+from ricxappframe.xapp_sdl import SDLWrapper
+from mdclogpy import Logger
+
+# Imports from other libraries
+from threading import Lock
+from time import monotonic
+from collections import OrderedDict
+from typing import Dict
+import uuid
+
+# Imports from local files
+from .sdl_codec import SdlCodecs
+
+class SdlReadThroughCache:
+    """
+    Read-through cache for SDL gets, with per-namespace TTLs and a bounded LRU.
+
+    Misses are loaded from SDL and kept until their namespace TTL expires, they are evicted
+    by newer entries, or they are invalidated. Writes go through the cache to SDL. When
+    coherency is enabled, every write is published on an SDL channel so that the caches of
+    other replicas drop their stale copy of the key.
+
+    SDL is read outside the lock, so a write or a remote invalidation may land while a miss is
+    loading: every invalidation increments a generation counter, and a load is only cached if
+    the generation has not changed since its miss (otherwise the next read loads it again).
+
+    Parameters
+    ----------
+    sdl: SDLWrapper
+        The framework SDL wrapper (xapp.sdl).
+    ttls: Dict[str, float] = None
+        Time to live in seconds per namespace. Namespaces not listed use default_ttl.
+    default_ttl: float = 30.0
+        Time to live in seconds for namespaces without a specific TTL.
+    max_entries: int = 1024
+        Maximum number of cached entries before the least recently used one is evicted.
+    logger: Logger = None
+        Logger used to report coherency events.
+    codecs: SdlCodecs = None
+        Value codecs per namespace. Defaults to the framework's msgpack encoding for every namespace.
+    """
+    def __init__(self, sdl:SDLWrapper, ttls:Dict[str, float] = None, default_ttl:float = 30.0, max_entries:int = 1024, logger:Logger = None,
+                 codecs:SdlCodecs = None):
+        """
+        Initializes an empty cache.
+        """
+        self._sdl = sdl
+        self.ttls = ttls if ttls is not None else {}
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self.logger = logger if logger is not None else Logger(name="SdlReadThroughCache")
+        self.codecs = codecs if codecs is not None else SdlCodecs()
+
+        self._lock = Lock() # Protects the entries and the stats
+        self._entries:OrderedDict = OrderedDict() # (namespace, key) -> (expiry time, value), least recently used first
+        self._channel = None # SDL channel used for cross-replica invalidation, None if coherency is disabled
+        self._origin = uuid.uuid4().hex # Identifies the invalidations published by this replica
+        self._generation = 0 # Incremented by every invalidation, loads that started before one are not cached
+
+        # Stats
+        self._hits:Dict[str, int] = {}
+        self._misses:Dict[str, int] = {}
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+    # ------------------ READS
+
+    def get(self, namespace:str, key:str):
+        """
+        Returns the value of a key, reading SDL only if it is not cached or has expired.
+        Answers None if the key does not exist.
+        """
+        found, value, generation = self._lookup(namespace, key)
+        if found:
+            return value
+        value = self.codecs.decode(namespace, key, self._sdl.get(namespace, key, usemsgpack=False))
+        self._store(namespace, key, value, generation)
+        return value
+
+    def find_and_get(self, namespace:str, prefix:str) -> dict:
+        """
+        Returns all key-value pairs whose key starts with prefix, reading SDL only if the
+        result for this prefix is not cached or has expired.
+        """
+        found, value, generation = self._lookup(namespace, prefix + "*")
+        if found:
+            return dict(value)
+        found = self._sdl.find_and_get(namespace, prefix, usemsgpack=False)
+        value = {k: self.codecs.decode(namespace, k, v) for k, v in found.items()}
+        self._store(namespace, prefix + "*", value, generation)
+        return dict(value)
+
+    def _lookup(self, namespace:str, key:str):
+        """
+        Returns (True, value, generation) for a fresh cached entry and (False, None, generation) otherwise.
+        """
+        with self._lock:
+            entry = self._entries.get((namespace, key), None)
+            if entry is not None:
+                if entry[0] > monotonic():
+                    self._entries.move_to_end((namespace, key))
+                    self._hits[namespace] = self._hits.get(namespace, 0) + 1
+                    return True, entry[1], self._generation
+                del self._entries[(namespace, key)]
+                self._expirations += 1
+            self._misses[namespace] = self._misses.get(namespace, 0) + 1
+            return False, None, self._generation
+
+    def _store(self, namespace:str, key:str, value, generation:int):
+        """
+        Caches a value with the TTL of its namespace, evicting the least recently used entries if full.
+        Skipped if an invalidation happened since generation, the value may be stale.
+        """
+        ttl = self.ttls.get(namespace, self.default_ttl)
+        with self._lock:
+            if self._generation != generation:
+                return
+            self._entries[(namespace, key)] = (monotonic() + ttl, value)
+            self._entries.move_to_end((namespace, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    # ------------------ WRITES
+
+    def set(self, namespace:str, key:str, value):
+        """
+        Writes a key to SDL and refreshes its cached value.
+        """
+        data = self.codecs.encode(namespace, key, value)
+        generation = self._generation
+        if self._channel is not None:
+            self._sdl.set_and_publish(namespace, self._channel, self._event(key), key, data, usemsgpack=False)
+        else:
+            self._sdl.set(namespace, key, data, usemsgpack=False)
+        self.invalidate(namespace, key)
+        self._store(namespace, key, value, generation + 1) # Not cached if another invalidation came during the write
+
+    def delete(self, namespace:str, key:str):
+        """
+        Deletes a key from SDL and from the cache.
+        """
+        if self._channel is not None:
+            self._sdl.remove_and_publish(namespace, self._channel, self._event(key), key)
+        else:
+            self._sdl.delete(namespace, key)
+        self.codecs.forget(namespace, key)
+        self.invalidate(namespace, key)
+
+    # ------------------ INVALIDATION
+
+    def invalidate(self, namespace:str, key:str = None):
+        """
+        Drops a key, and every cached prefix result that may contain it, from the cache.
+        If key is None, drops the whole namespace.
+        """
+        with self._lock:
+            stale = [
+                k for k in self._entries
+                if k[0] == namespace and (key is None or k[1] == key or (k[1].endswith("*") and key.startswith(k[1][:-1])))
+            ]
+            for k in stale:
+                del self._entries[k]
+            self._invalidations += len(stale)
+            self._generation += 1
+
+    def clear(self):
+        """
+        Drops every cached entry.
+        """
+        with self._lock:
+            self._invalidations += len(self._entries)
+            self._entries.clear()
+            self._generation += 1
+
+    # ------------------ CROSS-REPLICA COHERENCY
+
+    def enable_coherency(self, namespaces:list, channel:str = "sdl-cache-invalidation"):
+        """
+        Publishes every write on an SDL channel and subscribes to that channel on the given
+        namespaces, so that writes from other replicas invalidate the local copy of a key.
+        """
+        self._channel = channel
+        for namespace in namespaces:
+            self._sdl.subscribe_channel(namespace, self._make_invalidation_handler(namespace), channel)
+        self._sdl.start_event_listener()
+        self.logger.info("SDL cache coherency enabled on channel {} for namespaces {}.".format(channel, namespaces))
+
+    def _event(self, key:str) -> str:
+        """
+        Builds the invalidation event published for a key.
+        """
+        return "{} {}".format(self._origin, key)
+
+    def _make_invalidation_handler(self, namespace:str):
+        """
+        Returns the SDL channel callback that invalidates keys written by other replicas in a namespace.
+        """
+        def handler(channel:str, events):
+            if isinstance(events, str): # ricsdl delivers a list of events, but accept a single one too
+                events = [events]
+            for event in events:
+                origin, key = event.split(" ", 1)
+                if origin != self._origin:
+                    self.invalidate(namespace, key)
+        return handler
+
+    # ------------------ STATS
+
+    def stats(self) -> dict:
+        """
+        Returns hit and miss counts per namespace, hit ratio and eviction statistics.
+        """
+        with self._lock:
+            hits = sum(self._hits.values())
+            misses = sum(self._misses.values())
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": hits,
+                "misses": misses,
+                "hit_ratio": hits / (hits + misses) if hits + misses else 0.0,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "invalidations": self._invalidations,
+                "coherent": self._channel is not None,
+                "namespaces": {
+                    ns: {"hits": self._hits.get(ns, 0), "misses": self._misses.get(ns, 0)}
+                    for ns in set(self._hits) | set(self._misses)
+                }
+            }
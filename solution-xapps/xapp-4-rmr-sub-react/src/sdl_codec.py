@@ -0,0 +1,155 @@
+
+# Imports from other libraries
+from threading import Lock
+from typing import Dict
+import msgpack
+import zlib
+
+_ZLIB_MARKER = b"\xc1" # Never used by msgpack, so it tells compressed values apart from plain ones
+
+class MsgpackCodec:
+    """
+    The framework's default SDL encoding: msgpack with binary types.
+    """
+    name = "msgpack"
+
+    def encode(self, value) -> bytes:
+        """
+        Serializes a value to bytes.
+        """
+        return msgpack.packb(value, use_bin_type=True)
+
+    def decode(self, data:bytes):
+        """
+        Deserializes bytes written by encode().
+        """
+        return msgpack.unpackb(data, raw=False)
+
+class CompactCodec(MsgpackCodec):
+    """
+    Compact SDL encoding for numeric and struct-like values.
+
+    Values are packed with msgpack, which already stores small numbers in one or a few bytes,
+    and floats are stored in single precision when that loses nothing. Encodings larger than
+    compress_threshold bytes are zlib-compressed and prefixed with a byte msgpack never uses,
+    so values written by the default codec remain readable.
+
+    Parameters
+    ----------
+    compress_threshold: int = 256
+        Minimum encoded size in bytes for trying zlib compression (None disables compression).
+    level: int = 6
+        zlib compression level.
+    """
+    name = "compact"
+
+    def __init__(self, compress_threshold:int = 256, level:int = 6):
+        """
+        Initializes the codec.
+        """
+        self.compress_threshold = compress_threshold
+        self.level = level
+
+    def encode(self, value) -> bytes:
+        """
+        Serializes a value to bytes, compressing it if it is large enough to benefit.
+        """
+        single = isinstance(value, float) and msgpack.unpackb(msgpack.packb(value, use_single_float=True)) == value
+        data = msgpack.packb(value, use_bin_type=True, use_single_float=single)
+        if self.compress_threshold is not None and len(data) >= self.compress_threshold:
+            compressed = zlib.compress(data, self.level)
+            if len(compressed) + 1 < len(data):
+                return _ZLIB_MARKER + compressed
+        return data
+
+    def decode(self, data:bytes):
+        """
+        Deserializes bytes written by encode() or by the default codec.
+        """
+        if data[:1] == _ZLIB_MARKER:
+            data = zlib.decompress(data[1:])
+        return msgpack.unpackb(data, raw=False)
+
+class SdlCodecs:
+    """
+    Per-namespace SDL value codecs with per-key size accounting.
+
+    Every encode and decode records the stored size of the key, so the largest keys of each
+    namespace (the SDL memory hogs) can be listed with largest().
+
+    Parameters
+    ----------
+    default: MsgpackCodec = None
+        Codec for namespaces without a specific codec. Defaults to the framework's msgpack encoding.
+    """
+    def __init__(self, default:MsgpackCodec = None):
+        """
+        Initializes the registry with the default codec only.
+        """
+        self.default = default if default is not None else MsgpackCodec()
+        self._codecs:Dict[str, MsgpackCodec] = {} # Namespace -> codec
+        self._lock = Lock() # Protects the size accounting
+        self._sizes:Dict[str, Dict[str, int]] = {} # Namespace -> key -> stored size in bytes
+
+    def register(self, namespace:str, codec:MsgpackCodec):
+        """
+        Uses a codec for the values of a namespace.
+        """
+        self._codecs[namespace] = codec
+
+    def codec(self, namespace:str) -> MsgpackCodec:
+        """
+        Returns the codec of a namespace.
+        """
+        return self._codecs.get(namespace, self.default)
+
+    def encode(self, namespace:str, key:str, value) -> bytes:
+        """
+        Encodes the value of a key and records its stored size.
+        """
+        data = self.codec(namespace).encode(value)
+        self._account(namespace, key, len(data))
+        return data
+
+    def decode(self, namespace:str, key:str, data:bytes):
+        """
+        Decodes the stored value of a key (None stays None) and records its stored size.
+        """
+        if data is None:
+            self.forget(namespace, key)
+            return None
+        self._account(namespace, key, len(data))
+        return self.codec(namespace).decode(data)
+
+    def forget(self, namespace:str, key:str):
+        """
+        Drops the size of a deleted key.
+        """
+        with self._lock:
+            self._sizes.get(namespace, {}).pop(key, None)
+
+    def _account(self, namespace:str, key:str, size:int):
+        """
+        Records the stored size of a key.
+        """
+        with self._lock:
+            self._sizes.setdefault(namespace, {})[key] = size
+
+    def largest(self, n:int = 20) -> list:
+        """
+        Returns the n largest known keys as dicts with namespace, key and size in bytes.
+        """
+        with self._lock:
+            sizes = [(size, ns, key) for ns, keys in self._sizes.items() for key, size in keys.items()]
+        sizes.sort(reverse=True)
+        return [{"namespace": ns, "key": key, "bytes": size} for size, ns, key in sizes[:n]]
+
+    def stats(self) -> dict:
+        """
+        Returns the codec, number of known keys and total stored bytes per namespace.
+        """
+        with self._lock:
+            return {
+                ns: {"codec": self.codec(ns).name, "keys": len(keys), "bytes": sum(keys.values())}
+                for ns, keys in self._sizes.items()
+            }
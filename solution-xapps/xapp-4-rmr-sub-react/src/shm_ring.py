@@ -0,0 +1,337 @@
+
+# Imports from OSC libraries
+from mdclogpy import Logger
+
+# Imports from other libraries
+from multiprocessing import shared_memory, resource_tracker
+from time import sleep, monotonic, time_ns
+import os
+import struct
+
+# Imports from local files
+from .metrics import MetricsRegistry
+
+MAGIC = b"XSHMRNG1"
+OVERWRITE = "overwrite" # The producer never waits, slow consumers lose the oldest messages
+BLOCK = "block" # The producer waits for the slowest consumer, up to its block timeout
+
+_LINE = 64 # Fields written by different processes live on different cache lines
+_HEADER = struct.Struct("<8sIIII") # Line 0: magic, slot count, slot size, consumers, policy (0 overwrite, 1 block)
+_WRITE_SEQ, _DROPPED, _OVERSIZED = 8, 9, 10 # Line 1, in 8-byte words: next sequence to publish, drop counters
+_CURSOR, _LOST, _PID = 0, 1, 2 # One line per consumer from line 2: next sequence to read, lost messages, pid (0 if detached)
+_SLOT = struct.Struct("<QiiIH2x32s") # Slot header after its stamp word: time ns, mtype, sub id, length, MEID length, MEID
+
+# The counters shared between processes are read and written as single words of a "Q" view
+# (one aligned 8-byte load or store each): struct.pack_into() clears its whole area before
+# packing, so a reader could see a cursor or a stamp at zero in the middle of an update.
+
+def _round_up(size:int) -> int:
+    return (size + _LINE - 1) // _LINE * _LINE
+
+class RingSlot:
+    """
+    A message read from the ring: its metadata, and its payload as a memoryview of the shared memory (no copy).
+
+    With the block policy the payload stays valid until the consumer reads the next message or calls
+    release(). With the overwrite policy the producer may reuse the slot at any time: valid() tells,
+    after the payload has been used, whether it was overwritten meanwhile.
+    """
+    __slots__ = ("seq", "mtype", "sub_id", "meid", "timestamp", "payload", "_ring")
+
+    def __init__(self, ring, seq:int, mtype:int, sub_id:int, meid:bytes, timestamp:float, payload:memoryview):
+        self._ring = ring
+        self.seq = seq
+        self.mtype = mtype
+        self.sub_id = sub_id
+        self.meid = meid
+        self.timestamp = timestamp # Publication time, seconds since the epoch
+        self.payload = payload
+
+    def valid(self) -> bool:
+        """
+        Returns True if the slot still holds this message.
+        """
+        return self._ring._stamp(self.seq) == self.seq + 1
+
+class ShmRing:
+    """
+    Single-producer, multi-consumer ring buffer in shared memory, carrying raw RMR payloads with
+    their message type, subscription ID, MEID and publication time to analytics processes.
+
+    The producer (the RMR handler thread) copies each payload once into a fixed-size slot; consumers
+    in other processes attach by name and read the payloads as memoryviews of the shared memory, so
+    no message is pickled or copied again. There are no locks: the producer alone writes the header
+    and the slots, each consumer alone writes its own cursor, and a slot is stamped with its sequence
+    number only after it is fully written (and unstamped before it is rewritten), which consumers
+    check before and after reading it. This relies on aligned 8-byte stores being atomic, as they are
+    on the 64-bit platforms the xApp runs on.
+
+    Every consumer receives every message. With the overwrite policy the producer never waits and
+    consumers that fall more than a ring behind skip the oldest messages (counted as lost); with
+    the block policy the producer waits, up to block_timeout, for the slowest attached consumer and
+    drops the message if it is still full.
+
+    Parameters
+    ----------
+    name: str
+        Name of the shared memory block (under /dev/shm on Linux).
+    slots: int = 4096
+        Number of messages the ring holds.
+    slot_size: int = 1024
+        Largest payload, in bytes. Larger payloads are dropped and counted as oversized.
+    consumers: int = 4
+        Number of consumer cursors, attached by index.
+    policy: str = "overwrite"
+        "overwrite" or "block", when the ring is full.
+    block_timeout: float = 0.01
+        Seconds the producer waits for room with the block policy.
+    logger: Logger = None
+        Logger used to report the creation and removal of the ring.
+    """
+    def __init__(self, name:str, slots:int = 4096, slot_size:int = 1024, consumers:int = 4, policy:str = OVERWRITE,
+                 block_timeout:float = 0.01, logger:Logger = None, _attach:bool = False):
+        """
+        Creates the shared memory block of the ring (use attach() to open an existing one).
+        """
+        self.logger = logger if logger is not None else Logger(name="ShmRing")
+        self.name = name
+        self.block_timeout = block_timeout
+        if _attach:
+            self._shm = self._open(name)
+            magic, slots, slot_size, consumers, policy_code = _HEADER.unpack_from(self._shm.buf, 0)
+            if magic != MAGIC:
+                self._shm.close()
+                raise ValueError("Shared memory block {} is not a ring.".format(name))
+            policy = BLOCK if policy_code else OVERWRITE
+        else:
+            if policy not in (OVERWRITE, BLOCK):
+                raise ValueError("Unknown ring policy {}.".format(policy))
+        self.slots = slots
+        self.slot_size = slot_size
+        self.consumers = consumers
+        self.policy = policy
+        self._stride = _LINE + _round_up(slot_size) # Slot header then payload
+        self._slots_offset = 2 * _LINE + consumers * _LINE
+        if not _attach:
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=self._slots_offset + slots * self._stride)
+            _HEADER.pack_into(self._shm.buf, 0, MAGIC, slots, slot_size, consumers, int(policy == BLOCK))
+            self.logger.info("Created shared memory ring {}: {} slots of {} bytes, {} policy.".format(name, slots, slot_size, policy))
+        self._buf = self._shm.buf
+        self._words = self._buf.cast("Q")
+        self._owner = not _attach
+        self._write_seq = self._words[_WRITE_SEQ] # Only meaningful in the producer
+        self._min_cursor = self._write_seq # Cached slowest cursor, refreshed when the ring looks full
+
+    @staticmethod
+    def _open(name:str) -> shared_memory.SharedMemory:
+        """
+        Opens an existing block without letting this process remove it at exit.
+        """
+        try:
+            return shared_memory.SharedMemory(name=name, track=False) # Python 3.13+
+        except TypeError:
+            pass
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None if rtype == "shared_memory" else register(name, rtype)
+        try: # Before 3.13 every opener registers the block, and its resource tracker unlinks it at exit
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+    @classmethod
+    def attach(cls, name:str, logger:Logger = None):
+        """
+        Opens the ring created by the producer under name, for reading it with consumer().
+        """
+        return cls(name, logger=logger, _attach=True)
+
+    def close(self):
+        """
+        Releases this process' mapping, and removes the block if this process created it.
+        """
+        self._words.release()
+        self._buf = self._words = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+            self.logger.info("Removed shared memory ring {}.".format(self.name))
+
+    # ------------------ PRODUCER
+
+    def _stamp(self, seq:int) -> int:
+        """
+        Returns the stamp of the slot of seq: the sequence it holds plus one, 0 while it is being written.
+        """
+        return self._words[(self._slots_offset + (seq % self.slots) * self._stride) // 8]
+
+    def _cursors(self) -> list:
+        """
+        Returns (next sequence, lost, pid) of every consumer.
+        """
+        words = self._words
+        return [(words[base + _CURSOR], words[base + _LOST], words[base + _PID])
+                for base in ((2 + i) * _LINE // 8 for i in range(self.consumers))]
+
+    def _slowest(self) -> int:
+        """
+        Returns the cursor of the slowest attached consumer, or the write sequence if none is attached.
+        """
+        cursors = [cursor for cursor, _, pid in self._cursors() if pid]
+        return min(cursors) if cursors else self._write_seq
+
+    def publish(self, payload, mtype:int, meid:bytes = b"", sub_id:int = -1) -> bool:
+        """
+        Copies a message into the next slot and publishes it. Returns False if it was dropped
+        (larger than a slot, or the ring stayed full for block_timeout with the block policy).
+        """
+        length = len(payload)
+        if length > self.slot_size:
+            self._words[_OVERSIZED] += 1
+            return False
+        seq = self._write_seq
+        if self.policy == BLOCK and seq - self._min_cursor >= self.slots:
+            self._min_cursor = self._slowest()
+            deadline = None
+            while seq - self._min_cursor >= self.slots:
+                now = monotonic()
+                deadline = deadline if deadline is not None else now + self.block_timeout
+                if now >= deadline:
+                    self._words[_DROPPED] += 1
+                    return False
+                sleep(0.0001)
+                self._min_cursor = self._slowest()
+        offset = self._slots_offset + (seq % self.slots) * self._stride
+        words = self._words
+        words[offset // 8] = 0 # Unstamped: readers of the previous message see it is gone
+        meid = meid[:32]
+        _SLOT.pack_into(self._buf, offset + 8, time_ns(), mtype, sub_id, length, len(meid), meid)
+        self._buf[offset + _LINE:offset + _LINE + length] = payload
+        words[offset // 8] = seq + 1 # Stamped: the slot is complete
+        self._write_seq = seq + 1
+        words[_WRITE_SEQ] = seq + 1 # Published
+        return True
+
+    # ------------------ CONSUMERS
+
+    def consumer(self, index:int):
+        """
+        Attaches consumer index (0 to consumers - 1), which starts at the next published message.
+        """
+        return RingConsumer(self, index)
+
+    # ------------------ STATS
+
+    def stats(self) -> dict:
+        """
+        Returns the occupancy of the ring and the lag and losses of every attached consumer.
+        """
+        words = self._words
+        write_seq, dropped, oversized = words[_WRITE_SEQ], words[_DROPPED], words[_OVERSIZED]
+        consumers = {}
+        for i, (cursor, lost, pid) in enumerate(self._cursors()):
+            if pid:
+                consumers[i] = {"pid": pid, "lag": min(self.slots, write_seq - cursor), "lost": lost}
+        occupancy = max((consumer["lag"] for consumer in consumers.values()), default=0)
+        return {
+            "name": self.name,
+            "policy": self.policy,
+            "slots": self.slots,
+            "slot_size": self.slot_size,
+            "published": write_seq,
+            "dropped": dropped,
+            "oversized": oversized,
+            "occupancy": occupancy, # Messages not yet read by the slowest consumer
+            "occupancy_ratio": occupancy / self.slots,
+            "consumers": consumers
+        }
+
+    def instrument(self, metrics:MetricsRegistry):
+        """
+        Exports the ring statistics as metrics, read from the shared memory on each exposition.
+        """
+        metrics.callback("shm_ring_published_total", "Messages published in the shared memory ring.", ("ring",),
+                         lambda: {(self.name,): self.stats()["published"]}, type="counter")
+        metrics.callback("shm_ring_dropped_total", "Messages not published in the shared memory ring per reason.", ("ring", "reason"),
+                         lambda: {(self.name, reason): self.stats()[field] for reason, field in (("full", "dropped"), ("oversized", "oversized"))}, type="counter")
+        metrics.callback("shm_ring_occupancy_ratio", "Share of the ring slots not yet read by the slowest consumer.", ("ring",),
+                         lambda: {(self.name,): self.stats()["occupancy_ratio"]})
+        metrics.callback("shm_ring_consumer_lag", "Messages published and not yet read per consumer.", ("ring", "consumer"),
+                         lambda: {(self.name, i): c["lag"] for i, c in self.stats()["consumers"].items()})
+        metrics.callback("shm_ring_consumer_lost_total", "Messages overwritten before a consumer read them.", ("ring", "consumer"),
+                         lambda: {(self.name, i): c["lost"] for i, c in self.stats()["consumers"].items()}, type="counter")
+
+class RingConsumer:
+    """
+    Reader of a ShmRing, usually in another process than the producer. Only one reader may use an index at a time.
+    """
+    def __init__(self, ring:ShmRing, index:int):
+        """
+        Attaches the cursor index, starting at the next message the producer publishes.
+        """
+        if not 0 <= index < ring.consumers:
+            raise ValueError("Consumer index {} out of range (the ring has {} consumers).".format(index, ring.consumers))
+        self.ring = ring
+        self.index = index
+        self._base = (2 + index) * _LINE // 8 # First word of the cursor line
+        words = ring._words
+        self.lost = words[self._base + _LOST]
+        self._cursor = words[_WRITE_SEQ]
+        self._next = self._cursor # Sequence after the last message returned by read()
+        self._slot:RingSlot = None # Last message returned by read(), its payload is released with it
+        words[self._base + _CURSOR] = self._cursor
+        words[self._base + _PID] = os.getpid() # Last, so the producer never waits for a stale cursor
+
+    def read(self, timeout:float = None) -> RingSlot:
+        """
+        Returns the next message, waiting up to timeout seconds (forever if None, not at all if 0).
+        Returns None on timeout. Releases the message returned by the previous call.
+        """
+        self.release()
+        ring = self.ring
+        words = ring._words
+        deadline = None
+        pause = 0.00005
+        while True:
+            write_seq = words[_WRITE_SEQ]
+            seq = self._next
+            if write_seq - seq > ring.slots: # Overwritten before it was read
+                self.lost += write_seq - ring.slots - seq
+                seq = write_seq - ring.slots
+            if seq < write_seq:
+                offset = ring._slots_offset + (seq % ring.slots) * ring._stride
+                stamp = words[offset // 8]
+                ts, mtype, sub_id, length, meid_length, meid = _SLOT.unpack_from(ring._buf, offset + 8)
+                self._next = seq + 1
+                if stamp == seq + 1 and words[offset // 8] == stamp: # Not rewritten while the header was read
+                    self._slot = RingSlot(ring, seq, mtype, sub_id, meid[:meid_length], ts / 1e9,
+                                          ring._buf[offset + _LINE:offset + _LINE + length])
+                    return self._slot
+                self.lost += 1 # Overwrite policy: the producer got there first, skipped
+                continue
+            if timeout is not None:
+                now = monotonic()
+                deadline = deadline if deadline is not None else now + timeout
+                if now >= deadline:
+                    return None
+            sleep(pause) # No futex in Python: poll, backing off up to 1 ms while the ring stays empty
+            pause = min(0.001, pause * 2)
+
+    def release(self):
+        """
+        Tells the producer the messages read so far are done with (with the block policy, it may then
+        reuse their slots). The payload of the last message is released: copy it first to keep it.
+        """
+        if self._slot is not None:
+            self._slot.payload.release() # Using it now raises ValueError instead of reading a reused slot
+            self._slot = None
+        if self._next != self._cursor:
+            self._cursor = self._next
+            self.ring._words[self._base + _LOST] = self.lost
+            self.ring._words[self._base + _CURSOR] = self._cursor
+
+    def close(self):
+        """
+        Detaches the cursor, so the producer no longer waits for it.
+        """
+        self.release()
+        self.ring._words[self._base + _PID] = 0
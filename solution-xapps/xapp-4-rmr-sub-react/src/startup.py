@@ -0,0 +1,145 @@
+
+# Imports from OSC libraries
+from mdclogpy import Logger
+
+# Imports from other libraries
+from threading import Lock, Thread, current_thread
+from time import monotonic
+from typing import Callable, Dict
+import os
+import time
+
+def _since_process_start():
+    """
+    Returns the seconds elapsed since the process started (interpreter start-up and imports included),
+    or None if it cannot be read. The process start time has the resolution of a clock tick (10 ms).
+    """
+    try:
+        with open("/proc/self/stat") as stat:
+            fields = stat.read().rsplit(")", 1)[1].split() # The command name may contain spaces
+        start = int(fields[19]) / os.sysconf("SC_CLK_TCK") # Field 22, starttime, in clock ticks since boot
+        return time.clock_gettime(time.CLOCK_BOOTTIME) - start
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+class StartupProfiler:
+    """
+    Timeline of the start-up phases of the xApp.
+
+    Serial phases are closed with checkpoint(), which times everything since the previous checkpoint.
+    Independent phases run in their own thread with background(), overlapping the serial ones (e.g.
+    while the RMRXapp constructor waits for the RMR route table), and are joined with wait(). Instant
+    events, such as readiness, are recorded with mark(). All times are in seconds since the process
+    started, so the first phase ("imports") covers the interpreter start-up and the module imports.
+
+    Parameters
+    ----------
+    logger: Logger = None
+        Logger used to report every phase and the errors of background phases.
+    """
+    def __init__(self, logger:Logger = None):
+        """
+        Initializes the profiler, recording the time elapsed since the process started as the "imports" phase.
+        """
+        self.logger = logger if logger is not None else Logger(name="StartupProfiler")
+        self._lock = Lock() # Protects the phases, which background threads also record
+        self._created = monotonic()
+        since_start = _since_process_start()
+        self.process_start_known = since_start is not None # False if times are relative to the profiler creation
+        self._offset = since_start if since_start is not None else 0.0 # Seconds from the process start to the profiler creation
+        self._phases = []
+        self._marks:Dict[str, float] = {}
+        self._threads:Dict[str, Thread] = {}
+        self._errors:Dict[str, BaseException] = {}
+        self._last_checkpoint = self._offset
+        if self.process_start_known:
+            self._record("imports", 0.0, self._offset, "MainThread")
+
+    def now(self) -> float:
+        """
+        Returns the seconds since the process started.
+        """
+        return monotonic() - self._created + self._offset
+
+    def _record(self, name:str, start:float, end:float, thread:str, error:str = None):
+        """
+        Stores a finished phase.
+        """
+        phase = {"name": name, "thread": thread, "start": start, "end": end, "duration": end - start}
+        if error is not None:
+            phase["error"] = error
+        with self._lock:
+            self._phases.append(phase)
+        self.logger.debug("Start-up phase {} took {:.3f} s.".format(name, end - start))
+
+    # ------------------ PHASES
+
+    def checkpoint(self, name:str):
+        """
+        Closes the serial phase that started at the previous checkpoint.
+        """
+        end = self.now()
+        self._record(name, self._last_checkpoint, end, current_thread().name)
+        self._last_checkpoint = end
+
+    def background(self, name:str, target:Callable) -> Thread:
+        """
+        Runs target in a thread as the phase name. An exception raised by target is logged and raised again by wait().
+        """
+        def run():
+            start = self.now()
+            error = None
+            try:
+                target()
+            except BaseException as e: # Reported to the thread calling wait()
+                self._errors[name] = e
+                error = repr(e)
+                self.logger.error("Start-up phase {} failed: {}".format(name, error))
+            self._record(name, start, self.now(), current_thread().name, error)
+        thread = Thread(target=run, name="startup-" + name, daemon=True)
+        self._threads[name] = thread
+        thread.start()
+        return thread
+
+    def wait(self, *names:str):
+        """
+        Waits for background phases to finish, raising the exception of the first one that failed.
+        Meant for the serial path: it records the wait as "wait:<names>".
+        """
+        start = self.now()
+        for name in names:
+            self._threads[name].join()
+        self._record("wait:" + ",".join(names), start, self.now(), current_thread().name)
+        self._last_checkpoint = self.now()
+        for name in names:
+            if name in self._errors:
+                raise self._errors[name]
+
+    def mark(self, name:str):
+        """
+        Records an instant event, e.g. "ready".
+        """
+        with self._lock:
+            self._marks[name] = self.now()
+        self.logger.info("Start-up event {} at {:.3f} s.".format(name, self._marks[name]))
+
+    # ------------------ REPORT
+
+    def to_dict(self) -> dict:
+        """
+        Returns the phases sorted by start time, the events, the time to ready and the time saved by overlapping phases.
+        """
+        with self._lock:
+            phases = sorted(self._phases, key=lambda phase: phase["start"])
+            marks = dict(self._marks)
+        work = [phase for phase in phases if not phase["name"].startswith("wait:")]
+        span = max((phase["end"] for phase in work), default=0.0) - min((phase["start"] for phase in work), default=0.0)
+        return {
+            "process_start_known": self.process_start_known,
+            "time_to_ready": marks.get("ready", None),
+            "phases": phases,
+            "marks": marks,
+            "running": [name for name, thread in self._threads.items() if thread.is_alive()],
+            "serial_seconds": sum(phase["duration"] for phase in work), # Start-up time if every phase ran one after the other
+            "overlap_seconds": max(0.0, sum(phase["duration"] for phase in work) - span) # Time saved by the background phases
+        }
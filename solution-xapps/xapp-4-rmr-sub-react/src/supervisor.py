@@ -0,0 +1,337 @@
+
+# Imports from OSC libraries
+from mdclogpy import Logger, Level
+from ricxappframe import xapp_rest
+
+# Imports from other libraries
+from threading import Event, Lock
+from time import monotonic
+from typing import Dict
+import multiprocessing
+import signal
+import json
+import os
+import zlib
+import requests
+
+# Imports from local files
+from .metrics import MetricsRegistry
+
+def shard_of(meid:str, count:int) -> int:
+    """
+    Returns the index of the worker owning an E2 node: the CRC-32 of its MEID modulo the number of
+    workers, the same in every process and after restarts (unlike hash(), which is salted per process).
+    """
+    return zlib.crc32(meid.encode()) % count
+
+def _run_worker(index:int, count:int, rmr_port:int, http_port:int):
+    """
+    Entry point of a worker process: runs the reactive xApp on its own ports, owning one shard of the E2 nodes.
+    """
+    os.environ["RMR_RTG_SVC"] = str(rmr_port + 1) # Route table port of the worker, next to its data port as for a single xApp
+    from .custom_xapp import XappRmrSubReact # Imported by the worker, the supervisor holds no RMR context
+    xapp = XappRmrSubReact(rmr_port=rmr_port, http_port=http_port, shard=(index, count))
+    xapp.start()
+
+class _Worker:
+    """
+    State of one worker process, kept by the supervisor.
+    """
+    def __init__(self, index:int, rmr_port:int, http_port:int):
+        self.index = index
+        self.rmr_port = rmr_port
+        self.http_port = http_port
+        self.process = None
+        self.started = 0.0 # Monotonic time of the last spawn
+        self.restarts = 0
+        self.backoff = 0.0 # Seconds before the next restart, doubled while the worker keeps crashing
+        self.restart_at = None # Monotonic time of the pending restart
+        self.last_exit = None # Exit code of the last run (negative: killed by that signal)
+
+    def alive(self) -> bool:
+        return self.process is not None and self.process.is_alive()
+
+    def to_dict(self) -> dict:
+        return {
+            "index": self.index,
+            "pid": self.process.pid if self.process is not None else None,
+            "alive": self.alive(),
+            "rmr_port": self.rmr_port,
+            "http_port": self.http_port,
+            "restarts": self.restarts,
+            "last_exit": self.last_exit
+        }
+
+class WorkerSupervisor:
+    """
+    Supervisor of the multi-process mode of the reactive xApp, for spreading the handler work of
+    many E2 nodes over several cores (one Python process only runs handlers on one core at a time).
+
+    Each worker process runs its own XappRmrSubReact, with its own RMR endpoint and REST server,
+    and subscribes only to the E2 nodes of its shard (shard_of() of their MEID). The Subscription
+    Manager routes the indications and notifications of a subscription to the endpoint that made
+    it, so every node is handled by one worker, and the workers share no state but SDL.
+
+    The supervisor restarts crashed workers with an exponential backoff and serves the REST API
+    the platform probes: liveness, readiness (ready when every worker is), the list of workers, and
+    the metrics of every worker merged under a worker label.
+
+    Parameters
+    ----------
+    workers: int
+        Number of worker processes.
+    rmr_base_port: int = 4560
+        Worker i uses rmr_base_port + 2 * i for RMR data and the next port for its route table.
+    http_base_port: int = 8090
+        Worker i serves its REST API on http_base_port + i.
+    http_port: int = 8080
+        Port of the REST API of the supervisor.
+    restart_backoff: float = 1.0
+        Seconds before restarting a crashed worker, doubled (up to 60 s) while it crashes within a minute of its start.
+    stop_timeout: float = 10.0
+        Seconds stop() waits for the workers to unsubscribe and exit before killing them.
+    """
+    MAX_BACKOFF = 60.0
+
+    def __init__(self, workers:int, rmr_base_port:int = 4560, http_base_port:int = 8090, http_port:int = 8080,
+                 restart_backoff:float = 1.0, stop_timeout:float = 10.0):
+        """
+        Initializes the supervisor. Workers are only spawned by start().
+        """
+        self.logger = Logger(name="WorkerSupervisor", level=Level.DEBUG)
+        self.http_port = http_port
+        self.restart_backoff = restart_backoff
+        self.stop_timeout = stop_timeout
+        self._workers = [_Worker(i, rmr_base_port + 2 * i, http_base_port + i) for i in range(workers)]
+        self._context = multiprocessing.get_context("spawn") # Fresh interpreters: no threads, locks or RMR state inherited
+        self._lock = Lock() # Protects the worker processes, also read by the REST handlers
+        self._stopping = Event()
+        self._session = requests.Session() # Connections to the worker REST servers
+        self.http_server = None
+
+        # Supervisor metrics, exposed with the merged metrics of the workers
+        self._metrics = MetricsRegistry()
+        self._metrics.callback("xapp_worker_up", "1 if the worker process is running.", ("worker",),
+                               lambda: {(w.index,): int(w.alive()) for w in self._workers})
+        self._metrics.callback("xapp_worker_restarts_total", "Restarts of the worker process after it exited.", ("worker",),
+                               lambda: {(w.index,): w.restarts for w in self._workers}, type="counter")
+
+    @classmethod
+    def from_config(cls, path:str = None):
+        """
+        Returns a supervisor configured by controls.workers of the config file (CONFIG_FILE by default),
+        or None for the single-process mode (count 1, the default). A count of 0 starts one worker per usable CPU.
+        """
+        path = path if path is not None else os.environ.get("CONFIG_FILE", "")
+        try:
+            with open(path) as config_file:
+                config = json.load(config_file).get("controls", {}).get("workers", {})
+        except (OSError, ValueError):
+            return None
+        count = config.get("count", 1)
+        if count == 0:
+            count = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+        if count <= 1:
+            return None
+        return cls(
+            workers=count,
+            rmr_base_port=config.get("rmr_base_port", 4560),
+            http_base_port=config.get("http_base_port", 8090),
+            restart_backoff=config.get("restart_backoff", 1.0)
+        )
+
+    # ------------------ WORKERS
+
+    def start(self):
+        """
+        Starts the REST server and spawns every worker.
+        """
+        self.http_server = xapp_rest.ThreadedHTTPServer("0.0.0.0", self.http_port)
+        self.http_server.handler.add_handler(self.http_server.handler, method="GET", name="liveness", uri="/ric/v1/health/alive", callback=self.liveness_handler)
+        self.http_server.handler.add_handler(self.http_server.handler, method="GET", name="readiness", uri="/ric/v1/health/ready", callback=self.readiness_handler)
+        self.http_server.handler.add_handler(self.http_server.handler, method="GET", name="metrics", uri="/ric/v1/metrics", callback=self.metrics_handler)
+        self.http_server.handler.add_handler(self.http_server.handler, method="GET", name="workers", uri="/ric/v1/workers", callback=self.workers_handler)
+        self._metrics.instrument_rest(self.http_server.handler)
+        self.http_server.start()
+        with self._lock:
+            for worker in self._workers:
+                self._spawn(worker)
+
+    def _spawn(self, worker:_Worker):
+        """
+        Starts the process of a worker. Called with the lock held.
+        """
+        worker.process = self._context.Process(
+            target=_run_worker,
+            args=(worker.index, len(self._workers), worker.rmr_port, worker.http_port),
+            name="xapp-worker-{}".format(worker.index)
+        )
+        worker.process.start()
+        worker.started = monotonic()
+        worker.restart_at = None
+        self.logger.info("Worker {} started with pid {} (RMR port {}, HTTP port {}).".format(worker.index, worker.process.pid, worker.rmr_port, worker.http_port))
+
+    def run(self):
+        """
+        Starts the workers and restarts the ones that exit, until a termination signal or stop() is received.
+        """
+        signal.signal(signal.SIGTERM, self._handle_signal)
+        signal.signal(signal.SIGQUIT, self._handle_signal)
+        signal.signal(signal.SIGINT, self._handle_signal)
+        self.start()
+        while not self._stopping.wait(1.0):
+            self._check_workers()
+        self._stop_workers()
+
+    def _check_workers(self):
+        """
+        Schedules the restart of the workers that exited and restarts the ones whose backoff elapsed.
+        """
+        now = monotonic()
+        with self._lock:
+            for worker in self._workers:
+                if worker.alive() or self._stopping.is_set():
+                    continue
+                if worker.restart_at is None:
+                    worker.last_exit = worker.process.exitcode
+                    if now - worker.started > self.MAX_BACKOFF: # It ran for a while, this is not a crash loop
+                        worker.backoff = 0.0
+                    worker.backoff = min(self.MAX_BACKOFF, worker.backoff * 2 if worker.backoff else self.restart_backoff)
+                    worker.restart_at = now + worker.backoff
+                    self.logger.error("Worker {} exited with code {}, restarting it in {} s.".format(worker.index, worker.last_exit, worker.backoff))
+                elif now >= worker.restart_at:
+                    worker.restarts += 1
+                    self._spawn(worker)
+
+    def _handle_signal(self, signum:int, frame):
+        """
+        Stops the supervisor on a termination signal.
+        """
+        self.logger.info("Received signal {} to stop the workers.".format(signal.Signals(signum).name))
+        self.stop()
+
+    def stop(self):
+        """
+        Makes run() stop the workers and return.
+        """
+        self._stopping.set()
+
+    def _stop_workers(self):
+        """
+        Sends SIGTERM to the workers (which unsubscribe from their E2 nodes and exit), waits for them
+        for up to stop_timeout seconds in total, kills the ones still running and stops the REST server.
+        """
+        with self._lock:
+            processes = [worker.process for worker in self._workers if worker.alive()]
+        for process in processes:
+            process.terminate()
+        deadline = monotonic() + self.stop_timeout
+        for process in processes:
+            process.join(max(0.0, deadline - monotonic()))
+            if process.is_alive():
+                self.logger.warning("Worker {} did not exit in {} s, killing it.".format(process.name, self.stop_timeout))
+                process.kill()
+                process.join()
+        if self.http_server is not None:
+            self.http_server.stop()
+
+    # ------------------ AGGREGATION
+
+    def _get(self, worker:_Worker, path:str):
+        """
+        Sends a GET request to the REST server of a worker. Returns None if it does not answer within a second.
+        """
+        try:
+            return self._session.get("http://127.0.0.1:{}{}".format(worker.http_port, path), timeout=1.0)
+        except requests.RequestException:
+            return None
+
+    def merged_metrics(self) -> str:
+        """
+        Returns the metrics of the supervisor and of every worker in one exposition, the samples of
+        the workers labelled with their index (worker="0", ...).
+        """
+        families:Dict[str, dict] = {} # Metric family -> HELP line, TYPE line and samples, in order of first appearance
+        def merge(text:str, worker:str = None):
+            family = None
+            for line in text.splitlines():
+                if line.startswith("# HELP ") or line.startswith("# TYPE "):
+                    family = families.setdefault(line.split(" ", 3)[2], {"# HELP": None, "# TYPE": None, "samples": []})
+                    family[line[:6]] = family[line[:6]] or line # The supervisor and the workers describe a family alike
+                elif line and family is not None:
+                    if worker is not None: # Inserts the worker label first, the metric name ends at "{" or " "
+                        end = min(i for i in (line.find("{"), line.find(" ")) if i >= 0)
+                        labels = 'worker="{}"'.format(worker)
+                        line = line[:end] + ("{" + labels + "," + line[end + 1:] if line[end] == "{" else "{" + labels + "}" + line[end:])
+                    family["samples"].append(line)
+        merge(self._metrics.expose())
+        for worker in self._workers:
+            response = self._get(worker, "/ric/v1/metrics") if worker.alive() else None
+            if response is not None and response.status_code == 200:
+                merge(response.text, str(worker.index))
+        lines = []
+        for family in families.values():
+            lines.extend(line for line in (family["# HELP"], family["# TYPE"]) if line is not None)
+            lines.extend(family["samples"])
+        return "\n".join(lines) + "\n"
+
+    # ------------------ REST HANDLERS
+
+    def liveness_handler(self, name:str, path:str, data:bytes, ctype:str):
+        """
+        Handler for the HTTP GET /ric/v1/health/alive request. The supervisor restarts the workers
+        itself, so it is alive even while a worker is down.
+        """
+        response = xapp_rest.initResponse(
+            status=200, # Status = 200 OK
+            response="Liveness"
+        ) # Initiating HTTP response
+        response['payload'] = json.dumps({"status": "Healthy", "workers_alive": sum(1 for w in self._workers if w.alive())})
+        return response
+
+    def readiness_handler(self, name:str, path:str, data:bytes, ctype:str):
+        """
+        Handler for the HTTP GET /ric/v1/health/ready request: ready when every worker is.
+        """
+        unready = []
+        for worker in self._workers:
+            response = self._get(worker, "/ric/v1/health/ready") if worker.alive() else None
+            if response is None or response.status_code != 200:
+                unready.append(worker.index)
+        if unready:
+            response = xapp_rest.initResponse(
+                status=503, # Status = 503 Service Unavailable
+                response="Readiness"
+            )
+            response['payload'] = json.dumps({"status": "Not ready", "unready_workers": unready})
+        else:
+            response = xapp_rest.initResponse(
+                status=200, # Status = 200 OK
+                response="Readiness"
+            ) # Initiating HTTP response
+            response['payload'] = json.dumps({"status": "Ready"})
+        return response
+
+    def metrics_handler(self, name:str, path:str, data:bytes, ctype:str):
+        """
+        Handler for the HTTP GET /ric/v1/metrics request.
+        """
+        response = xapp_rest.initResponse(
+            status=200, # Status = 200 OK
+            response="Metrics"
+        ) # Initiating HTTP response
+        response['ctype'] = MetricsRegistry.CONTENT_TYPE
+        response['payload'] = self.merged_metrics() # Payload = the metrics of the supervisor and of every worker
+        return response
+
+    def workers_handler(self, name:str, path:str, data:bytes, ctype:str):
+        """
+        Handler for the HTTP GET /ric/v1/workers request.
+        """
+        response = xapp_rest.initResponse(
+            status=200, # Status = 200 OK
+            response="Workers"
+        ) # Initiating HTTP response
+        with self._lock:
+            response['payload'] = json.dumps([worker.to_dict() for worker in self._workers]) # Payload = pid, ports, restarts and last exit code per worker
+        return response
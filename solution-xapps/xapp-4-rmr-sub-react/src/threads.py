@@ -0,0 +1,182 @@
+
+# Imports from OSC libraries
+from mdclogpy import Logger
+
+# Imports from other libraries
+from threading import Thread, Lock, Event, current_thread, main_thread, enumerate as enumerate_threads
+from fnmatch import fnmatchcase
+from time import monotonic
+from typing import Callable, Dict, List
+import os
+
+# Imports from local files
+from .metrics import MetricsRegistry
+
+_CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100 # Units of the CPU times in /proc
+
+def _read_task(tid:int) -> dict:
+    """
+    Returns the CPU times, context switches and last CPU of a thread of this process, read from
+    /proc/self/task/<tid>. Empty if the thread has exited or /proc is not available.
+    """
+    try:
+        with open("/proc/self/task/{}/stat".format(tid)) as f:
+            fields = f.read().rsplit(")", 1)[1].split() # The command name may contain spaces, it ends at the last ")"
+        with open("/proc/self/task/{}/status".format(tid)) as f:
+            status = dict(line.split(":", 1) for line in f if ":" in line)
+    except (OSError, IndexError):
+        return {}
+    return {
+        "cpu_user_seconds": int(fields[11]) / _CLOCK_TICKS, # Field 14 of stat, utime
+        "cpu_system_seconds": int(fields[12]) / _CLOCK_TICKS, # Field 15, stime
+        "last_cpu": int(fields[36]), # Field 39, processor
+        "voluntary_switches": int(status.get("voluntary_ctxt_switches", "0")), # The thread blocked (I/O, locks, sleeps)
+        "involuntary_switches": int(status.get("nonvoluntary_ctxt_switches", "0")) # The thread was preempted
+    }
+
+class ThreadRegistry:
+    """
+    Registry of the threads of the xApp, so they can be named, pinned to CPUs, accounted and stopped together.
+
+    Threads started with start() run their target under the given name; threads created elsewhere
+    (the framework RMR loops, the HTTP server, the components' own threads) are registered with
+    adopt(). Every registered thread is pinned to the CPUs of the first affinity pattern matching its
+    name, e.g. {"rmr-*": [0], "*": [1, 2, 3]} keeps the RMR loops alone on CPU 0. stop() sets the
+    stopping event, which the started targets should watch, and joins every registered thread
+    within one shared timeout, reporting the ones that did not finish.
+
+    stats() reads the CPU time and context switches the kernel accounts to each thread of the
+    process, including the native threads of RMR, which instrument() exports as metrics.
+
+    Parameters
+    ----------
+    affinity: Dict[str, List[int]] = None
+        CPUs per thread name pattern (fnmatch syntax, first match wins). An empty list leaves the thread unpinned.
+    join_timeout: float = 5.0
+        Seconds stop() waits, in total, for the registered threads.
+    logger: Logger = None
+        Logger used to report pinning failures and threads that did not stop.
+    """
+    def __init__(self, affinity:Dict[str, List[int]] = None, join_timeout:float = 5.0, logger:Logger = None):
+        """
+        Initializes an empty registry.
+        """
+        self.affinity = dict(affinity or {})
+        self.join_timeout = join_timeout
+        self.logger = logger if logger is not None else Logger(name="ThreadRegistry")
+        self.stopping = Event() # Set by stop(), the targets of start() return when it is set
+        self._lock = Lock() # Protects the thread dict
+        self._threads:Dict[str, Thread] = {} # Name -> registered thread
+        self._cpus:Dict[str, List[int]] = {} # Name -> CPUs the thread was pinned to
+
+    # ------------------ REGISTRATION
+
+    def start(self, name:str, target:Callable, *args, daemon:bool = True) -> Thread:
+        """
+        Starts target(*args) in a registered thread called name, pinned before target runs.
+        """
+        def run():
+            self._pin(name, current_thread())
+            target(*args)
+        thread = Thread(target=run, name=name, daemon=daemon)
+        with self._lock:
+            self._threads[name] = thread
+        thread.start()
+        return thread
+
+    def adopt(self, name:str, thread:Thread = None) -> Thread:
+        """
+        Registers an already started thread (the calling one by default) as name, renaming and pinning it.
+        """
+        thread = thread if thread is not None else current_thread()
+        thread.name = name
+        with self._lock:
+            self._threads[name] = thread
+        self._pin(name, thread)
+        return thread
+
+    def _pin(self, name:str, thread:Thread):
+        """
+        Pins a thread to the CPUs of the first affinity pattern matching name, if any.
+        """
+        cpus = next((cpus for pattern, cpus in self.affinity.items() if fnmatchcase(name, pattern)), None)
+        if not cpus or thread.native_id is None:
+            return
+        if not hasattr(os, "sched_setaffinity"):
+            self.logger.warning("Thread {} is not pinned, CPU affinity is not supported on this platform.".format(name))
+            return
+        try:
+            os.sched_setaffinity(thread.native_id, cpus) # On Linux, a thread id pins that thread only
+        except OSError as e: # CPUs outside the container cpuset, or the thread exited
+            self.logger.warning("Thread {} could not be pinned to CPUs {}: {}".format(name, cpus, e))
+            return
+        with self._lock:
+            self._cpus[name] = sorted(os.sched_getaffinity(thread.native_id))
+
+    # ------------------ STOP
+
+    def stop(self, timeout:float = None) -> List[str]:
+        """
+        Sets the stopping event and waits, for up to timeout seconds in total (join_timeout by default),
+        for every registered thread but the calling and the main one. Returns the names of the threads still running.
+        """
+        self.stopping.set()
+        deadline = monotonic() + (self.join_timeout if timeout is None else timeout)
+        with self._lock:
+            threads = list(self._threads.items())
+        running = []
+        for name, thread in threads:
+            if thread is current_thread() or thread is main_thread() or thread.ident is None:
+                continue
+            thread.join(max(0.0, deadline - monotonic()))
+            if thread.is_alive():
+                running.append(name)
+        if running:
+            self.logger.warning("Threads still running after {} s: {}".format(self.join_timeout if timeout is None else timeout, ", ".join(running)))
+        return running
+
+    # ------------------ ACCOUNTING
+
+    def stats(self) -> Dict[str, dict]:
+        """
+        Returns the state and kernel accounting of every thread of the process, by name. Threads not
+        created by Python (e.g. the RMR receive threads) are named "native-<tid>".
+        """
+        with self._lock:
+            registered = {id(thread) for thread in self._threads.values()}
+            cpus = dict(self._cpus)
+        python_threads = {thread.native_id: thread for thread in enumerate_threads() if thread.native_id is not None}
+        try:
+            tids = sorted(int(tid) for tid in os.listdir("/proc/self/task"))
+        except OSError: # No /proc, only the Python threads are listed
+            tids = sorted(python_threads)
+        stats = {}
+        for tid in tids:
+            thread = python_threads.get(tid, None)
+            name = thread.name if thread is not None else "native-{}".format(tid)
+            entry = {
+                "tid": tid,
+                "registered": thread is not None and id(thread) in registered,
+                "daemon": thread.daemon if thread is not None else None,
+                "cpus": cpus.get(name, None) # None when the thread is not pinned
+            }
+            entry.update(_read_task(tid))
+            stats[name if name not in stats else "{}-{}".format(name, tid)] = entry
+        return stats
+
+    def instrument(self, metrics:MetricsRegistry):
+        """
+        Exports the CPU time and context switches of every thread as metrics, read from /proc on each exposition.
+        """
+        def totals(fields:Dict[str, str]) -> dict:
+            values = {}
+            for name, entry in self.stats().items():
+                label = "native" if name.startswith("native-") else name # The native threads have no names to tell them apart
+                for field, mode in fields.items():
+                    if field in entry:
+                        values[(label, mode)] = values.get((label, mode), 0) + entry[field]
+            return values
+        metrics.callback("thread_cpu_seconds_total", "CPU time of each thread of the xApp per mode.", ("thread", "mode"),
+                         lambda: totals({"cpu_user_seconds": "user", "cpu_system_seconds": "system"}), type="counter")
+        metrics.callback("thread_context_switches_total", "Context switches of each thread of the xApp per kind.", ("thread", "kind"),
+                         lambda: totals({"voluntary_switches": "voluntary", "involuntary_switches": "involuntary"}), type="counter")
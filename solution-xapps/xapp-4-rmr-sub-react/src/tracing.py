@@ -0,0 +1,342 @@
+
+# Imports from OSC libraries
+from ricxappframe.xapp_frame import rmr
+from mdclogpy import Logger
+
+# Imports from other libraries
+from threading import Thread, local
+from queue import Queue, Empty, Full
+from functools import wraps
+from logging.handlers import RotatingFileHandler
+from typing import Callable, List
+import base64
+import json
+import logging
+import os
+import random
+import time
+
+_MARKER = b"~" # Starts the RMR transaction IDs that carry a trace context
+_CONTEXT_LEN = 28 # Marker + 27 base64 characters of a 12-byte trace ID and an 8-byte span ID
+_XID_LEN = 32 # RMR_MAX_XID, the framework copies that many bytes into the transaction ID of a message
+_NOT_SAMPLED = object() # Current context of a handler whose message is not traced
+_STOP = object() # Tells the exporter thread to flush and exit
+
+# OTLP span kinds and status codes
+KIND_INTERNAL, KIND_PRODUCER, KIND_CONSUMER = 1, 4, 5
+STATUS_OK, STATUS_ERROR = 1, 2
+
+class Span:
+    """
+    A timed operation of a trace, exported in the OTLP JSON format when it ends.
+    """
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "kind", "start", "end", "attributes", "status", "remote_parent")
+
+    def __init__(self, trace_id:bytes, parent_id:bytes, name:str, kind:int, attributes:dict, remote_parent:bool = False):
+        """
+        Starts a span with a new span ID.
+        """
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start = time.time_ns()
+        self.end = None
+        self.attributes = attributes
+        self.status = STATUS_OK
+        self.remote_parent = remote_parent # True if the parent span is in another xApp
+
+    def to_otlp(self) -> dict:
+        """
+        Returns the span in the OTLP JSON encoding (hex IDs, nanosecond timestamps as strings).
+        """
+        span = {
+            "traceId": (b"\0\0\0\0" + self.trace_id).hex(), # OTLP trace IDs have 16 bytes
+            "spanId": self.span_id.hex(),
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start),
+            "endTimeUnixNano": str(self.end),
+            "attributes": [
+                {"key": k, "value": {"intValue": str(v)} if isinstance(v, int) else {"stringValue": str(v)}}
+                for k, v in self.attributes.items()
+            ],
+            "status": {"code": self.status}
+        }
+        if self.parent_id is not None:
+            span["parentSpanId"] = self.parent_id.hex()
+        return span
+
+class Tracer:
+    """
+    Lightweight end-to-end tracing of RMR messages with head-based sampling.
+
+    A trace starts when an xApp sends a message outside of any handler, or when it receives a
+    message of one of the root_mtypes without a trace context, and it is sampled with probability
+    sample_rate at that point only. Sampled messages carry their context in the RMR transaction ID
+    ("~" + base64 of the trace ID and the sending span ID), and replies with rmr_rts() carry the
+    context of the reply span back, so the receiving xApps continue the trace whatever their own
+    sample rate. Spans are recorded around sends, replies and handlers.
+
+    Unsampled messages keep their random transaction ID and only cost a prefix check and a thread
+    local update. Ended spans are queued (dropped if the queue is full) and written by an exporter
+    thread in batches, one OTLP ExportTraceServiceRequest JSON object per line, to a rotating file.
+
+    Parameters
+    ----------
+    service: str
+        Service name of the exported spans (the xApp name).
+    sample_rate: float = 0.01
+        Probability of tracing a message that starts a trace.
+    root_mtypes: List[int] = None
+        Message types that start a trace when received without a context (e.g. E2 indications).
+    path: str = "/tmp/xapp-spans.jsonl"
+        Export file. Rotated files get the suffixes .1, .2, ...
+    max_bytes: int = 10485760
+        Size of the export file that triggers a rotation.
+    backups: int = 3
+        Rotated files kept.
+    batch_size: int = 256
+        Spans written per line.
+    flush_interval: float = 1.0
+        Maximum seconds a span waits in the queue before it is written.
+    logger: Logger = None
+        Logger used to report export failures.
+    """
+    def __init__(self, service:str, sample_rate:float = 0.01, root_mtypes:List[int] = None, path:str = "/tmp/xapp-spans.jsonl",
+                 max_bytes:int = 10485760, backups:int = 3, batch_size:int = 256, flush_interval:float = 1.0, logger:Logger = None):
+        """
+        Initializes the tracer. Spans are only written after start() is called.
+        """
+        self.service = service
+        self.sample_rate = sample_rate
+        self.root_mtypes = set(root_mtypes) if root_mtypes is not None else set()
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.logger = logger if logger is not None else Logger(name="Tracer")
+
+        self._local = local() # Current span of each thread
+        self._queue = Queue(maxsize=10000) # Ended spans waiting for the exporter
+        self._thread = None
+
+        # Stats
+        self.sampled = 0
+        self.dropped = 0
+        self.exported = 0
+
+    # ------------------ CONTEXT
+
+    def current(self):
+        """
+        Returns the current span of the calling thread, _NOT_SAMPLED inside an untraced handler, or None.
+        """
+        return getattr(self._local, "span", None)
+
+    def _sample(self) -> bool:
+        """
+        Head-based sampling decision for a new trace.
+        """
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def encode(self, span:Span) -> bytes:
+        """
+        Returns the RMR transaction ID carrying the context of a span, NUL-padded to the RMR_MAX_XID bytes the framework copies.
+        """
+        return (_MARKER + base64.urlsafe_b64encode(span.trace_id + span.span_id).rstrip(b"=")).ljust(_XID_LEN, b"\0")
+
+    def decode(self, xaction:bytes):
+        """
+        Returns the (trace ID, span ID) carried by an RMR transaction ID, or None if it carries no context.
+        """
+        xaction = xaction.rstrip(b"\0") if xaction else xaction # get_xaction() stops at the first NUL, raw copies do not
+        if not xaction or len(xaction) != _CONTEXT_LEN or not xaction.startswith(_MARKER):
+            return None
+        try:
+            ids = base64.urlsafe_b64decode(xaction[1:] + b"=")
+        except ValueError:
+            return None
+        return ids[:12], ids[12:]
+
+    def _end(self, span:Span, ok:bool = True):
+        """
+        Ends a span and queues it for export.
+        """
+        span.end = time.time_ns()
+        if not ok:
+            span.status = STATUS_ERROR
+        try:
+            self._queue.put_nowait(span)
+        except Full:
+            self.dropped += 1
+
+    # ------------------ RMR INSTRUMENTATION
+
+    def trace_handler(self, handler:Callable) -> Callable:
+        """
+        Wraps an RMR message handler with the signature (xapp, summary, sbuf) to continue the trace of
+        its message, or to start one for root message types, with a span around the handler.
+        """
+        if getattr(handler, "_traced", False):
+            return handler
+        @wraps(handler)
+        def traced(xapp, summary, sbuf):
+            previous = getattr(self._local, "span", None)
+            mtype = summary[rmr.RMR_MS_MSG_TYPE]
+            context = self.decode(summary[rmr.RMR_MS_TRN_ID])
+            if context is not None:
+                span = Span(context[0], context[1], "rmr.handle {}".format(mtype), KIND_CONSUMER, {"rmr.mtype": mtype}, remote_parent=True)
+            elif mtype in self.root_mtypes and self._sample():
+                self.sampled += 1
+                span = Span(os.urandom(12), None, "rmr.handle {}".format(mtype), KIND_CONSUMER, {"rmr.mtype": mtype})
+            else:
+                self._local.span = _NOT_SAMPLED # Sends from this handler must not start traces of their own
+                try:
+                    return handler(xapp, summary, sbuf)
+                finally:
+                    self._local.span = previous
+            self._local.span = span
+            ok = False
+            try:
+                result = handler(xapp, summary, sbuf)
+                ok = True
+                return result
+            finally:
+                self._local.span = previous
+                self._end(span, ok)
+        traced._traced = True
+        return traced
+
+    def trace_dispatch(self, dispatch:dict) -> dict:
+        """
+        Wraps every handler of a message type -> handler dispatch table in place and returns the table.
+        """
+        for mtype, handler in list(dispatch.items()):
+            dispatch[mtype] = self.trace_handler(handler)
+        return dispatch
+
+    def instrument_rmr(self, xapp):
+        """
+        Traces the RMR sends and replies of a framework xApp and, for an RMRXapp, its registered
+        handlers, its default handler and every handler registered later with register_callback().
+        Call it before any other instrumentation that wraps rmr_send or rmr_rts.
+        """
+        rmr_send, rmr_rts = xapp.rmr_send, xapp.rmr_rts
+
+        def send(payload, mtype, retries=100):
+            parent = self.current()
+            if parent is _NOT_SAMPLED or (parent is None and not self._sample()):
+                return rmr_send(payload, mtype, retries)
+            if parent is None:
+                self.sampled += 1
+            span = Span(parent.trace_id if parent else os.urandom(12), parent.span_id if parent else None,
+                        "rmr.send {}".format(mtype), KIND_PRODUCER, {"rmr.mtype": mtype})
+            # Same as Xapp.rmr_send(), but with the trace context as transaction ID
+            sbuf = rmr.rmr_alloc_msg(vctx=xapp._mrc, size=len(payload), payload=payload, mtype=mtype, fixed_transaction_id=self.encode(span))
+            sent = False
+            for _ in range(retries):
+                sbuf = rmr.rmr_send_msg(xapp._mrc, sbuf)
+                if sbuf.contents.state == 0:
+                    sent = True
+                    break
+            xapp.rmr_free(sbuf)
+            self._end(span, sent)
+            return sent
+
+        def rts(sbuf, new_payload=None, new_mtype=None, retries=100):
+            parent = self.current()
+            if parent is None or parent is _NOT_SAMPLED:
+                return rmr_rts(sbuf, new_payload=new_payload, new_mtype=new_mtype, retries=retries)
+            span = Span(parent.trace_id, parent.span_id, "rmr.reply {}".format(new_mtype), KIND_PRODUCER, {"rmr.mtype": new_mtype})
+            if parent.remote_parent: # The sender traces the reply too; others (e.g. E2 nodes) keep their transaction ID
+                rmr.set_transaction_id(sbuf, self.encode(span))
+            sent = rmr_rts(sbuf, new_payload=new_payload, new_mtype=new_mtype, retries=retries)
+            self._end(span, sent)
+            return sent
+
+        xapp.rmr_send, xapp.rmr_rts = send, rts
+        if hasattr(xapp, "register_callback"): # RMRXapp
+            self.trace_dispatch(xapp._dispatch)
+            xapp._default_handler = self.trace_handler(xapp._default_handler)
+            register_callback = xapp.register_callback
+            xapp.register_callback = lambda handler, message_type: register_callback(self.trace_handler(handler), message_type)
+
+    # ------------------ EXPORT
+
+    def start(self):
+        """
+        Starts the exporter thread.
+        """
+        self._thread = Thread(target=self._export_loop, name="span-exporter", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Writes the queued spans and stops the exporter thread.
+        """
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+
+    def _export_loop(self):
+        """
+        Writes the ended spans in batches until stop() is called.
+        """
+        writer = logging.getLogger("xapp-spans-{}".format(id(self))) # Private logger, only used for its rotating file
+        writer.propagate = False
+        writer.setLevel(logging.INFO)
+        handler = RotatingFileHandler(self.path, maxBytes=self.max_bytes, backupCount=self.backups)
+        writer.addHandler(handler)
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        running = True
+        while running:
+            try:
+                span = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                if span is _STOP:
+                    running = False
+                else:
+                    batch.append(span)
+            except Empty:
+                pass
+            if batch and (len(batch) >= self.batch_size or time.monotonic() >= deadline or not running):
+                try:
+                    writer.info(json.dumps(self._request(batch), separators=(",", ":")))
+                    self.exported += len(batch)
+                except Exception as e:
+                    self.logger.error("Could not export {} spans: {}".format(len(batch), e))
+                batch = []
+            if time.monotonic() >= deadline:
+                deadline = time.monotonic() + self.flush_interval
+        writer.removeHandler(handler)
+        handler.close()
+
+    def _request(self, spans:List[Span]) -> dict:
+        """
+        Builds the OTLP ExportTraceServiceRequest of a batch of spans.
+        """
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service}}]},
+                "scopeSpans": [{
+                    "scope": {"name": "xapp-tracing"},
+                    "spans": [span.to_otlp() for span in spans]
+                }]
+            }]
+        }
+
+    def stats(self) -> dict:
+        """
+        Returns the sampled, exported and dropped span counts.
+        """
+        return {
+            "sample_rate": self.sample_rate,
+            "traces_started": self.sampled,
+            "spans_exported": self.exported,
+            "spans_dropped": self.dropped,
+            "spans_queued": self._queue.qsize()
+        }
@@ -0,0 +1,144 @@
+
+# Imports from OSC libraries
+from ricxappframe.xapp_frame import rmr
+from mdclogpy import Logger
+
+# Imports from other libraries
+from threading import Thread, Event, get_ident
+from time import monotonic
+from functools import wraps
+from typing import Callable, Dict, Tuple
+import sys
+import traceback
+
+# Imports from local files
+from .metrics import MetricsRegistry
+
+class HandlerWatchdog:
+    """
+    Watchdog flagging RMR message handlers that run longer than a time budget.
+
+    Wrapped handlers timestamp their entry and exit. A monitor thread checks the running handlers
+    every budget / 4 seconds and reports each one that exceeds the budget once: it logs the stack of
+    the stalled thread and counts the stall. When the handler finally returns, the total stall
+    duration is logged and observed. While a handler is over budget, stalled() is True, which lets the
+    readiness probe take the xApp out of service until the receive loop moves again.
+
+    Parameters
+    ----------
+    budget: float = 0.5
+        Seconds a handler may run before it is reported as stalled.
+    metrics: MetricsRegistry = None
+        Registry receiving the stall counter and stall duration histogram.
+    logger: Logger = None
+        Logger used to report stalls.
+    """
+    def __init__(self, budget:float = 0.5, metrics:MetricsRegistry = None, logger:Logger = None):
+        """
+        Initializes the watchdog. The monitor thread only runs after start() is called.
+        """
+        self.budget = budget
+        self.interval = max(budget / 4, 0.01) # Seconds between checks
+        self.logger = logger if logger is not None else Logger(name="HandlerWatchdog")
+        self._active:Dict[int, Tuple[object, float]] = {} # Thread id -> (message type, entry time) of the running handlers
+        self._reported = set() # (thread id, entry time) of the stalls already reported
+        self._stop = Event()
+        self._thread = None
+
+        self.stalls = 0
+        self._stall_counter = metrics.counter("rmr_handler_stalls_total", "RMR message handlers that exceeded the watchdog budget per message type.", ("mtype",)) if metrics else None
+        self._stall_latency = metrics.histogram("rmr_handler_stall_duration_seconds", "Duration of the RMR message handlers that exceeded the watchdog budget.", ("mtype",)) if metrics else None
+
+    # ------------------ HANDLER WRAPPING
+
+    def watch(self, handler:Callable) -> Callable:
+        """
+        Wraps an RMR message handler with the signature (xapp, summary, sbuf) to timestamp its entry and exit.
+        """
+        if getattr(handler, "_watched", False):
+            return handler
+        @wraps(handler)
+        def watched(xapp, summary, sbuf):
+            ident = get_ident()
+            start = monotonic()
+            self._active[ident] = (summary[rmr.RMR_MS_MSG_TYPE], start)
+            try:
+                return handler(xapp, summary, sbuf)
+            finally:
+                mtype, _ = self._active.pop(ident)
+                if (ident, start) in self._reported:
+                    self._recovered(ident, start, mtype)
+        watched._watched = True
+        return watched
+
+    def watch_rmrxapp(self, rmrxapp):
+        """
+        Watches the registered handlers of an RMRXapp, its default handler and every handler registered later with register_callback().
+        """
+        for mtype, handler in list(rmrxapp._dispatch.items()):
+            rmrxapp._dispatch[mtype] = self.watch(handler)
+        rmrxapp._default_handler = self.watch(rmrxapp._default_handler)
+        register_callback = rmrxapp.register_callback
+        rmrxapp.register_callback = lambda handler, message_type: register_callback(self.watch(handler), message_type)
+
+    # ------------------ MONITOR
+
+    def stalled(self) -> bool:
+        """
+        Returns True while a handler is running over budget.
+        """
+        now = monotonic()
+        return any(now - start > self.budget for _, start in list(self._active.values()))
+
+    def start(self):
+        """
+        Starts the monitor thread.
+        """
+        self._stop.clear()
+        self._thread = Thread(target=self._monitor, name="rmr-handler-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops the monitor thread.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _monitor(self):
+        """
+        Reports the handlers that exceed the budget, once per handler call.
+        """
+        while not self._stop.wait(self.interval):
+            now = monotonic()
+            for ident, (mtype, start) in list(self._active.items()):
+                if now - start > self.budget and (ident, start) not in self._reported:
+                    self._reported.add((ident, start))
+                    if self._active.get(ident, None) != (mtype, start): # Returned in the meantime, nothing to report
+                        self._reported.discard((ident, start))
+                        continue
+                    self._stalled(ident, mtype, now - start)
+
+    def _stalled(self, ident:int, mtype, elapsed:float):
+        """
+        Logs the stack of a stalled handler thread and counts the stall.
+        """
+        self.stalls += 1
+        if self._stall_counter is not None:
+            self._stall_counter.inc(mtype)
+        frame = sys._current_frames().get(ident, None)
+        stack = "".join(traceback.format_stack(frame)) if frame is not None else "(thread exited)\n"
+        self.logger.warning("RMR handler for message type {} has been running for {:.3f} s (budget {} s), stack:\n{}".format(
+            mtype, elapsed, self.budget, stack))
+
+    def _recovered(self, ident:int, start:float, mtype):
+        """
+        Logs and observes the total duration of a stalled handler once it returns.
+        """
+        self._reported.discard((ident, start))
+        duration = monotonic() - start
+        if self._stall_latency is not None:
+            self._stall_latency.observe(duration, mtype)
+        self.logger.warning("Stalled RMR handler for message type {} returned after {:.3f} s.".format(mtype, duration))